@@ -0,0 +1,144 @@
+"""Persist canonical_symbol / canonical_fy_suffix on quarterly_results.
+
+PE queries used to resolve each row's NSE symbol on the fly: a regex test,
+two LEFT JOINs to stocks and a CAST, inside ROW_NUMBER() partitions and
+correlated subqueries, where no index can help. Both values are now stored,
+with a composite index on (canonical_symbol, quarter, canonical_fy_suffix).
+
+Maintained by triggers so every writer is covered (save_quarterly_result,
+manual edits, imports):
+  - quarterly_results BEFORE INSERT / UPDATE OF stock_symbol, financial_year
+    sets both columns via qr_canonical_symbol().
+  - stocks AFTER INSERT / UPDATE / DELETE (statement-level, transition
+    tables) re-resolves only rows whose numeric stock_symbol is a bse_token
+    that appeared, changed or disappeared. A non-numeric symbol resolves to
+    itself (s1.symbol = stock_symbol), so only the BSE token mapping matters.
+
+Revision ID: 014
+Revises: 013
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect as sa_inspect
+
+revision: str = "014"
+down_revision: Union[str, None] = "013"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _column_exists(table: str, column: str) -> bool:
+    bind = op.get_bind()
+    columns = [c["name"] for c in sa_inspect(bind).get_columns(table)]
+    return column in columns
+
+
+def upgrade() -> None:
+    if not _column_exists("quarterly_results", "canonical_symbol"):
+        op.add_column("quarterly_results", sa.Column("canonical_symbol", sa.String, nullable=True))
+    if not _column_exists("quarterly_results", "canonical_fy_suffix"):
+        op.add_column("quarterly_results", sa.Column("canonical_fy_suffix", sa.String(2), nullable=True))
+
+    # Same priority as the old pe_analysis._resolved_symbol_sql: numeric → stocks.bse_token, else itself.
+    # The length guard keeps CAST AS INT from raising on long digit strings.
+    op.execute(r"""
+        CREATE OR REPLACE FUNCTION qr_canonical_symbol(sym TEXT) RETURNS TEXT
+        LANGUAGE sql STABLE AS $$
+            SELECT CASE
+                WHEN sym ~ '^\d+$' AND length(sym) <= 9 THEN COALESCE(
+                    (SELECT s.symbol FROM stocks s WHERE s.bse_token = CAST(sym AS INT)
+                     ORDER BY s.id LIMIT 1),
+                    sym)
+                ELSE sym
+            END
+        $$
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION qr_set_canonical() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.canonical_symbol := qr_canonical_symbol(NEW.stock_symbol);
+            NEW.canonical_fy_suffix := RIGHT(NEW.financial_year, 2);
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_qr_canonical ON quarterly_results")
+    op.execute("""
+        CREATE TRIGGER trg_qr_canonical
+        BEFORE INSERT OR UPDATE OF stock_symbol, financial_year ON quarterly_results
+        FOR EACH ROW EXECUTE FUNCTION qr_set_canonical()
+    """)
+
+    # Statement-level, so a master-scrip sync touching thousands of stocks rows
+    # costs one set-based UPDATE per statement (idx_qr_symbol lookups).
+    op.execute("""
+        CREATE OR REPLACE FUNCTION stocks_refresh_qr_canonical() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                UPDATE quarterly_results qr
+                SET canonical_symbol = qr_canonical_symbol(qr.stock_symbol)
+                WHERE qr.stock_symbol IN (
+                    SELECT CAST(n.bse_token AS TEXT) FROM new_rows n WHERE n.bse_token IS NOT NULL)
+                  AND qr.canonical_symbol IS DISTINCT FROM qr_canonical_symbol(qr.stock_symbol);
+            ELSIF TG_OP = 'DELETE' THEN
+                UPDATE quarterly_results qr
+                SET canonical_symbol = qr_canonical_symbol(qr.stock_symbol)
+                WHERE qr.stock_symbol IN (
+                    SELECT CAST(o.bse_token AS TEXT) FROM old_rows o WHERE o.bse_token IS NOT NULL)
+                  AND qr.canonical_symbol IS DISTINCT FROM qr_canonical_symbol(qr.stock_symbol);
+            ELSE
+                UPDATE quarterly_results qr
+                SET canonical_symbol = qr_canonical_symbol(qr.stock_symbol)
+                WHERE qr.stock_symbol IN (
+                    SELECT CAST(t.tok AS TEXT)
+                    FROM old_rows o
+                    JOIN new_rows n ON n.id = o.id
+                    CROSS JOIN LATERAL (VALUES (o.bse_token), (n.bse_token)) AS t(tok)
+                    WHERE (o.bse_token IS DISTINCT FROM n.bse_token OR o.symbol IS DISTINCT FROM n.symbol)
+                      AND t.tok IS NOT NULL)
+                  AND qr.canonical_symbol IS DISTINCT FROM qr_canonical_symbol(qr.stock_symbol);
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    for event, table in (("INSERT", "NEW TABLE AS new_rows"),
+                         ("DELETE", "OLD TABLE AS old_rows"),
+                         ("UPDATE", "OLD TABLE AS old_rows NEW TABLE AS new_rows")):
+        name = f"trg_stocks_qr_canonical_{event.lower()}"
+        op.execute(f"DROP TRIGGER IF EXISTS {name} ON stocks")
+        op.execute(f"""
+            CREATE TRIGGER {name}
+            AFTER {event} ON stocks
+            REFERENCING {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION stocks_refresh_qr_canonical()
+        """)
+
+    # Backfill (the BEFORE UPDATE trigger only fires on stock_symbol / financial_year)
+    op.execute("""
+        UPDATE quarterly_results
+        SET canonical_symbol = qr_canonical_symbol(stock_symbol),
+            canonical_fy_suffix = RIGHT(financial_year, 2)
+    """)
+
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_qr_canonical
+        ON quarterly_results(canonical_symbol, quarter, canonical_fy_suffix)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_qr_canonical")
+    for event in ("insert", "delete", "update"):
+        op.execute(f"DROP TRIGGER IF EXISTS trg_stocks_qr_canonical_{event} ON stocks")
+    op.execute("DROP TRIGGER IF EXISTS trg_qr_canonical ON quarterly_results")
+    op.execute("DROP FUNCTION IF EXISTS stocks_refresh_qr_canonical()")
+    op.execute("DROP FUNCTION IF EXISTS qr_set_canonical()")
+    op.execute("DROP FUNCTION IF EXISTS qr_canonical_symbol(TEXT)")
+    op.drop_column("quarterly_results", "canonical_fy_suffix")
+    op.drop_column("quarterly_results", "canonical_symbol")
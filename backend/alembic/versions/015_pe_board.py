@@ -0,0 +1,165 @@
+"""Create pe_board: the winning quarterly_results row per (canonical symbol, quarter, FY).
+
+GET /api/pe_analysis used to rank the whole filtered quarterly_results set
+with ROW_NUMBER() twice per request (COUNT + page), plus a correlated
+NOT EXISTS per pending row. pe_board keeps the result of that ranking, one
+row per group and view:
+
+    view = 'pending'   valuation empty, no reviewed sibling, FY hidden when a
+                       Q4 row exists; prefer completed, latest announcement
+    view = 'reviewed'  valuation set and (completed or user_reviewed); prefer
+                       signal, target, comments, BSE, latest announcement
+
+pe_board_refresh_group() recomputes one group under an advisory lock. An
+AFTER trigger on quarterly_results calls it for the old and new group of any
+insert, delete or change to a ranking column. This covers
+save_quarterly_result, update_pe_analysis, bulk_ignore_pe, delete, retrigger,
+worker status changes and the stocks canonical-symbol trigger (014). A Q4
+change also refreshes the FY group it can hide. pe_board_rebuild() refills
+everything.
+
+Revision ID: 015
+Revises: 014
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "015"
+down_revision: Union[str, None] = "014"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Ranking inputs: changes to any other column (cmp, pe, EPS...) leave the board as is
+_RANKING_COLUMNS = (
+    "stock_symbol, financial_year, quarter, canonical_symbol, canonical_fy_suffix, "
+    "valuation, extraction_status, user_reviewed, announcement_date, "
+    "recommendation, target_price, comments, exchange"
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "pe_board",
+        sa.Column("view", sa.String(16), nullable=False),
+        sa.Column("canonical_symbol", sa.String, nullable=False),
+        sa.Column("quarter", sa.String, nullable=False),
+        sa.Column("canonical_fy_suffix", sa.String(2), nullable=False),
+        sa.Column("qr_id", sa.Integer, sa.ForeignKey("quarterly_results.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("sort_ts", sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint("view", "canonical_symbol", "quarter", "canonical_fy_suffix"),
+    )
+    op.create_index("idx_pe_board_view_sort", "pe_board", ["view", sa.text("sort_ts DESC"), sa.text("qr_id DESC")])
+    op.create_index("idx_pe_board_qr_id", "pe_board", ["qr_id"])
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION pe_board_refresh_group(sym TEXT, q TEXT, fy TEXT) RETURNS void
+        LANGUAGE plpgsql AS $$
+        DECLARE
+            pending_id INT;
+            reviewed_id INT;
+        BEGIN
+            IF sym IS NULL OR q IS NULL OR fy IS NULL THEN
+                RETURN;
+            END IF;
+            PERFORM pg_advisory_xact_lock(hashtext('pe_board:' || sym || ':' || q || ':' || fy));
+
+            SELECT qr.id INTO reviewed_id
+            FROM quarterly_results qr
+            WHERE qr.canonical_symbol = sym AND qr.quarter = q AND qr.canonical_fy_suffix = fy
+              AND qr.valuation IS NOT NULL AND qr.valuation != ''
+              AND (qr.extraction_status = 'completed' OR qr.user_reviewed = TRUE)
+            ORDER BY
+              CASE WHEN qr.recommendation IS NOT NULL AND qr.recommendation != '' THEN 0 ELSE 1 END,
+              CASE WHEN qr.target_price IS NOT NULL THEN 0 ELSE 1 END,
+              CASE WHEN qr.comments IS NOT NULL AND qr.comments != '' THEN 0 ELSE 1 END,
+              CASE WHEN qr.exchange = 'BSE' THEN 0 ELSE 1 END,
+              qr.announcement_date DESC NULLS LAST,
+              qr.id DESC
+            LIMIT 1;
+
+            -- A reviewed row hides the whole group from pending
+            IF reviewed_id IS NULL THEN
+                SELECT qr.id INTO pending_id
+                FROM quarterly_results qr
+                WHERE qr.canonical_symbol = sym AND qr.quarter = q AND qr.canonical_fy_suffix = fy
+                  AND (qr.valuation IS NULL OR qr.valuation = '')
+                  AND NOT (qr.quarter = 'FY' AND EXISTS (
+                      SELECT 1 FROM quarterly_results q4
+                      WHERE q4.stock_symbol = qr.stock_symbol
+                        AND q4.quarter = 'Q4'
+                        AND RIGHT(q4.financial_year, 2) = qr.canonical_fy_suffix
+                  ))
+                ORDER BY
+                  CASE WHEN qr.extraction_status = 'completed' OR qr.user_reviewed = TRUE THEN 0 ELSE 1 END,
+                  qr.announcement_date DESC NULLS LAST,
+                  qr.id DESC
+                LIMIT 1;
+            END IF;
+
+            DELETE FROM pe_board b
+            WHERE b.canonical_symbol = sym AND b.quarter = q AND b.canonical_fy_suffix = fy
+              AND ((b.view = 'pending' AND pending_id IS NULL)
+                OR (b.view = 'reviewed' AND reviewed_id IS NULL));
+
+            INSERT INTO pe_board (view, canonical_symbol, quarter, canonical_fy_suffix, qr_id, sort_ts)
+            SELECT v.view, sym, q, fy, qr.id, COALESCE(qr.announcement_date, qr.created_at)
+            FROM (VALUES ('pending', pending_id), ('reviewed', reviewed_id)) AS v(view, id)
+            JOIN quarterly_results qr ON qr.id = v.id
+            ON CONFLICT (view, canonical_symbol, quarter, canonical_fy_suffix)
+            DO UPDATE SET qr_id = EXCLUDED.qr_id, sort_ts = EXCLUDED.sort_ts;
+        END
+        $$
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION qr_pe_board_sync() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP IN ('UPDATE', 'DELETE') THEN
+                PERFORM pe_board_refresh_group(OLD.canonical_symbol, OLD.quarter, OLD.canonical_fy_suffix);
+                IF OLD.quarter = 'Q4' THEN
+                    PERFORM pe_board_refresh_group(OLD.canonical_symbol, 'FY', OLD.canonical_fy_suffix);
+                END IF;
+            END IF;
+            IF TG_OP = 'INSERT' OR (TG_OP = 'UPDATE' AND
+                (NEW.canonical_symbol, NEW.quarter, NEW.canonical_fy_suffix)
+                    IS DISTINCT FROM (OLD.canonical_symbol, OLD.quarter, OLD.canonical_fy_suffix)) THEN
+                PERFORM pe_board_refresh_group(NEW.canonical_symbol, NEW.quarter, NEW.canonical_fy_suffix);
+                IF NEW.quarter = 'Q4' THEN
+                    PERFORM pe_board_refresh_group(NEW.canonical_symbol, 'FY', NEW.canonical_fy_suffix);
+                END IF;
+            END IF;
+            RETURN NULL;
+        END
+        $$
+    """)
+    op.execute("DROP TRIGGER IF EXISTS trg_qr_pe_board ON quarterly_results")
+    op.execute(f"""
+        CREATE TRIGGER trg_qr_pe_board
+        AFTER INSERT OR DELETE OR UPDATE OF {_RANKING_COLUMNS} ON quarterly_results
+        FOR EACH ROW EXECUTE FUNCTION qr_pe_board_sync()
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION pe_board_rebuild() RETURNS void
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            DELETE FROM pe_board;
+            PERFORM pe_board_refresh_group(g.canonical_symbol, g.quarter, g.canonical_fy_suffix)
+            FROM (
+                SELECT DISTINCT canonical_symbol, quarter, canonical_fy_suffix FROM quarterly_results
+            ) g;
+        END
+        $$
+    """)
+    op.execute("SELECT pe_board_rebuild()")
+
+
+def downgrade() -> None:
+    op.execute("DROP TRIGGER IF EXISTS trg_qr_pe_board ON quarterly_results")
+    op.execute("DROP FUNCTION IF EXISTS qr_pe_board_sync()")
+    op.execute("DROP FUNCTION IF EXISTS pe_board_rebuild()")
+    op.execute("DROP FUNCTION IF EXISTS pe_board_refresh_group(TEXT, TEXT, TEXT)")
+    op.drop_table("pe_board")
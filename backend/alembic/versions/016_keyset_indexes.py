@@ -0,0 +1,31 @@
+"""Composite (sort column, id) indexes for keyset pagination.
+
+Cursor mode on /api/messages and /api/insights/all pages with
+WHERE (sort_col, id) < (:cur_0, :cur_1) ORDER BY sort_col DESC, id DESC, which
+is a single backward range scan on these indexes. PE uses
+idx_pe_board_view_sort (015).
+
+Revision ID: 016
+Revises: 015
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+
+
+revision: str = "016"
+down_revision: Union[str, None] = "015"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("CREATE INDEX IF NOT EXISTS idx_messages_ts_id ON messages(timestamp, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_concall_updated_id ON concall_insights(updated_at, id)")
+    op.execute("CREATE INDEX IF NOT EXISTS idx_ann_insight_updated_id ON announcement_insights(updated_at, id)")
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_ann_insight_updated_id")
+    op.execute("DROP INDEX IF EXISTS idx_concall_updated_id")
+    op.execute("DROP INDEX IF EXISTS idx_messages_ts_id")
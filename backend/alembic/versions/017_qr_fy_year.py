@@ -0,0 +1,84 @@
+"""Persist a normalized fy_year integer on quarterly_results.
+
+financial_year arrives as '2026', 'FY26', 'FY2025-26' or '2025-26'. The PE
+list parsed it in Python (pe_analysis._fy_to_year) for every history row so
+it could line up a quarter with the rest of its FY and with the previous
+FY. qr_fy_year() applies the same rules in SQL. The 014 BEFORE trigger now
+stores the result, so the derived EPS columns become plain equality joins on
+(stock_symbol, fy_year). Unparseable years map to 0, as before.
+
+Revision ID: 017
+Revises: 016
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect as sa_inspect
+
+revision: str = "017"
+down_revision: Union[str, None] = "016"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _column_exists(table: str, column: str) -> bool:
+    bind = op.get_bind()
+    columns = [c["name"] for c in sa_inspect(bind).get_columns(table)]
+    return column in columns
+
+
+def upgrade() -> None:
+    if not _column_exists("quarterly_results", "fy_year"):
+        op.add_column("quarterly_results", sa.Column("fy_year", sa.Integer, nullable=True))
+
+    # '2026'->2026, '26'->2026, 'FY26'->2026, 'FY2025-26'/'2025-26'->2026, 'FY2026'->2026
+    op.execute(r"""
+        CREATE OR REPLACE FUNCTION qr_fy_year(fy TEXT) RETURNS INT
+        LANGUAGE sql IMMUTABLE AS $$
+            SELECT CASE
+                WHEN f ~ '^\d{1,9}$' THEN CASE WHEN f::int > 100 THEN f::int ELSE 2000 + f::int END
+                WHEN f ~ '^FY\d{2}$' THEN 2000 + RIGHT(f, 2)::int
+                WHEN f ~ '^(FY)?\d{4}-\d{2}$' THEN 2000 + RIGHT(f, 2)::int
+                WHEN f ~ '^FY\d{4}$' THEN RIGHT(f, 4)::int
+                ELSE 0
+            END
+            FROM (SELECT btrim(COALESCE(fy, '')) AS f) t
+        $$
+    """)
+
+    # Same trigger (trg_qr_canonical fires on stock_symbol / financial_year), one more column
+    op.execute("""
+        CREATE OR REPLACE FUNCTION qr_set_canonical() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.canonical_symbol := qr_canonical_symbol(NEW.stock_symbol);
+            NEW.canonical_fy_suffix := RIGHT(NEW.financial_year, 2);
+            NEW.fy_year := qr_fy_year(NEW.financial_year);
+            RETURN NEW;
+        END
+        $$
+    """)
+
+    op.execute("UPDATE quarterly_results SET fy_year = qr_fy_year(financial_year)")
+
+    op.execute("""
+        CREATE INDEX IF NOT EXISTS idx_qr_sym_fy_year
+        ON quarterly_results(stock_symbol, fy_year, quarter, id)
+    """)
+
+
+def downgrade() -> None:
+    op.execute("DROP INDEX IF EXISTS idx_qr_sym_fy_year")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION qr_set_canonical() RETURNS trigger
+        LANGUAGE plpgsql AS $$
+        BEGIN
+            NEW.canonical_symbol := qr_canonical_symbol(NEW.stock_symbol);
+            NEW.canonical_fy_suffix := RIGHT(NEW.financial_year, 2);
+            RETURN NEW;
+        END
+        $$
+    """)
+    op.execute("DROP FUNCTION IF EXISTS qr_fy_year(TEXT)")
+    op.drop_column("quarterly_results", "fy_year")
@@ -0,0 +1,38 @@
+"""Add order_stocks.prices_updated_at.
+
+Incremental quote refresh picked stale rows by updated_at. The import
+upsert and the master-scrip sync also bump updated_at without touching
+open_price / buy_order / sell_order, so a mid-session import made rows look
+fresh while their BUY/SELL levels still came from the old price and GAP.
+prices_updated_at is written only by save_order_stock_prices. The import
+clears it when GAP changes. Existing rows start NULL (stale), so the first
+incremental run after upgrading refreshes everything.
+
+Revision ID: 018
+Revises: 017
+Create Date: 2026-10-18
+"""
+from typing import Sequence, Union
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy import inspect as sa_inspect
+
+revision: str = "018"
+down_revision: Union[str, None] = "017"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _column_exists(table: str, column: str) -> bool:
+    bind = op.get_bind()
+    columns = [c["name"] for c in sa_inspect(bind).get_columns(table)]
+    return column in columns
+
+
+def upgrade() -> None:
+    if not _column_exists("order_stocks", "prices_updated_at"):
+        op.add_column("order_stocks", sa.Column("prices_updated_at", sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("order_stocks", "prices_updated_at")
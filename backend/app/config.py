@@ -36,6 +36,7 @@ class Settings(BaseSettings):
 
     # OpenAI
     OPENAI_API_KEY: str = ""
+    OPENAI_BASE_URL: str = "https://api.openai.com/v1"  # tests/benchmark points this at a local stub
 
     # Sentry
     SENTRY_DSN: str = ""
@@ -45,6 +46,43 @@ class Settings(BaseSettings):
     # CORS
     CORS_ORIGINS: list = ["http://localhost:3000", "http://localhost:8000"]
 
+    # Kotak master scrip index (parsed nse_cm / bse_cm symbol→token maps)
+    MASTER_SCRIP_CACHE_DIR: str = "master_scrip_cache"
+
+    # Filing PDF cache (content-addressed, LRU-evicted; shared volume in docker-compose)
+    PDF_CACHE_DIR: str = "pdf_cache"
+    PDF_CACHE_MAX_MB: int = 2048
+
+    # PDF rendering process pool (cpu_queue worker); 0 processes = one per CPU
+    PDF_RENDER_POOL: bool = True
+    PDF_RENDER_PROCESSES: int = 0
+
+    # Vision page images (page_image_encoder.py): budgets are per OpenAI request, split across pages
+    VISION_IMAGE_FORMAT: str = "auto"  # auto | png | jpeg | webp (webp needs Pillow)
+    VISION_IMAGE_GRAYSCALE: bool = True
+    VISION_MAX_IMAGE_TOKENS: int = 16000
+    VISION_MAX_IMAGE_BYTES: int = 4_000_000
+    VISION_IMAGE_COMPARE: bool = False  # also render legacy PNGs and log measured bytes saved
+
+    # Quarterly results: try text-layer TSV before vision (falls back on scans / failed validation)
+    QUARTERLY_TEXT_MODE: bool = True
+
+    # Raw OpenAI extraction responses, replayed for identical requests (PDF_CACHE_DIR/ai)
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_TTL_DAYS: int = 30
+
+    # Cluster-wide OpenAI governor (openai_governor.py): concurrent calls + tokens/minute across all workers
+    OPENAI_GOVERNOR: bool = True
+    OPENAI_MAX_CONCURRENCY: int = 8
+    OPENAI_TPM_LIMIT: int = 180_000  # 10% under the gpt-4.1-mini tier-1 200k TPM
+
+    # Quarterly extraction as a staged chain (fetch/persist io_queue, render cpu_queue, infer ai_queue).
+    # Needs a worker consuming ai_queue (celery-ai in docker-compose); off = one cpu_queue task per filing
+    EXTRACTION_PIPELINE: bool = False
+
+    # PE Pending / Reviewed lists read the trigger-maintained pe_board table (migration 015)
+    PE_BOARD_ENABLED: bool = True
+
     # Legacy SQLite paths (for migration only)
     SQLITE_MESSAGES_DB: str = "messages.db"
     SQLITE_ANALYTICS_DB: str = "analytics.db"
@@ -9,6 +9,7 @@ import logging
 from .database import init_db, close_db
 from .cache import init_redis, close_redis
 from .websocket import ws_manager
+from .services.broker_http import close_kotak_clients
 
 logger = logging.getLogger(__name__)
 
@@ -29,6 +30,7 @@ async def lifespan(app: FastAPI):
     # Shutdown
     logger.info("Shutting down...")
     await ws_manager.stop()
+    await close_kotak_clients()
     await close_redis()
     await close_db()
     logger.info("All connections closed")
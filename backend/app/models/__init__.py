@@ -1,11 +1,11 @@
 from .messages import Message, User, Session, ScheduledFetchConfig
 from .analytics import (
-    Stock, QuarterlyResult, FailedExtraction,
+    Stock, QuarterlyResult, PEBoard, FailedExtraction,
     PEFormula, SectorFormula, BSEAnnouncementLog, CustomValuation,
 )
 
 __all__ = [
     "Message", "User", "Session", "ScheduledFetchConfig",
-    "Stock", "QuarterlyResult", "FailedExtraction",
+    "Stock", "QuarterlyResult", "PEBoard", "FailedExtraction",
     "PEFormula", "SectorFormula", "BSEAnnouncementLog", "CustomValuation",
 ]
@@ -41,6 +41,8 @@ class QuarterlyResult(Base):
         Index("idx_qr_valuation", "valuation"),
         Index("idx_qr_created_at", "created_at"),
         Index("idx_qr_quarter_val", "quarter", "valuation"),
+        Index("idx_qr_canonical", "canonical_symbol", "quarter", "canonical_fy_suffix"),
+        Index("idx_qr_sym_fy_year", "stock_symbol", "fy_year", "quarter", "id"),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -48,6 +50,11 @@ class QuarterlyResult(Base):
     company_name = Column(String)
     quarter = Column(String, nullable=False)
     financial_year = Column(String, nullable=False)
+    # NSE symbol + RIGHT(financial_year, 2), kept current by DB triggers (migration 014)
+    canonical_symbol = Column(String)
+    canonical_fy_suffix = Column(String(2))
+    # financial_year as its ending calendar year (0 if unparseable), same trigger (migration 017)
+    fy_year = Column(Integer)
     period_ended = Column(String)
 
     eps_basic_standalone = Column(Float)
@@ -98,6 +105,23 @@ class QuarterlyResult(Base):
     reviewed_at = Column(DateTime(timezone=True), nullable=True)
 
 
+class PEBoard(Base):
+    """Winning quarterly_results row per (canonical symbol, quarter, FY) for the pending/reviewed lists.
+    Maintained by DB triggers (migration 015) — never written from Python."""
+    __tablename__ = "pe_board"
+    __table_args__ = (
+        Index("idx_pe_board_view_sort", "view", "sort_ts", "qr_id"),
+        Index("idx_pe_board_qr_id", "qr_id"),
+    )
+
+    view = Column(String(16), primary_key=True)
+    canonical_symbol = Column(String, primary_key=True)
+    quarter = Column(String, primary_key=True)
+    canonical_fy_suffix = Column(String(2), primary_key=True)
+    qr_id = Column(Integer, ForeignKey("quarterly_results.id", ondelete="CASCADE"), nullable=False)
+    sort_ts = Column(DateTime(timezone=True))
+
+
 class FailedExtraction(Base):
     __tablename__ = "failed_extractions"
 
@@ -162,6 +186,7 @@ class AnnouncementInsight(Base):
         Index("idx_ann_insight_status", "extraction_status"),
         Index("idx_ann_insight_type", "announcement_type"),
         Index("idx_ann_insight_msg_id", "source_message_id"),
+        Index("idx_ann_insight_updated_id", "updated_at", "id"),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
@@ -254,6 +279,7 @@ class ConcallInsight(Base):
         Index("idx_concall_status", "extraction_status"),
         Index("idx_concall_quarter_fy", "quarter", "financial_year"),
         Index("idx_concall_msg_id", "source_message_id"),
+        Index("idx_concall_updated_id", "updated_at", "id"),
     )
 
     id = Column(Integer, primary_key=True, autoincrement=True)
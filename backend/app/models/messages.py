@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Boolean, Text, Index
 from sqlalchemy.sql import func
 from ..database import Base
 
@@ -19,6 +19,10 @@ class Message(Base):
     sector = Column(String)
     exchange = Column(String, default="NSE")
 
+    __table_args__ = (
+        Index("idx_messages_ts_id", "timestamp", "id"),
+    )
+
 
 class User(Base):
     __tablename__ = "users"
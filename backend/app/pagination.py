@@ -0,0 +1,104 @@
+"""
+Keyset (cursor) pagination helpers for list endpoints.
+
+Page mode (`?page=N`) runs LIMIT/OFFSET plus a full COUNT(*) on every
+request, so its cost grows with page depth and table size. Cursor mode is
+opt-in: pass `cursor=` (empty) for the first page, then the `next_cursor`
+from each response. A page is then one index range scan:
+
+    WHERE (sort_col, id) < (:cur_0, :cur_1) ORDER BY sort_col DESC, id DESC LIMIT n+1
+
+The extra row only tells us whether another page exists. Cursors are opaque
+urlsafe-base64 JSON of the last row's sort key (datetimes round-trip as ISO
+strings). Totals in cursor mode come from pg_class.reltuples for
+unfiltered large tables (estimate) or from an exact COUNT cached in Redis
+for COUNT_TTL seconds. `total_estimated` says which one was used.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from .cache import cache_get, cache_set
+
+COUNT_TTL = 60
+_ESTIMATE_MIN_ROWS = 50_000  # below this an exact COUNT(*) is cheap enough
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    packed = [{"$dt": v.isoformat()} if isinstance(v, datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(packed, separators=(",", ":")).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> Optional[List[Any]]:
+    """Sort-key values from a cursor; None for the first page (empty cursor). 400 on a malformed cursor."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        packed = json.loads(raw)
+        values = [datetime.fromisoformat(v["$dt"]) if isinstance(v, dict) else v for v in packed]
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    if not isinstance(packed, list) or len(values) != size:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+    return values
+
+
+def keyset_condition(columns: Sequence[str], values: Optional[Sequence[Any]], descending: bool,
+                     params: Dict[str, Any], prefix: str = "cur") -> str:
+    """Row-value predicate continuing after `values` ("TRUE" for the first page); binds :<prefix>_<i>."""
+    if values is None:
+        return "TRUE"
+    names = []
+    for i, v in enumerate(values):
+        params[f"{prefix}_{i}"] = v
+        names.append(f":{prefix}_{i}")
+    op = "<" if descending else ">"
+    return f"({', '.join(columns)}) {op} ({', '.join(names)})"
+
+
+def split_page(rows: List[Dict[str, Any]], per_page: int,
+               sort_key: Callable[[Dict[str, Any]], Sequence[Any]]) -> Tuple[List[Dict[str, Any]], Optional[str]]:
+    """Trim the LIMIT n+1 probe row; return (page rows, next_cursor or None on the last page)."""
+    if len(rows) <= per_page:
+        return rows, None
+    page = rows[:per_page]
+    return page, encode_cursor(sort_key(page[-1]))
+
+
+async def estimated_rows(db: AsyncSession, table: str) -> Optional[int]:
+    """Planner row estimate for a whole table (None if never analysed)."""
+    row = await db.execute(
+        text("SELECT reltuples::bigint FROM pg_class WHERE oid = to_regclass(:t)"), {"t": table}
+    )
+    n = row.scalar()
+    return int(n) if n is not None and n >= 0 else None
+
+
+async def cached_total(
+    cache_key: str,
+    count: Callable[[], Awaitable[int]],
+    db: Optional[AsyncSession] = None,
+    table: Optional[str] = None,
+) -> Tuple[int, bool]:
+    """
+    (total, estimated) for cursor mode. Pass db + table only for an
+    unfiltered listing. A large table is then answered from reltuples;
+    otherwise an exact count is served from Redis or computed and cached.
+    """
+    if db is not None and table:
+        estimate = await estimated_rows(db, table)
+        if estimate is not None and estimate >= _ESTIMATE_MIN_ROWS:
+            return estimate, True
+    cached = await cache_get(cache_key)
+    if cached is not None:
+        return int(cached), False
+    total = int(await count() or 0)
+    await cache_set(cache_key, total, ttl=COUNT_TTL)
+    return total, False
@@ -12,6 +12,7 @@ from sqlalchemy import text
 
 from ..database import get_db
 from ..cache import cache_get, cache_set
+from ..pagination import cached_total, decode_cursor, keyset_condition, split_page
 
 router = APIRouter(prefix="/api/insights", tags=["insights"])
 
@@ -251,9 +252,10 @@ async def get_all_insights(
     quarter: Optional[str] = None,
     financial_year: Optional[str] = None,
     status: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
     db: AsyncSession = Depends(get_db),
 ):
-    """Unified paginated list of ALL AI insights (concall + announcements)."""
+    """Unified paginated list of ALL AI insights (concall + announcements), page or cursor mode."""
     offset = (page - 1) * per_page
 
     # Build WHERE clauses for both tables
@@ -297,8 +299,19 @@ async def get_all_insights(
             SELECT COUNT(*) FROM announcement_insights {ann_where}
         ) AS total
     """
-    count_row = await db.execute(text(count_sql), params)
-    total = count_row.scalar() or 0
+
+    async def _count() -> int:
+        count_row = await db.execute(text(count_sql), params)
+        return count_row.scalar() or 0
+
+    if cursor is not None:
+        return await _all_insights_keyset(
+            db, params, concall_where, ann_where, per_page, cursor,
+            count_key=f"count:insights:{insight_type}:{symbol}:{quarter}:{financial_year}:{status}",
+            count=_count,
+        )
+
+    total = await _count()
 
     # UNION query
     sql = f"""
@@ -334,6 +347,59 @@ async def get_all_insights(
     }
 
 
+_INSIGHT_LIST_COLUMNS = """stock_symbol, company_name,
+               quarter, financial_year, source_pdf_url, source_message_id,
+               exchange, extraction_status,
+               management_outlook, executive_summary, investment_thesis,
+               created_at, updated_at"""
+
+
+async def _all_insights_keyset(db, params, concall_where, ann_where, per_page, cursor, count_key, count):
+    """
+    Cursor page of /all ordered by (updated_at, src, id) DESC; src 0 = concall,
+    1 = announcement, so ids from the two tables never tie. Each branch walks
+    its own (updated_at, id) index for at most per_page+1 rows before the merge.
+    """
+    total, total_estimated = await cached_total(count_key, count)
+    after = decode_cursor(cursor, 3)
+    params.pop("offset")
+    params["limit"] = per_page + 1
+    concall_keyset = keyset_condition(["updated_at", "0", "id"], after, True, params)
+    ann_keyset = keyset_condition(["updated_at", "1", "id"], after, True, params)
+
+    sql = f"""
+        (SELECT id, 0 AS src, 'concall' AS insight_type, {_INSIGHT_LIST_COLUMNS}
+         FROM concall_insights {concall_where} AND {concall_keyset}
+         ORDER BY updated_at DESC, id DESC
+         LIMIT :limit)
+
+        UNION ALL
+
+        (SELECT id, 1 AS src, announcement_type AS insight_type, {_INSIGHT_LIST_COLUMNS}
+         FROM announcement_insights {ann_where} AND {ann_keyset}
+         ORDER BY updated_at DESC, id DESC
+         LIMIT :limit)
+
+        ORDER BY updated_at DESC, src DESC, id DESC
+        LIMIT :limit
+    """
+    rows = await db.execute(text(sql), params)
+    insights, next_cursor = split_page(
+        [dict(r._mapping) for r in rows.fetchall()], per_page,
+        lambda r: (r["updated_at"], r["src"], r["id"]),
+    )
+    for r in insights:
+        r.pop("src")
+
+    return {
+        "insights": insights,
+        "total": total,
+        "total_estimated": total_estimated,
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+    }
+
+
 @router.get("/ai/summary")
 async def ai_insights_summary(db: AsyncSession = Depends(get_db)):
     """Return aggregated status counts for all AI insights (concall + announcement)."""
@@ -7,6 +7,7 @@ import uuid
 from fastapi import APIRouter, HTTPException
 
 from ..cache import publish_ws_event
+from ..services.openai_governor import governor_snapshot
 from worker.tasks.quotes import fetch_quotes_manual
 from worker.tasks.announcements import (
     fetch_nse_equities,
@@ -69,3 +70,9 @@ async def start_ai_analysis(body: dict):
     })
 
     return {"success": True, "symbol": symbol, "status": "analysis_started"}
+
+
+@router.get("/ai_governor")
+async def ai_governor_status():
+    """OpenAI governor: in-flight / queued calls per kind, TPM budget and queue-wait metrics."""
+    return await governor_snapshot()
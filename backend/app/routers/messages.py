@@ -12,6 +12,7 @@ from sqlalchemy import text
 from ..database import get_db
 from ..cache import cached, cache_get, cache_set
 from ..cache_keys import invalidate_messages, notify_new_message
+from ..pagination import cached_total, decode_cursor, keyset_condition, split_page
 
 router = APIRouter(prefix="/api", tags=["messages"])
 
@@ -24,10 +25,11 @@ async def get_messages(
     exchange: Optional[str] = None,
     sector: Optional[str] = None,
     search: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
     db: AsyncSession = Depends(get_db),
 ):
-    """Paginated message list with option/exchange/sector/search filters."""
-    cache_key = f"messages:list:{option}:{page}:{per_page}:{exchange}:{sector}:{search}"
+    """Paginated message list with option/exchange/sector/search filters (page or cursor mode)."""
+    cache_key = f"messages:list:{option}:{page}:{per_page}:{exchange}:{sector}:{search}:{cursor}"
     cached_result = await cache_get(cache_key)
     if cached_result:
         return cached_result
@@ -60,10 +62,27 @@ async def get_messages(
         LEFT JOIN stocks s2 ON m.symbol ~ '^\\d+$' AND s2.bse_scrip_code = m.symbol
     """
 
-    count_row = await db.execute(text(f"""
-        SELECT COUNT(*) {join_clause} {where}
-    """), params)
-    total = count_row.scalar()
+    async def _count() -> int:
+        count_row = await db.execute(text(f"""
+            SELECT COUNT(*) {join_clause} {where}
+        """), params)
+        return count_row.scalar()
+
+    if cursor is not None:
+        # Keyset mode: (timestamp, id) range scan, no OFFSET; total cached / estimated
+        unfiltered = where == "WHERE 1=1"
+        total, total_estimated = await cached_total(
+            f"count:messages:{option}:{exchange}:{sector}:{search}", _count,
+            db if unfiltered else None, "messages",
+        )
+        after = decode_cursor(cursor, 2)
+        where += " AND " + keyset_condition(["m.timestamp", "m.id"], after, True, params)
+        params.pop("offset")
+        params["limit"] = per_page + 1
+        page_tail = "ORDER BY m.timestamp DESC, m.id DESC LIMIT :limit"
+    else:
+        total = await _count()
+        page_tail = "ORDER BY m.timestamp DESC LIMIT :limit OFFSET :offset"
 
     rows = await db.execute(text(f"""
         SELECT m.id, m.chat_id, m.message, m.timestamp, m.symbol, m.company_name,
@@ -90,12 +109,23 @@ async def get_messages(
                END AS market_segment
         {join_clause}
         {where}
-        ORDER BY m.timestamp DESC
-        LIMIT :limit OFFSET :offset
+        {page_tail}
     """), params)
 
     messages = [dict(r._mapping) for r in rows.fetchall()]
 
+    if cursor is not None:
+        messages, next_cursor = split_page(messages, per_page, lambda r: (r["timestamp"], r["id"]))
+        result = {
+            "messages": messages,
+            "total": total,
+            "total_estimated": total_estimated,
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+        }
+        await cache_set(cache_key, result, ttl=10)
+        return result
+
     result = {
         "messages": messages,
         "total": total,
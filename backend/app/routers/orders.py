@@ -8,9 +8,9 @@ import asyncio
 import os
 import sys
 import logging
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List
 from fastapi import APIRouter, HTTPException, UploadFile, File, BackgroundTasks
 from pydantic import BaseModel
 
@@ -53,6 +53,10 @@ class TOTPRequest(BaseModel):
 class PlaceOrdersRequest(BaseModel):
     orders_per_minute: int = 185
     max_concurrent: int = 2
+    # Submission order: "gap" (tightest GAP first), "turnover" (OPEN PRICE x QUANTITY),
+    # "weight" (priority_weights by symbol) or "none" (order_stocks / sheet order)
+    priority: str = "gap"
+    priority_weights: Dict[str, float] = {}
 
 
 class ImportStocksRequest(BaseModel):
@@ -282,47 +286,121 @@ async def authenticate_with_totp(body: TOTPRequest):
 
 # ─── Get Quotes ───
 
+_QUOTE_BATCH_SIZE = 190  # symbols per Kotak quote request (1 API call per batch)
+_IST = timezone(timedelta(hours=5, minutes=30))
+_PRICE_COLUMNS = ["OPEN PRICE", "BUY ORDER", "SELL ORDER"]
+
+
 @router.post("/quotes/fetch")
-async def fetch_quotes():
-    """Fetch live quotes for all stocks, update storage with OPEN PRICE, BUY/SELL ORDER."""
+async def fetch_quotes(incremental: bool = False, max_age_minutes: Optional[int] = None):
+    """
+    Fetch live quotes for all stocks, update storage with OPEN PRICE, BUY/SELL ORDER.
+
+    incremental=true only re-fetches rows whose price is missing or stale and
+    merges them into the existing rows. Stale = written before the last 09:15 IST
+    session open, or older than max_age_minutes when given.
+    """
     source = _order_source()
+    cutoff = _quote_refresh_cutoff(max_age_minutes) if incremental else None
     if source == "postgres":
-        return await _fetch_quotes_postgres()
-    return await _fetch_quotes_gsheet()
+        return await _fetch_quotes_postgres(cutoff)
+    return await _fetch_quotes_gsheet(cutoff)
 
 
-async def _fetch_quotes_postgres():
-    """Fetch quotes using Postgres as the data source."""
-    try:
-        from get_quote import (
-            get_gsheet_stocks_df,
-            get_symbol_from_gsheet_stocks_df,
-            get_quotes_with_rate_limit,
-            flatten_quote_result_list,
-            fetch_ohlc_from_quote_result,
-            update_df_with_quote_ohlc,
-        )
-        from ..services.order_stock_db import get_order_stocks_df, save_order_stock_prices
+def _quote_refresh_cutoff(max_age_minutes: Optional[int] = None) -> datetime:
+    """Prices written before this moment are stale (last session open, or now - max_age)."""
+    now = datetime.now(_IST)
+    if max_age_minutes is not None:
+        return now - timedelta(minutes=max_age_minutes)
+    session_open = now.replace(hour=9, minute=15, second=0, microsecond=0)
+    return session_open if now >= session_open else session_open - timedelta(days=1)
 
-        df = await get_order_stocks_df()
-        if df is None or df.empty:
-            return {"success": False, "message": "No order stocks in Postgres. Import stocks first.", "rows": []}
 
-        all_rows = await get_gsheet_stocks_df(df)
-        symbols_list, valid_indices = await get_symbol_from_gsheet_stocks_df(all_rows)
+def _missing_price_mask(df):
+    import pandas as pd
+    prices = pd.to_numeric(df["OPEN PRICE"], errors="coerce")
+    return ~(prices > 0)
 
-        if not symbols_list:
-            return {"success": False, "message": "No valid symbols found", "rows": []}
 
-        batch_size = 190
-        symbol_batches = [symbols_list[i:i + batch_size] for i in range(0, len(symbols_list), batch_size)]
+async def _refresh_quote_prices(df, refresh_mask=None):
+    """
+    Fetch quotes for the rows selected by refresh_mask (None = all rows) and merge
+    OPEN PRICE / BUY ORDER / SELL ORDER back into df.
+    Returns (df, stats) — stats compare API calls made vs a full refresh.
+    """
+    import pandas as pd
+    from get_quote import (
+        get_symbol_from_gsheet_stocks_df,
+        get_quotes_with_rate_limit,
+        flatten_quote_result_list,
+        fetch_ohlc_from_quote_result,
+        update_df_with_quote_ohlc,
+    )
+
+    all_symbols, all_indices = await get_symbol_from_gsheet_stocks_df(df)
+    if refresh_mask is None:
+        target, symbols_list, valid_indices = df, all_symbols, all_indices
+    else:
+        target = df[refresh_mask].reset_index(drop=True)
+        symbols_list, valid_indices = await get_symbol_from_gsheet_stocks_df(target)
+
+    quote_ohlc = []
+    if symbols_list:
+        symbol_batches = [symbols_list[i:i + _QUOTE_BATCH_SIZE] for i in range(0, len(symbols_list), _QUOTE_BATCH_SIZE)]
         quote_result = await get_quotes_with_rate_limit(symbol_batches, requests_per_minute=190)
 
         flattened = await flatten_quote_result_list(quote_result)
         quote_ohlc = await fetch_ohlc_from_quote_result(flattened)
-        df = await update_df_with_quote_ohlc(df, quote_ohlc, valid_indices)
+        target = await update_df_with_quote_ohlc(target, quote_ohlc, valid_indices)
+
+        if refresh_mask is None:
+            df = target
+        else:
+            for col in _PRICE_COLUMNS:
+                df[col] = pd.to_numeric(df[col], errors="coerce")
+            df.loc[refresh_mask.to_numpy(), _PRICE_COLUMNS] = target[_PRICE_COLUMNS].to_numpy(dtype="float64")
+
+    calls_full = -(-len(all_symbols) // _QUOTE_BATCH_SIZE)
+    calls_made = -(-len(symbols_list) // _QUOTE_BATCH_SIZE)
+    stats = {
+        "total_symbols": len(all_symbols),
+        "refreshed_symbols": len(symbols_list),
+        "skipped_fresh": len(all_symbols) - len(symbols_list),
+        "quotes_received": len(quote_ohlc),
+        "api_calls": calls_made,
+        "api_calls_saved": calls_full - calls_made,
+    }
+    if symbols_list and len(symbols_list) < len(all_symbols):
+        logger.info(
+            f"♻️ Incremental quotes: {len(symbols_list)}/{len(all_symbols)} symbols refreshed, "
+            f"{stats['api_calls_saved']} API calls saved"
+        )
+    return df, stats
+
+
+async def _fetch_quotes_postgres(cutoff: Optional[datetime] = None):
+    """Fetch quotes using Postgres as the data source (cutoff set → incremental)."""
+    try:
+        from ..services.order_stock_db import get_order_stocks_df, get_stale_order_symbols, save_order_stock_prices
+
+        df = await get_order_stocks_df()
+        if df is None or df.empty:
+            return {"success": False, "message": "No order stocks in Postgres. Import stocks first.", "rows": []}
+
+        refresh_mask = None
+        if cutoff is not None:
+            stale = await get_stale_order_symbols(cutoff)
+            refresh_mask = df["OK"].isin(stale) | _missing_price_mask(df)
 
-        write_success = await save_order_stock_prices(df)
+        df, stats = await _refresh_quote_prices(df, refresh_mask)
+
+        if not stats["total_symbols"]:
+            return {"success": False, "message": "No valid symbols found", "rows": []}
+
+        if stats["refreshed_symbols"]:
+            write_result = await save_order_stock_prices(df if refresh_mask is None else df[refresh_mask])
+        else:
+            write_result = {"success": True, "rows_written": 0, "elapsed_ms": 0.0}
 
         rows = _sanitize_df_rows(df)
         fetch_time = datetime.now().strftime("%I:%M %p")
@@ -330,23 +408,25 @@ async def _fetch_quotes_postgres():
 
         _save_run_status("quotes", {
             "success": True,
-            "total_symbols": len(symbols_list),
+            "total_symbols": stats["total_symbols"],
             "prices_mapped": prices_mapped,
             "source": "postgres",
+            "incremental": cutoff is not None,
         })
 
         return {
             "success": True,
-            "message": f"Fetched quotes for {len(symbols_list)} stocks",
+            "message": f"Fetched quotes for {stats['refreshed_symbols']} of {stats['total_symbols']} stocks",
             "rows": rows,
             "total": len(rows),
             "fetch_time": fetch_time,
-            "sheet_updated": write_success,
+            "sheet_updated": write_result["success"],
             "source": "postgres",
             "stats": {
-                "total_symbols": len(symbols_list),
-                "quotes_received": len(quote_ohlc),
-                "prices_mapped": prices_mapped
+                **stats,
+                "prices_mapped": prices_mapped,
+                "rows_written": write_result["rows_written"],
+                "db_write_ms": write_result["elapsed_ms"],
             }
         }
     except Exception as e:
@@ -355,19 +435,22 @@ async def _fetch_quotes_postgres():
         return {"success": False, "message": str(e), "rows": []}
 
 
-async def _fetch_quotes_gsheet():
-    """Fetch quotes using Google Sheet as the data source — original logic."""
+def _gsheet_prices_fresh_since(cutoff: datetime) -> bool:
+    """True if the last successful gsheet quote run finished after cutoff (sheet rows carry no timestamps)."""
+    last = _get_run_status("quotes")
+    if not last or not last.get("success") or last.get("source") != "gsheet":
+        return False
+    try:
+        return datetime.fromisoformat(last["timestamp"]).astimezone(_IST) >= cutoff
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+async def _fetch_quotes_gsheet(cutoff: Optional[datetime] = None):
+    """Fetch quotes using Google Sheet as the data source (cutoff set → incremental)."""
     try:
         from gsheet_stock_get import GSheetStockClient
-        from get_quote import (
-            get_gsheet_stocks_df,
-            get_symbol_from_gsheet_stocks_df,
-            get_quotes_with_rate_limit,
-            flatten_quote_result_list,
-            fetch_ohlc_from_quote_result,
-            update_df_with_quote_ohlc,
-            write_quote_ohlc_to_gsheet,
-        )
+        from get_quote import write_quote_ohlc_to_gsheet
 
         base_url = _get_env("BASE_SHEET_URL")
         gid = _get_env("sheet_gid")
@@ -383,22 +466,16 @@ async def _fetch_quotes_gsheet():
         if df is None or df.empty:
             return {"success": False, "message": "No data in sheet", "rows": []}
 
-        all_rows = await get_gsheet_stocks_df(df)
-        symbols_list, valid_indices = await get_symbol_from_gsheet_stocks_df(all_rows)
+        refresh_mask = None
+        if cutoff is not None and _gsheet_prices_fresh_since(cutoff):
+            refresh_mask = _missing_price_mask(df)
 
-        if not symbols_list:
-            return {"success": False, "message": "No valid symbols found", "rows": []}
+        df, stats = await _refresh_quote_prices(df, refresh_mask)
 
-        batch_size = 190
-        symbol_batches = [symbols_list[i:i + batch_size] for i in range(0, len(symbols_list), batch_size)]
-        quote_result = await get_quotes_with_rate_limit(symbol_batches, requests_per_minute=190)
-
-        flattened = await flatten_quote_result_list(quote_result)
-        quote_ohlc = await fetch_ohlc_from_quote_result(flattened)
-
-        df = await update_df_with_quote_ohlc(df, quote_ohlc, valid_indices)
+        if not stats["total_symbols"]:
+            return {"success": False, "message": "No valid symbols found", "rows": []}
 
-        write_success = await write_quote_ohlc_to_gsheet(df, sheet_id, gid)
+        write_success = await write_quote_ohlc_to_gsheet(df, sheet_id, gid) if stats["refreshed_symbols"] else True
 
         rows = _sanitize_df_rows(df)
         fetch_time = datetime.now().strftime("%I:%M %p")
@@ -406,23 +483,23 @@ async def _fetch_quotes_gsheet():
 
         _save_run_status("quotes", {
             "success": True,
-            "total_symbols": len(symbols_list),
+            "total_symbols": stats["total_symbols"],
             "prices_mapped": prices_mapped,
             "source": "gsheet",
+            "incremental": cutoff is not None,
         })
 
         return {
             "success": True,
-            "message": f"Fetched quotes for {len(symbols_list)} stocks",
+            "message": f"Fetched quotes for {stats['refreshed_symbols']} of {stats['total_symbols']} stocks",
             "rows": rows,
             "total": len(rows),
             "fetch_time": fetch_time,
             "sheet_updated": write_success,
             "source": "gsheet",
             "stats": {
-                "total_symbols": len(symbols_list),
-                "quotes_received": len(quote_ohlc),
-                "prices_mapped": prices_mapped
+                **stats,
+                "prices_mapped": prices_mapped,
             }
         }
     except Exception as e:
@@ -478,14 +555,17 @@ async def _run_orders_background(body: PlaceOrdersRequest, source: str):
     _order_task_running = True
     try:
         if source == "postgres":
-            all_orders, valid_rows = await _prepare_orders_postgres()
+            valid_rows = await _prepare_orders_postgres()
         else:
-            all_orders, valid_rows = await _prepare_orders_gsheet()
+            valid_rows = await _prepare_orders_gsheet()
 
-        if not all_orders:
+        if not valid_rows:
             return
 
-        from place_order import place_orders_with_rate_limit
+        from place_order import get_order_data, prioritize_order_rows, place_orders_with_rate_limit
+
+        valid_rows = prioritize_order_rows(valid_rows, body.priority, body.priority_weights)
+        all_orders = await get_order_data(valid_rows)
 
         logger.info(f"Background: Placing {len(all_orders)} orders for {len(valid_rows)} stocks...")
         results = await place_orders_with_rate_limit(
@@ -508,58 +588,54 @@ async def _run_orders_background(body: PlaceOrdersRequest, source: str):
 
 async def _prepare_orders_postgres():
     from get_quote import get_gsheet_stocks_df
-    from place_order import get_order_data
     from ..services.order_stock_db import get_order_stocks_df
 
     df = await get_order_stocks_df()
     if df is None or df.empty:
         _save_order_final(False, 0, 0, 0, 0, "No order stocks in Postgres")
-        return [], []
+        return []
 
     all_rows = await get_gsheet_stocks_df(df)
     if not all_rows:
         _save_order_final(False, 0, 0, 0, 0, "No rows found")
-        return [], []
+        return []
 
     valid_rows = _filter_valid_order_rows(all_rows)
     if not valid_rows:
         _save_order_final(False, 0, 0, 0, 0, "No rows with valid BUY/SELL prices. Fetch quotes first.")
-        return [], []
+        return []
 
-    all_orders = await get_order_data(valid_rows)
-    return all_orders, valid_rows
+    return valid_rows
 
 
 async def _prepare_orders_gsheet():
     from gsheet_stock_get import GSheetStockClient
     from get_quote import get_gsheet_stocks_df
-    from place_order import get_order_data
 
     base_url = _get_env("BASE_SHEET_URL")
     gid = _get_env("sheet_gid")
     if not base_url or not gid:
         _save_order_final(False, 0, 0, 0, 0, "Missing BASE_SHEET_URL or sheet_gid")
-        return [], []
+        return []
 
     sheet_url = f"{base_url}{gid}"
     client = GSheetStockClient()
     df = await client.get_stock_dataframe(sheet_url)
     if df is None or df.empty:
         _save_order_final(False, 0, 0, 0, 0, "No data in sheet")
-        return [], []
+        return []
 
     all_rows = await get_gsheet_stocks_df(df)
     if not all_rows:
         _save_order_final(False, 0, 0, 0, 0, "No rows in sheet")
-        return [], []
+        return []
 
     valid_rows = _filter_valid_order_rows(all_rows)
     if not valid_rows:
         _save_order_final(False, 0, 0, 0, 0, "No rows with valid BUY/SELL prices. Fetch quotes first.")
-        return [], []
+        return []
 
-    all_orders = await get_order_data(valid_rows)
-    return all_orders, valid_rows
+    return valid_rows
 
 
 @router.post("/execute/all")
@@ -713,13 +789,16 @@ async def remove_order_stock(symbol: str):
 # ─── Master Scrip Sync (Kotak API → order_stocks tokens) ───
 
 @router.post("/sync_master_scrip")
-async def sync_master_scrip():
-    """Fetch Kotak master scrip CSVs (nse_cm + bse_cm) and sync exchange tokens into order_stocks."""
+async def sync_master_scrip(force: bool = False):
+    """
+    Fetch Kotak master scrip CSVs (nse_cm + bse_cm) and sync exchange tokens into order_stocks.
+    Same-day repeats reuse the local index; pass ?force=true to re-download.
+    """
     if _order_source() != "postgres":
         return {"success": False, "message": "Sync only available when ORDER_DATA_SOURCE=postgres"}
     try:
         from ..services.master_scrip_sync import sync_master_scrip_to_order_stocks
-        result = await sync_master_scrip_to_order_stocks()
+        result = await sync_master_scrip_to_order_stocks(force=force)
         return result
     except Exception as e:
         logger.exception(f"Error syncing master scrip: {e}")
@@ -737,6 +816,13 @@ async def get_run_statuses():
     }
 
 
+@router.get("/rate-limits")
+async def get_rate_limits():
+    """Kotak API budget in use by this process (shared quote/order token buckets)."""
+    from broker_rate_limiter import rate_limiter_snapshots
+    return {"limiters": rate_limiter_snapshots()}
+
+
 @router.get("/order-progress")
 async def get_order_progress():
     """Poll current order placement progress (Redis fallback when WebSocket is down)."""
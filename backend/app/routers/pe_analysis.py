@@ -11,14 +11,18 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import text
 from typing import Optional
 
+from ..config import get_settings
 from ..database import get_db
 from ..cache import cached, cache_get, cache_set
 from ..cache_keys import invalidate_pe_analysis
+from ..pagination import cached_total, decode_cursor, keyset_condition, split_page
 from ..constants import (
-    VALUATION_OPTIONS, VALUATION_VALUES, canonicalize_valuation, valuation_tone,
+    VALUATION_OPTIONS, VALUATION_VALUES, VALUATION_LEGACY_ALIASES, canonicalize_valuation,
     VALUATION_TONE_BULLISH, VALUATION_TONE_BEARISH,
 )
-from worker.tasks.extraction import run_quarterly_extraction
+from worker.tasks.extraction_pipeline import queue_quarterly_extraction
+from ..services.ai_result_cache import invalidate_ai_results
+from ..services.pdf_cache import known_pdf_digest
 from ..services.audit_log import log_pe_action
 
 router = APIRouter(prefix="/api", tags=["pe_analysis"])
@@ -28,10 +32,6 @@ router = APIRouter(prefix="/api", tags=["pe_analysis"])
 DEDUP_ENABLED = True
 
 
-def _quarter_index(q: str) -> int:
-    return {"Q1": 1, "Q2": 2, "Q3": 3, "Q4": 4}.get(q, 0)
-
-
 def _fy_to_year(fy: str) -> int:
     """Normalize any financial_year format to ending calendar year number.
     '2026'->2026, 'FY26'->2026, 'FY2025-26'->2026, '2025-26'->2026."""
@@ -56,20 +56,6 @@ def _fy_to_year(fy: str) -> int:
     return 0
 
 
-def _resolved_symbol_sql(qr: str = "qr", s1: str = "s1", s2: str = "s2") -> str:
-    """Canonical NSE symbol for a quarterly_results row.
-
-    Numeric stock_symbol values are BSE scrip codes and must resolve via
-    bse_token (s2). Using COALESCE(s1, s2) first would match a stocks row whose
-    symbol is the scrip code (e.g. 524091) instead of the NSE ticker (CARYSIL).
-    """
-    return f"""CASE
-      WHEN {qr}.stock_symbol ~ '^\\d+$'
-        THEN COALESCE({s2}.symbol, {qr}.stock_symbol)
-      ELSE COALESCE({s1}.symbol, {qr}.stock_symbol)
-    END"""
-
-
 def _resolved_stock_field_sql(field: str, qr: str = "qr", s1: str = "s1", s2: str = "s2") -> str:
     """Resolve a stocks column using the same numeric-vs-NSE join priority."""
     return f"""CASE
@@ -101,161 +87,140 @@ def _resolved_market_segment_sql(qr: str = "qr", s1: str = "s1", s2: str = "s2")
     END"""
 
 
-def _dedup_history(history: list[dict]) -> list[dict]:
-    """Keep only the latest row per (quarter, normalized_fy) combo."""
-    seen: dict[tuple, dict] = {}
-    for h in history:
-        key = (h.get("quarter"), _fy_to_year(h.get("financial_year", "")))
-        existing = seen.get(key)
-        if existing is None or h.get("id", 0) > existing.get("id", 0):
-            seen[key] = h
-    return list(seen.values())
-
-
-def _compute_derived_fields(row: dict, history: list[dict]) -> dict:
-    """Compute EPS Q/Q, Y/Y, Cum EPS, Cum Prev FY, Prev FY EPS, FY EPS Est with labels."""
-    qtr = row.get("quarter", "")
-    fy = row.get("financial_year", "")
-    qi = _quarter_index(qtr)
-    fy_year = _fy_to_year(fy)
-
-    deduped = _dedup_history(history)
-
-    same_fy = [h for h in deduped if _fy_to_year(h.get("financial_year", "")) == fy_year]
-    same_fy_sorted = sorted(same_fy, key=lambda x: _quarter_index(x.get("quarter", "")))
-
-    prev_fy_year = fy_year - 1 if fy_year > 0 else 0
-    prev_fy_rows = [h for h in deduped if _fy_to_year(h.get("financial_year", "")) == prev_fy_year]
-    prev_fy_sorted = sorted(prev_fy_rows, key=lambda x: _quarter_index(x.get("quarter", "")))
-
-    # EPS Q/Q: raw EPS value of previous quarter in same FY
-    eps_qoq = None
-    eps_qoq_label = ""
-    if qi > 1:
-        prev_q = f"Q{qi - 1}"
-        prev_row = next((h for h in same_fy if h.get("quarter") == prev_q), None)
-        if prev_row and prev_row.get("qtr_eps") is not None:
-            eps_qoq = round(prev_row["qtr_eps"], 2)
-            eps_qoq_label = prev_q
-
-    # EPS Y/Y: raw EPS value of same quarter in prev FY
-    eps_yoy = None
-    eps_yoy_label = ""
-    if prev_fy_year > 0:
-        same_q_prev = next((h for h in prev_fy_rows if h.get("quarter") == qtr), None)
-        if same_q_prev and same_q_prev.get("qtr_eps") is not None:
-            eps_yoy = round(same_q_prev["qtr_eps"], 2)
-            eps_yoy_label = f"Prev {qtr}"
-
-    # Cumulative EPS: for Q1-Q3 use stored cum_eps; for Q4 use FY row or sum Q1-Q4
-    cum_eps = None
-    cum_eps_label = ""
-    if qi > 0 and qi < 4:
-        stored_cum = row.get("cum_eps_stored")
-        if stored_cum is not None:
-            cum_eps = round(stored_cum, 2)
-        else:
-            cur_q_hist = next((h for h in same_fy if h.get("quarter") == qtr), None)
-            if cur_q_hist and cur_q_hist.get("cum_eps") is not None:
-                cum_eps = round(cur_q_hist["cum_eps"], 2)
-            else:
-                vals = [h.get("qtr_eps") for h in same_fy_sorted
-                        if _quarter_index(h.get("quarter", "")) <= qi and h.get("qtr_eps") is not None]
-                if vals:
-                    cum_eps = round(sum(vals), 2)
-        cum_eps_label = f"N{qi * 3}"
-    elif qi == 4:
-        fy_row = next((h for h in same_fy if h.get("quarter") == "FY"), None)
-        if fy_row and fy_row.get("qtr_eps") is not None:
-            cum_eps = round(fy_row["qtr_eps"], 2)
-        else:
-            vals = [h.get("qtr_eps") for h in same_fy_sorted
-                    if h.get("quarter") in ("Q1", "Q2", "Q3", "Q4") and h.get("qtr_eps") is not None]
-            if len(vals) == 4:
-                cum_eps = round(sum(vals), 2)
-        cum_eps_label = "N12"
-
-    # Cumulative Prev FY: for Q1-Q3 use stored cum_eps from prev FY history; for Q4 use FY row or sum
-    cum_prev_fy = None
-    cum_prev_fy_label = ""
-    if qi > 0 and prev_fy_rows:
-        if qi < 4:
-            prev_q_match = next((h for h in prev_fy_rows if h.get("quarter") == qtr), None)
-            if prev_q_match and prev_q_match.get("cum_eps") is not None:
-                cum_prev_fy = round(prev_q_match["cum_eps"], 2)
-            else:
-                vals = [h.get("qtr_eps") for h in prev_fy_sorted
-                        if _quarter_index(h.get("quarter", "")) <= qi and h.get("qtr_eps") is not None]
-                if vals:
-                    cum_prev_fy = round(sum(vals), 2)
-            cum_prev_fy_label = f"Prev N{qi * 3}"
-        else:
-            fy_row_prev = next((h for h in prev_fy_rows if h.get("quarter") == "FY"), None)
-            if fy_row_prev and fy_row_prev.get("qtr_eps") is not None:
-                cum_prev_fy = round(fy_row_prev["qtr_eps"], 2)
-            else:
-                vals = [h.get("qtr_eps") for h in prev_fy_sorted
-                        if h.get("quarter") in ("Q1", "Q2", "Q3", "Q4") and h.get("qtr_eps") is not None]
-                if len(vals) == 4:
-                    cum_prev_fy = round(sum(vals), 2)
-            cum_prev_fy_label = "Prev N12"
-
-    # Prev FY EPS: full year sum of previous FY
-    prev_fy_eps = None
-    prev_fy_eps_label = "Prev FY"
-    if prev_fy_sorted:
-        # Check if there's an FY row with stored cum_eps
-        fy_row = next((h for h in prev_fy_rows if h.get("quarter") == "FY"), None)
-        if fy_row and fy_row.get("qtr_eps") is not None:
-            prev_fy_eps = round(fy_row["qtr_eps"], 2)
-        else:
-            vals = [h.get("qtr_eps") for h in prev_fy_sorted
-                    if h.get("quarter") in ("Q1", "Q2", "Q3", "Q4") and h.get("qtr_eps") is not None]
-            if len(vals) == 4:
-                prev_fy_eps = round(sum(vals), 2)
-
-    # FY EPS Estimated: use stored fy_eps_stored if available, else compute using formula
-    fy_eps_est = None
-    has_consolidated = row.get("fy_from_consolidated", False) or row.get("eps_diluted_consolidated") is not None or row.get("eps_basic_consolidated") is not None
-    fy_eps_est_label = "FY (C)" if has_consolidated else "FY (S)"
-    stored_fy = row.get("fy_eps_stored")
-    if stored_fy is not None:
-        fy_eps_est = round(stored_fy, 2)
-    elif qi > 0:
-        # Compute using best available cumulative: prefer N9*4/3, then N6*2, then N3*4, then N12
-        n9_row = next((h for h in same_fy if h.get("quarter") == "Q3"), None)
-        n6_row = next((h for h in same_fy if h.get("quarter") == "Q2"), None)
-        n3_row = next((h for h in same_fy if h.get("quarter") == "Q1"), None)
-
-        if qi >= 3 and n9_row and n9_row.get("cum_eps") is not None:
-            fy_eps_est = round(n9_row["cum_eps"] * 4 / 3, 2)
-        elif qi >= 2 and n6_row and n6_row.get("cum_eps") is not None:
-            fy_eps_est = round(n6_row["cum_eps"] * 2, 2)
-        elif n3_row and n3_row.get("cum_eps") is not None:
-            fy_eps_est = round(n3_row["cum_eps"] * 4, 2)
-        elif cum_eps is not None:
-            if qi == 1:
-                fy_eps_est = round(cum_eps * 4, 2)
-            elif qi == 2:
-                fy_eps_est = round(cum_eps * 2, 2)
-            elif qi == 3:
-                fy_eps_est = round(cum_eps * 4 / 3, 2)
-            elif qi == 4:
-                fy_eps_est = cum_eps
-
-    row["eps_qoq"] = eps_qoq
-    row["eps_qoq_label"] = eps_qoq_label
-    row["eps_yoy"] = eps_yoy
-    row["eps_yoy_label"] = eps_yoy_label
-    row["cum_eps"] = cum_eps
-    row["cum_eps_label"] = cum_eps_label
-    row["cum_prev_fy"] = cum_prev_fy
-    row["cum_prev_fy_label"] = cum_prev_fy_label
-    row["prev_fy_eps"] = prev_fy_eps
-    row["prev_fy_eps_label"] = prev_fy_eps_label
-    row["fy_eps_estimated"] = fy_eps_est
-    row["fy_eps_est_label"] = fy_eps_est_label
-    return row
+def _pe_row_columns_sql() -> str:
+    """SELECT list for one PE list row (qr.* + EPS picks + stocks fields); needs qr/s1/s2."""
+    return f"""qr.*,
+            COALESCE(qr.eps_diluted_consolidated, qr.eps_basic_consolidated,
+                     qr.eps_diluted_standalone, qr.eps_basic_standalone) AS qtr_eps,
+            COALESCE(qr.cumulative_eps_diluted_consolidated, qr.cumulative_eps_basic_consolidated,
+                     qr.cumulative_eps_diluted_standalone, qr.cumulative_eps_basic_standalone) AS cum_eps_stored,
+            COALESCE(
+              qr.fy_eps_diluted_consolidated, qr.fy_eps_basic_consolidated,
+              qr.fy_eps_diluted_standalone, qr.fy_eps_basic_standalone
+            ) AS fy_eps_stored,
+            (qr.fy_eps_diluted_consolidated IS NOT NULL
+             OR qr.fy_eps_basic_consolidated IS NOT NULL) AS fy_from_consolidated,
+            qr.canonical_symbol AS resolved_symbol,
+            {_resolved_stock_field_sql("sector")} AS sector,
+            {_resolved_stock_field_sql("sub_sector")} AS sub_sector,
+            {_resolved_market_segment_sql()} AS market_segment"""
+
+
+_STOCKS_JOIN_SQL = """
+          LEFT JOIN stocks s1 ON s1.symbol = qr.stock_symbol
+          LEFT JOIN stocks s2 ON s2.bse_token = CASE
+            WHEN qr.stock_symbol ~ '^\\d+$' THEN CAST(qr.stock_symbol AS INT)
+          END"""
+
+
+_QTR_EPS_SQL = """COALESCE(h.eps_diluted_consolidated, h.eps_basic_consolidated,
+                       h.eps_diluted_standalone, h.eps_basic_standalone)"""
+_CUM_EPS_SQL = """COALESCE(h.cumulative_eps_diluted_consolidated, h.cumulative_eps_basic_consolidated,
+                       h.cumulative_eps_diluted_standalone, h.cumulative_eps_basic_standalone)"""
+
+
+def _r2(expr: str) -> str:
+    return f"CAST(ROUND(CAST({expr} AS NUMERIC), 2) AS DOUBLE PRECISION)"
+
+
+def _by_quarter(values: dict[str, str]) -> str:
+    """CASE on the page row's quarter; quarters not listed give NULL."""
+    whens = " ".join(f"WHEN '{q}' THEN {v}" for q, v in values.items())
+    return f"CASE p.quarter {whens} END"
+
+
+def _eps_sum_sql(fy: str, upto: int, require_all: bool) -> str:
+    """Q1..Q<upto> EPS of one fy pivot row: sum of those present, or NULL unless all present."""
+    cols = [f"{fy}.q{i}_eps" for i in range(1, upto + 1)]
+    guard = (" AND " if require_all else " OR ").join(f"{c} IS NOT NULL" for c in cols)
+    return f"CASE WHEN {guard} THEN {' + '.join(f'COALESCE({c}, 0)' for c in cols)} END"
+
+
+def _cum_sql(fy: str, stored: Optional[str] = None) -> str:
+    """N3/N6/N9: stored cumulative, else the quarter's history cumulative, else sum so far. N12: FY row, else Q1-Q4."""
+    values = {
+        f"Q{i}": f"COALESCE({stored + ', ' if stored else ''}{fy}.q{i}_cum, {_eps_sum_sql(fy, i, False)})"
+        for i in (1, 2, 3)
+    }
+    values["Q4"] = f"COALESCE({fy}.fy_eps, {_eps_sum_sql(fy, 4, True)})"
+    return _by_quarter(values)
+
+
+def _pe_derived_sql(page_sql: str, order_by: str) -> str:
+    """
+    Wrap a PE page query (CTE `p`) with the derived EPS columns: Q/Q, Y/Y,
+    cumulative (N3..N12), previous-FY cumulative and full year, FY estimate.
+
+    History is the stock's completed / reviewed rows with a quarterly EPS,
+    latest id per (quarter, fy_year) (migration 017), pivoted to one row per
+    (stock, fy_year). Each page row then joins its own FY (`cur`) and the one
+    before (`prev`). That is one statement for the whole page, with no per-row
+    Python.
+    """
+    cum_eps = _r2(_cum_sql("cur", "p.cum_eps_stored"))
+    eps_qoq = _by_quarter({"Q2": "cur.q1_eps", "Q3": "cur.q2_eps", "Q4": "cur.q3_eps"})
+    eps_yoy = _by_quarter({q: f"prev.{q.lower()}_eps" for q in ("Q1", "Q2", "Q3", "Q4", "FY")})
+    n_labels = {"Q1": "'N3'", "Q2": "'N6'", "Q3": "'N9'", "Q4": "'N12'"}
+    return f"""
+        WITH p AS ({page_sql}),
+        hist AS (
+          SELECT stock_symbol, fy_year, quarter, qtr_eps, cum_eps
+          FROM (
+            SELECT h.stock_symbol, h.fy_year, h.quarter,
+              {_QTR_EPS_SQL} AS qtr_eps,
+              {_CUM_EPS_SQL} AS cum_eps,
+              ROW_NUMBER() OVER (PARTITION BY h.stock_symbol, h.quarter, h.fy_year ORDER BY h.id DESC) AS hrn
+            FROM quarterly_results h
+            WHERE h.stock_symbol IN (SELECT stock_symbol FROM p)
+              AND (h.extraction_status = 'completed' OR h.user_reviewed = TRUE)
+              AND {_QTR_EPS_SQL} IS NOT NULL
+          ) x
+          WHERE hrn = 1
+        ),
+        fy AS (
+          SELECT stock_symbol, fy_year,
+            MAX(qtr_eps) FILTER (WHERE quarter = 'Q1') AS q1_eps,
+            MAX(qtr_eps) FILTER (WHERE quarter = 'Q2') AS q2_eps,
+            MAX(qtr_eps) FILTER (WHERE quarter = 'Q3') AS q3_eps,
+            MAX(qtr_eps) FILTER (WHERE quarter = 'Q4') AS q4_eps,
+            MAX(qtr_eps) FILTER (WHERE quarter = 'FY') AS fy_eps,
+            MAX(cum_eps) FILTER (WHERE quarter = 'Q1') AS q1_cum,
+            MAX(cum_eps) FILTER (WHERE quarter = 'Q2') AS q2_cum,
+            MAX(cum_eps) FILTER (WHERE quarter = 'Q3') AS q3_cum
+          FROM hist
+          GROUP BY stock_symbol, fy_year
+        )
+        SELECT p.*,
+          {_r2(eps_qoq)} AS eps_qoq,
+          CASE WHEN {eps_qoq} IS NOT NULL
+            THEN {_by_quarter({"Q2": "'Q1'", "Q3": "'Q2'", "Q4": "'Q3'"})} ELSE '' END AS eps_qoq_label,
+          {_r2(eps_yoy)} AS eps_yoy,
+          CASE WHEN {eps_yoy} IS NOT NULL THEN 'Prev ' || p.quarter ELSE '' END AS eps_yoy_label,
+          {cum_eps} AS cum_eps,
+          COALESCE({_by_quarter(n_labels)}, '') AS cum_eps_label,
+          {_r2(_cum_sql("prev"))} AS cum_prev_fy,
+          CASE WHEN prev.stock_symbol IS NOT NULL
+            THEN COALESCE('Prev ' || {_by_quarter(n_labels)}, '') ELSE '' END AS cum_prev_fy_label,
+          {_r2(f"COALESCE(prev.fy_eps, {_eps_sum_sql('prev', 4, True)})")} AS prev_fy_eps,
+          'Prev FY' AS prev_fy_eps_label,
+          CASE
+            WHEN p.fy_eps_stored IS NOT NULL THEN {_r2("p.fy_eps_stored")}
+            WHEN p.quarter NOT IN ('Q1', 'Q2', 'Q3', 'Q4') THEN NULL
+            WHEN p.quarter IN ('Q3', 'Q4') AND cur.q3_cum IS NOT NULL THEN {_r2("cur.q3_cum * 4 / 3")}
+            WHEN p.quarter IN ('Q2', 'Q3', 'Q4') AND cur.q2_cum IS NOT NULL THEN {_r2("cur.q2_cum * 2")}
+            WHEN cur.q1_cum IS NOT NULL THEN {_r2("cur.q1_cum * 4")}
+            ELSE {_r2(_by_quarter({"Q1": f"{cum_eps} * 4", "Q2": f"{cum_eps} * 2",
+                                   "Q3": f"{cum_eps} * 4 / 3", "Q4": cum_eps}))}
+          END AS fy_eps_estimated,
+          CASE WHEN p.fy_from_consolidated OR p.eps_diluted_consolidated IS NOT NULL
+                    OR p.eps_basic_consolidated IS NOT NULL
+            THEN 'FY (C)' ELSE 'FY (S)' END AS fy_eps_est_label
+        FROM p
+        LEFT JOIN fy cur ON cur.stock_symbol = p.stock_symbol AND cur.fy_year = p.fy_year
+        LEFT JOIN fy prev ON prev.stock_symbol = p.stock_symbol AND p.fy_year > 1
+                          AND prev.fy_year = p.fy_year - 1
+        ORDER BY {order_by}
+    """
 
 
 @router.get("/pe_analysis")
@@ -275,10 +240,12 @@ async def get_pe_analysis(
     segment: Optional[str] = None,
     sort_by: Optional[str] = None,
     sort_dir: Optional[str] = None,
+    cursor: Optional[str] = Query(None, description="Keyset mode: empty for the first page, then next_cursor"),
     db: AsyncSession = Depends(get_db),
 ):
-    """Paginated PE analysis results with computed fields."""
-    cache_key = f"pe:list:{valuation_filter}:{page}:{per_page}:{year}:{quarter}:{exchange}:{sector}:{search}:{date_from}:{date_to}:{valuation}:{signal}:{segment}:{sort_by}:{sort_dir}"
+    """Paginated PE analysis results with computed fields (page or cursor mode)."""
+    filter_key = f"{valuation_filter}:{year}:{quarter}:{exchange}:{sector}:{search}:{date_from}:{date_to}:{valuation}:{signal}:{segment}"
+    cache_key = f"pe:list:{filter_key}:{page}:{per_page}:{sort_by}:{sort_dir}:{cursor}"
     cached_result = await cache_get(cache_key)
     if cached_result:
         return cached_result
@@ -297,17 +264,12 @@ async def get_pe_analysis(
         scope_conditions.append("(qr.valuation IS NULL OR qr.valuation = '')")
         if DEDUP_ENABLED:
             # Hide rows whose resolved_symbol+quarter+FY already has a reviewed row
-            scope_conditions.append(f"""
+            scope_conditions.append("""
                 NOT EXISTS (
                     SELECT 1 FROM quarterly_results r
-                    LEFT JOIN stocks rs1 ON rs1.symbol = r.stock_symbol
-                    LEFT JOIN stocks rs2 ON rs2.bse_token = CASE
-                        WHEN r.stock_symbol ~ '^\\d+$' THEN CAST(r.stock_symbol AS INT)
-                    END
-                    WHERE {_resolved_symbol_sql("r", "rs1", "rs2")}
-                        = {_resolved_symbol_sql("qr", "s1", "s2")}
+                    WHERE r.canonical_symbol = qr.canonical_symbol
                       AND r.quarter = qr.quarter
-                      AND RIGHT(r.financial_year, 2) = RIGHT(qr.financial_year, 2)
+                      AND r.canonical_fy_suffix = qr.canonical_fy_suffix
                       AND r.valuation IS NOT NULL AND r.valuation != ''
                       AND (r.extraction_status = 'completed' OR r.user_reviewed = TRUE)
                 )
@@ -326,6 +288,8 @@ async def get_pe_analysis(
         scope_conditions.append("(qr.extraction_status = 'completed' OR qr.user_reviewed = TRUE)")
     elif valuation_filter == "failed":
         scope_conditions.append("qr.extraction_status IN ('failed', 'error')")
+    # Everything appended from here on is a user filter
+    n_scope = len(scope_conditions)
     if year:
         year_num = _fy_to_year(year)
         if year_num:
@@ -389,8 +353,8 @@ async def get_pe_analysis(
     # only picks the best representative when dual-listed duplicates exist.
     # PE Pending ranking: prefer completed extraction, latest announcement.
     if valuation_filter == "reviewed":
-        rn_order = f"""
-              PARTITION BY {_resolved_symbol_sql()}, qr.quarter, RIGHT(qr.financial_year, 2)
+        rn_order = """
+              PARTITION BY qr.canonical_symbol, qr.quarter, qr.canonical_fy_suffix
               ORDER BY
                 CASE WHEN qr.recommendation IS NOT NULL AND qr.recommendation != '' THEN 0 ELSE 1 END,
                 CASE WHEN qr.target_price IS NOT NULL THEN 0 ELSE 1 END,
@@ -399,8 +363,8 @@ async def get_pe_analysis(
                 qr.announcement_date DESC NULLS LAST,
                 qr.id DESC"""
     else:
-        rn_order = f"""
-              PARTITION BY {_resolved_symbol_sql()}, qr.quarter, RIGHT(qr.financial_year, 2)
+        rn_order = """
+              PARTITION BY qr.canonical_symbol, qr.quarter, qr.canonical_fy_suffix
               ORDER BY
                 CASE WHEN qr.extraction_status = 'completed' OR qr.user_reviewed = TRUE THEN 0 ELSE 1 END,
                 qr.announcement_date DESC NULLS LAST,
@@ -408,28 +372,11 @@ async def get_pe_analysis(
 
     dedup_cte = f"""
         WITH ranked AS (
-          SELECT qr.*,
-            COALESCE(qr.eps_diluted_consolidated, qr.eps_basic_consolidated,
-                     qr.eps_diluted_standalone, qr.eps_basic_standalone) AS qtr_eps,
-            COALESCE(qr.cumulative_eps_diluted_consolidated, qr.cumulative_eps_basic_consolidated,
-                     qr.cumulative_eps_diluted_standalone, qr.cumulative_eps_basic_standalone) AS cum_eps_stored,
-            COALESCE(
-              qr.fy_eps_diluted_consolidated, qr.fy_eps_basic_consolidated,
-              qr.fy_eps_diluted_standalone, qr.fy_eps_basic_standalone
-            ) AS fy_eps_stored,
-            (qr.fy_eps_diluted_consolidated IS NOT NULL
-             OR qr.fy_eps_basic_consolidated IS NOT NULL) AS fy_from_consolidated,
-            {_resolved_symbol_sql()} AS resolved_symbol,
-            {_resolved_stock_field_sql("sector")} AS sector,
-            {_resolved_stock_field_sql("sub_sector")} AS sub_sector,
-            {_resolved_market_segment_sql()} AS market_segment,
+          SELECT {_pe_row_columns_sql()},
             ROW_NUMBER() OVER ({rn_order}
             ) AS rn
           FROM quarterly_results qr
-          LEFT JOIN stocks s1 ON s1.symbol = qr.stock_symbol
-          LEFT JOIN stocks s2 ON s2.bse_token = CASE
-            WHEN qr.stock_symbol ~ '^\\d+$' THEN CAST(qr.stock_symbol AS INT)
-          END
+          {_STOCKS_JOIN_SQL}
           {where_inside}
         )
     """
@@ -438,57 +385,95 @@ async def get_pe_analysis(
 
     rn_filter = "rn = 1" if DEDUP_ENABLED else "TRUE"
 
-    count_sql = f"""
-        {dedup_cte}
-        SELECT COUNT(*) FROM ranked WHERE {rn_filter} {outer_where}
-    """
-    count_row = await db.execute(text(count_sql), params)
-    total = count_row.scalar()
-
     allowed_sort = {"date": "COALESCE(announcement_date, created_at)"}
     sort_col = allowed_sort.get(sort_by or "", "COALESCE(announcement_date, created_at)")
     sort_direction = "ASC" if sort_dir == "asc" else "DESC"
 
-    data_sql = f"""
-        {dedup_cte}
-        SELECT * FROM ranked WHERE {rn_filter} {outer_where}
-        ORDER BY {sort_col} {sort_direction}
-        LIMIT :limit OFFSET :offset
-    """
-    rows = await db.execute(text(data_sql), params)
+    # Cursor mode: continue after the (sort timestamp, id) of the previous page's last row
+    after = decode_cursor(cursor, 2) if cursor is not None else None
+    if cursor is not None:
+        params.pop("offset")
+        params["limit"] = per_page + 1
+        page_clause = "LIMIT :limit"
+    else:
+        page_clause = "LIMIT :limit OFFSET :offset"
+
+    has_user_filters = len(scope_conditions) > n_scope or bool(segment)
+    if (DEDUP_ENABLED and get_settings().PE_BOARD_ENABLED and valuation_filter in ("pending", "reviewed")
+            and not has_user_filters):
+        # pe_board (migration 015) already holds the winning row per (canonical symbol, quarter, FY):
+        # no window, no NOT EXISTS — an indexed walk of the board in sort_ts order. The board ranks
+        # over the whole group, so it only serves the unfiltered tabs; with user filters the CTE
+        # below ranks within the filtered rows (e.g. exchange=NSE still shows a dual-listed stock
+        # whose BSE row wins overall).
+        params["board_view"] = valuation_filter
+        board_from = f"""
+          FROM pe_board b
+          JOIN quarterly_results qr ON qr.id = b.qr_id
+          {_STOCKS_JOIN_SQL}
+          WHERE b.view = :board_view
+        """
+        keyset = keyset_condition(["b.sort_ts", "b.qr_id"], after, sort_direction == "DESC", params)
+        count_sql = f"SELECT COUNT(*) {board_from}"
+        data_sql = f"""
+            SELECT {_pe_row_columns_sql()}, 1 AS rn
+            {board_from}
+              AND {keyset}
+            ORDER BY b.sort_ts {sort_direction}, b.qr_id {sort_direction}
+            {page_clause}
+        """
+    else:
+        keyset = keyset_condition([sort_col, "id"], after, sort_direction == "DESC", params)
+        count_sql = f"""
+            {dedup_cte}
+            SELECT COUNT(*) FROM ranked WHERE {rn_filter} {outer_where}
+        """
+        # id tie-break only in cursor mode, so page mode keeps its existing order
+        order_by = f"{sort_col} {sort_direction}, id {sort_direction}" if cursor is not None else f"{sort_col} {sort_direction}"
+        data_sql = f"""
+            {dedup_cte}
+            SELECT * FROM ranked WHERE {rn_filter} {outer_where} AND {keyset}
+            ORDER BY {order_by}
+            {page_clause}
+        """
+
+    async def _count() -> int:
+        count_row = await db.execute(text(count_sql), params)
+        return count_row.scalar()
+
+    if cursor is not None:
+        # Totals change only on PE writes, which clear pe:* — cache per filter set
+        total, total_estimated = await cached_total(f"pe:count:{filter_key}", _count)
+    else:
+        total = await _count()
+
+    # Derived EPS columns in the same statement; re-apply the page order on top
+    page_order = f"{sort_col} {sort_direction}, p.id {sort_direction}"
+    rows = await db.execute(text(_pe_derived_sql(data_sql, page_order)), params)
     results = [dict(r._mapping) for r in rows.fetchall()]
 
-    # Fetch history for all symbols in this page to compute derived fields
-    symbols = list({r["stock_symbol"] for r in results if r.get("stock_symbol")})
-    history_map: dict[str, list[dict]] = {s: [] for s in symbols}
-
-    if symbols:
-        hist_rows = await db.execute(text("""
-            SELECT id, stock_symbol, quarter, financial_year,
-              COALESCE(eps_diluted_consolidated, eps_basic_consolidated,
-                       eps_diluted_standalone, eps_basic_standalone) AS qtr_eps,
-              COALESCE(cumulative_eps_diluted_consolidated, cumulative_eps_basic_consolidated,
-                       cumulative_eps_diluted_standalone, cumulative_eps_basic_standalone) AS cum_eps
-            FROM quarterly_results
-            WHERE stock_symbol = ANY(:syms) AND (extraction_status = 'completed' OR user_reviewed = TRUE)
-            ORDER BY stock_symbol, financial_year, quarter, id
-        """), {"syms": symbols})
-        for h in hist_rows.fetchall():
-            hd = dict(h._mapping)
-            if hd.get("qtr_eps") is not None:
-                history_map.setdefault(hd["stock_symbol"], []).append(hd)
-
-    for row in results:
-        sym = row.get("stock_symbol", "")
-        _compute_derived_fields(row, history_map.get(sym, []))
-
-    response = {
-        "results": results,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "total_pages": (total + per_page - 1) // per_page,
-    }
+    next_cursor = None
+    if cursor is not None:
+        results, next_cursor = split_page(
+            results, per_page, lambda r: (r["announcement_date"] or r["created_at"], r["id"])
+        )
+
+    if cursor is not None:
+        response = {
+            "results": results,
+            "total": total,
+            "total_estimated": total_estimated,
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+        }
+    else:
+        response = {
+            "results": results,
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "total_pages": (total + per_page - 1) // per_page,
+        }
 
     await cache_set(cache_key, response, ttl=15)
     return response
@@ -657,7 +642,7 @@ async def bulk_ignore_pe(body: dict, request: Request, db: AsyncSession = Depend
     # Propagate IGNORE to sibling rows (same resolved_symbol + quarter + FY)
     # so dual-listed / revised filing counterparts don't remain as ghost pending.
     if DEDUP_ENABLED and result.rowcount > 0:
-        await db.execute(text(f"""
+        await db.execute(text("""
             UPDATE quarterly_results
             SET valuation = 'ignore', user_reviewed = TRUE, updated_at = NOW(),
                 reviewed_at = COALESCE(reviewed_at, NOW()),
@@ -668,18 +653,10 @@ async def bulk_ignore_pe(body: dict, request: Request, db: AsyncSession = Depend
               AND id NOT IN (SELECT UNNEST(:ids))
               AND EXISTS (
                   SELECT 1 FROM quarterly_results src
-                  LEFT JOIN stocks ss1 ON ss1.symbol = src.stock_symbol
-                  LEFT JOIN stocks ss2 ON ss2.bse_token = CASE
-                      WHEN src.stock_symbol ~ '^\\d+$' THEN CAST(src.stock_symbol AS INT) END
-                  LEFT JOIN stocks ts1 ON ts1.symbol = quarterly_results.stock_symbol
-                  LEFT JOIN stocks ts2 ON ts2.bse_token = CASE
-                      WHEN quarterly_results.stock_symbol ~ '^\\d+$'
-                      THEN CAST(quarterly_results.stock_symbol AS INT) END
                   WHERE src.id = ANY(:ids)
-                    AND ({_resolved_symbol_sql("src", "ss1", "ss2")})
-                        = ({_resolved_symbol_sql("quarterly_results", "ts1", "ts2")})
+                    AND src.canonical_symbol = quarterly_results.canonical_symbol
                     AND src.quarter = quarterly_results.quarter
-                    AND RIGHT(src.financial_year, 2) = RIGHT(quarterly_results.financial_year, 2)
+                    AND src.canonical_fy_suffix = quarterly_results.canonical_fy_suffix
               )
         """), {"ids": int_ids})
 
@@ -808,23 +785,26 @@ async def get_pe_filters(db: AsyncSession = Depends(get_db)):
     return result
 
 
-@router.get("/pe_analysis/report_summary")
-async def get_report_summary(
-    db: AsyncSession = Depends(get_db),
-    year: Optional[str] = Query(None),
-    quarter: Optional[str] = Query(None),
-    exchange: Optional[str] = Query(None),
-    sector: Optional[str] = Query(None),
-):
-    """Aggregated analytics report — all computation server-side."""
-    cache_key = f"report:summary:{year or ''}:{quarter or ''}:{exchange or ''}:{sector or ''}"
-    cached_result = await cache_get(cache_key)
-    if cached_result:
-        return cached_result
+_PE_BUCKETS = [(0, 10), (10, 20), (20, 30), (30, 50), (50, 100), (100, 9999)]
 
-    conditions = ["qr.valuation IS NOT NULL", "qr.valuation != ''", "(qr.extraction_status = 'completed' OR qr.user_reviewed = TRUE)"]
-    params: dict = {}
 
+def _valuation_canon_sql(col: str = "qr.valuation") -> str:
+    """SQL twin of constants.canonicalize_valuation for a non-empty column."""
+    v = f"UPPER(BTRIM({col}))"
+    whens = " ".join(f"WHEN '{alias}' THEN '{canon}'" for alias, canon in VALUATION_LEGACY_ALIASES.items())
+    return f"CASE {v} {whens} ELSE {v} END"
+
+
+def _valuation_tone_sql(canon: str) -> str:
+    """SQL twin of constants.valuation_tone over an already-canonical expression."""
+    whens = " ".join(f"WHEN '{opt['value']}' THEN '{opt['tone']}'" for opt in VALUATION_OPTIONS)
+    return f"CASE {canon} {whens} END"
+
+
+def _report_latest_cte(year: Optional[str], quarter: Optional[str], exchange: Optional[str],
+                       sector: Optional[str], params: dict) -> str:
+    """`latest` CTE: each reviewed stock's most recent row in the report scope, one per symbol."""
+    conditions = ["qr.valuation IS NOT NULL", "qr.valuation != ''", "(qr.extraction_status = 'completed' OR qr.user_reviewed = TRUE)"]
     if year:
         fy_year = _fy_to_year(year)
         if fy_year:
@@ -837,77 +817,118 @@ async def get_report_summary(
         conditions.append("qr.exchange = :exchange")
         params["exchange"] = exchange
     if sector:
-        conditions.append("COALESCE(s.sector, '') ILIKE :sector")
-        params["sector"] = f"%{sector}%"
+        conditions.append("COALESCE(s.sector, '') ILIKE :sector_filter")
+        params["sector_filter"] = f"%{sector}%"
 
-    where_clause = " AND ".join(conditions)
+    return f"""
+        WITH latest AS (
+            SELECT DISTINCT ON (qr.stock_symbol)
+                qr.stock_symbol, qr.company_name, qr.pe, qr.cmp, qr.valuation,
+                qr.recommendation, qr.target_price, qr.financial_year, qr.quarter,
+                qr.exchange, qr.comments, qr.source_pdf_url,
+                COALESCE(s.sector, 'Unknown') AS sector,
+                COALESCE(NULLIF({_valuation_canon_sql()}, ''), 'UNKNOWN') AS valuation_canon
+            FROM quarterly_results qr
+            LEFT JOIN stocks s ON s.symbol = qr.stock_symbol
+            WHERE {" AND ".join(conditions)}
+            ORDER BY qr.stock_symbol, qr.financial_year DESC, qr.quarter DESC
+        )
+    """
 
-    rows = await db.execute(text(f"""
-        SELECT DISTINCT ON (qr.stock_symbol)
-            qr.stock_symbol, qr.company_name, qr.pe, qr.cmp, qr.valuation,
-            qr.recommendation, qr.target_price, qr.financial_year, qr.quarter,
-            qr.exchange, COALESCE(s.sector, 'Unknown') AS sector
-        FROM quarterly_results qr
-        LEFT JOIN stocks s ON s.symbol = qr.stock_symbol
-        WHERE {where_clause}
-        ORDER BY qr.stock_symbol, qr.financial_year DESC, qr.quarter DESC
-    """), params)
-    data = [dict(r._mapping) for r in rows.fetchall()]
 
-    if not data:
+@router.get("/pe_analysis/report_summary")
+async def get_report_summary(
+    db: AsyncSession = Depends(get_db),
+    year: Optional[str] = Query(None),
+    quarter: Optional[str] = Query(None),
+    exchange: Optional[str] = Query(None),
+    sector: Optional[str] = Query(None),
+):
+    """Aggregated analytics report — all computation in Postgres, three statements."""
+    cache_key = f"report:summary:{year or ''}:{quarter or ''}:{exchange or ''}:{sector or ''}"
+    cached_result = await cache_get(cache_key)
+    if cached_result:
+        return cached_result
+
+    params: dict = {}
+    latest = _report_latest_cte(year, quarter, exchange, sector, params)
+    bounds = ", ".join(str(lo) for lo, _ in _PE_BUCKETS) + f", {_PE_BUCKETS[-1][1]}"
+
+    # 1. Headline numbers + PE histogram (width_bucket i = [bounds[i-1], bounds[i]))
+    bucket_cols = ",\n".join(
+        f"COUNT(*) FILTER (WHERE width_bucket(pe, ARRAY[{bounds}]::float8[]) = {i}) AS b{i}"
+        for i in range(1, len(_PE_BUCKETS) + 1)
+    )
+    head = (await db.execute(text(f"""
+        {latest}
+        SELECT
+            (SELECT COUNT(*) FROM latest) AS total,
+            AVG(pe) AS avg_pe,
+            percentile_cont(0.5) WITHIN GROUP (ORDER BY pe) AS median_pe,
+            {bucket_cols}
+        FROM latest
+        WHERE pe > 0
+    """), params)).mappings().one()
+
+    if not head["total"]:
         return {"summary": {}, "pe_distribution": [], "valuation_counts": {},
                 "sector_summary": [], "top_cheapest": [], "top_expensive": []}
 
-    pe_values = [r["pe"] for r in data if r["pe"] and r["pe"] > 0]
-    avg_pe = sum(pe_values) / len(pe_values) if pe_values else 0
-    sorted_pe = sorted(pe_values)
-    median_pe = sorted_pe[len(sorted_pe) // 2] if sorted_pe else 0
+    pe_distribution = [
+        {"range": f"{lo}-{hi}" if hi < 9999 else f"{lo}+", "count": head[f"b{i}"]}
+        for i, (lo, hi) in enumerate(_PE_BUCKETS, start=1)
+    ]
 
-    valuation_counts: dict = {}
-    for r in data:
-        v = canonicalize_valuation(r.get("valuation")) or "UNKNOWN"
-        valuation_counts[v] = valuation_counts.get(v, 0) + 1
-
-    buckets = [(0, 10), (10, 20), (20, 30), (30, 50), (50, 100), (100, 9999)]
-    pe_distribution = []
-    for lo, hi in buckets:
-        label = f"{lo}-{hi}" if hi < 9999 else f"{lo}+"
-        count = sum(1 for p in pe_values if lo <= p < hi)
-        pe_distribution.append({"range": label, "count": count})
-
-    sector_map: dict = {}
-    for r in data:
-        sec = r.get("sector") or "Unknown"
-        if sec not in sector_map:
-            sector_map[sec] = {"sector": sec, "count": 0, "pe_sum": 0, "cheap": 0, "expensive": 0}
-        sector_map[sec]["count"] += 1
-        if r["pe"]:
-            sector_map[sec]["pe_sum"] += r["pe"]
-        tone = valuation_tone(r.get("valuation"))
-        if tone == VALUATION_TONE_BULLISH:
-            sector_map[sec]["cheap"] += 1
-        elif tone == VALUATION_TONE_BEARISH:
-            sector_map[sec]["expensive"] += 1
+    # 2. Valuation, signal and sector rollups in one pass (GROUPING SETS)
+    tone = _valuation_tone_sql("valuation_canon")
+    rollups = await db.execute(text(f"""
+        {latest}
+        SELECT
+            GROUPING(valuation_canon) = 0 AS by_valuation,
+            GROUPING(recommendation) = 0 AS by_signal,
+            valuation_canon, recommendation, sector,
+            COUNT(*) AS count,
+            COALESCE(SUM(pe), 0) / COUNT(*) AS avg_pe,
+            COUNT(*) FILTER (WHERE {tone} = '{VALUATION_TONE_BULLISH}') AS cheap,
+            COUNT(*) FILTER (WHERE {tone} = '{VALUATION_TONE_BEARISH}') AS expensive
+        FROM latest
+        GROUP BY GROUPING SETS ((valuation_canon), (recommendation), (sector))
+        ORDER BY count DESC, sector
+    """), params)
 
+    valuation_counts: dict = {}
+    signal_counts: dict = {}
     sector_summary = []
-    for s in sector_map.values():
-        s["avg_pe"] = s["pe_sum"] / s["count"] if s["count"] else 0
-        del s["pe_sum"]
-        sector_summary.append(s)
-    sector_summary.sort(key=lambda x: x["count"], reverse=True)
-
-    with_pe = [r for r in data if r["pe"] and r["pe"] > 0]
-    top_cheapest = sorted(with_pe, key=lambda x: x["pe"])[:10]
-    top_expensive = sorted(with_pe, key=lambda x: x["pe"], reverse=True)[:10]
+    for r in rollups.mappings():
+        if r["by_valuation"]:
+            valuation_counts[r["valuation_canon"]] = r["count"]
+        elif r["by_signal"]:
+            if r["recommendation"]:
+                signal_counts[r["recommendation"]] = signal_counts.get(r["recommendation"], 0) + r["count"]
+        else:
+            sector_summary.append({
+                "sector": r["sector"], "count": r["count"], "cheap": r["cheap"],
+                "expensive": r["expensive"], "avg_pe": r["avg_pe"],
+            })
 
-    signal_counts: dict = {}
-    for r in data:
-        sig = r.get("recommendation") or ""
-        if sig:
-            signal_counts[sig] = signal_counts.get(sig, 0) + 1
+    # 3. Top-N each way by PE
+    report_cols = ("stock_symbol, company_name, pe, cmp, valuation, recommendation, "
+                   "target_price, financial_year, quarter, exchange, sector")
+    tops = await db.execute(text(f"""
+        {latest}
+        (SELECT 'cheapest' AS side, {report_cols} FROM latest WHERE pe > 0
+         ORDER BY pe ASC, stock_symbol LIMIT 10)
+        UNION ALL
+        (SELECT 'expensive' AS side, {report_cols} FROM latest WHERE pe > 0
+         ORDER BY pe DESC, stock_symbol LIMIT 10)
+    """), params)
+    top_cheapest, top_expensive = [], []
+    for r in tops.mappings():
+        row = dict(r)
+        (top_cheapest if row.pop("side") == "cheapest" else top_expensive).append(row)
 
     result = {
-        "summary": {"total": len(data), "avg_pe": avg_pe, "median_pe": median_pe},
+        "summary": {"total": head["total"], "avg_pe": head["avg_pe"] or 0, "median_pe": head["median_pe"] or 0},
         "pe_distribution": pe_distribution,
         "valuation_counts": valuation_counts,
         "signal_counts": signal_counts,
@@ -932,61 +953,44 @@ async def get_report_detail(
     page: int = Query(1, ge=1),
     per_page: int = Query(50, ge=1, le=500),
 ):
-    """Drill-down detail — returns stocks matching a specific filter slice."""
-    conditions = ["qr.valuation IS NOT NULL", "qr.valuation != ''", "(qr.extraction_status = 'completed' OR qr.user_reviewed = TRUE)"]
-    params: dict = {}
-
-    if year:
-        fy_year = _fy_to_year(year)
-        if fy_year:
-            conditions.append("qr.financial_year ~ :fy_pattern")
-            params["fy_pattern"] = f"(^|FY){fy_year % 100:02d}$|^{fy_year}$|{fy_year - 1}-{fy_year % 100:02d}$"
-    if quarter:
-        conditions.append("qr.quarter = :quarter")
-        params["quarter"] = quarter
-    if exchange:
-        conditions.append("qr.exchange = :exchange")
-        params["exchange"] = exchange
-    if sector:
-        conditions.append("COALESCE(s.sector, '') ILIKE :sector_filter")
-        params["sector_filter"] = f"%{sector}%"
-
-    where_clause = " AND ".join(conditions)
-
-    base_sql = f"""
-        SELECT DISTINCT ON (qr.stock_symbol)
-            qr.stock_symbol, qr.company_name, qr.pe, qr.cmp, qr.valuation,
-            qr.recommendation, qr.target_price, qr.financial_year, qr.quarter,
-            qr.exchange, qr.comments, qr.source_pdf_url,
-            COALESCE(s.sector, 'Unknown') AS sector
-        FROM quarterly_results qr
-        LEFT JOIN stocks s ON s.symbol = qr.stock_symbol
-        WHERE {where_clause}
-        ORDER BY qr.stock_symbol, qr.financial_year DESC, qr.quarter DESC
-    """
-
-    rows = await db.execute(text(base_sql), params)
-    all_data = [dict(r._mapping) for r in rows.fetchall()]
+    """Drill-down detail — stocks matching a specific filter slice, filtered and paged in SQL."""
+    params: dict = {"limit": per_page, "offset": (page - 1) * per_page}
+    latest = _report_latest_cte(year, quarter, exchange, sector, params)
 
+    slice_filter = "TRUE"
     if filter_type == "valuation" and filter_value:
-        target = filter_value.upper()
-        filtered = [r for r in all_data if
-                    canonicalize_valuation(r.get("valuation")) == target or
-                    (r.get("valuation") or "").upper() == target]
+        slice_filter = "(valuation_canon = :slice OR UPPER(valuation) = :slice)"
+        params["slice"] = filter_value.upper()
     elif filter_type == "pe_range" and filter_value:
-        parts = filter_value.replace("+", "-9999").split("-")
-        lo, hi = float(parts[0]), float(parts[1])
-        filtered = [r for r in all_data if r.get("pe") and lo <= r["pe"] < hi]
+        try:
+            parts = filter_value.replace("+", "-9999").split("-")
+            params["pe_lo"], params["pe_hi"] = float(parts[0]), float(parts[1])
+        except (ValueError, IndexError):
+            raise HTTPException(status_code=400, detail=f"Invalid pe_range: {filter_value}")
+        slice_filter = "pe != 0 AND pe >= :pe_lo AND pe < :pe_hi"
     elif filter_type == "sector" and filter_value:
-        filtered = [r for r in all_data if (r.get("sector") or "Unknown") == filter_value]
+        slice_filter = "sector = :slice"
+        params["slice"] = filter_value
     elif filter_type == "signal" and filter_value:
-        filtered = [r for r in all_data if (r.get("recommendation") or "") == filter_value]
-    else:
-        filtered = all_data
+        slice_filter = "COALESCE(recommendation, '') = :slice"
+        params["slice"] = filter_value
 
-    total = len(filtered)
-    offset = (page - 1) * per_page
-    page_data = filtered[offset:offset + per_page]
+    count_row = await db.execute(text(f"""
+        {latest}
+        SELECT COUNT(*) FROM latest WHERE {slice_filter}
+    """), params)
+    total = count_row.scalar() or 0
+
+    rows = await db.execute(text(f"""
+        {latest}
+        SELECT stock_symbol, company_name, pe, cmp, valuation, recommendation, target_price,
+               financial_year, quarter, exchange, comments, source_pdf_url, sector
+        FROM latest
+        WHERE {slice_filter}
+        ORDER BY stock_symbol
+        LIMIT :limit OFFSET :offset
+    """), params)
+    page_data = [dict(r._mapping) for r in rows.fetchall()]
 
     return {
         "results": page_data,
@@ -1036,6 +1040,7 @@ async def activate_formula(formula_id: int, db: AsyncSession = Depends(get_db)):
 async def retrigger_pe_extraction(
     symbol: str,
     row_id: Optional[int] = Query(None),
+    fresh: bool = Query(False),
     db: AsyncSession = Depends(get_db),
 ):
     """
@@ -1043,6 +1048,8 @@ async def retrigger_pe_extraction(
 
     - With ?row_id=N: retriggers that exact row.
     - Without row_id: retriggers the latest row for that stock_symbol.
+    - With ?fresh=true: drops cached AI responses for the PDF first, forcing a
+      new OpenAI call (otherwise an identical request is replayed from cache).
 
     Marks the row as 'pending', clears the previous error, and dispatches a fresh
     Celery task. Useful when an extraction failed (OpenAI quota, parse error, network)
@@ -1073,6 +1080,13 @@ async def retrigger_pe_extraction(
             detail=f"{symbol} has no source PDF URL — cannot retrigger; upload PDF manually.",
         )
 
+    if fresh:
+        # By content: the other exchange's URL for the same PDF shares the cached entries
+        await invalidate_ai_results(
+            source=found.source_pdf_url,
+            pdf_sha256=await known_pdf_digest(found.source_pdf_url),
+        )
+
     # Mark current row as pending, clear previous error, kick off the task.
     await db.execute(text("""
         UPDATE quarterly_results
@@ -1083,7 +1097,7 @@ async def retrigger_pe_extraction(
     """), {"rid": found.id})
     await db.commit()
 
-    task = run_quarterly_extraction.delay(
+    task = queue_quarterly_extraction(
         stock_symbol=found.stock_symbol,
         pdf_url=found.source_pdf_url,
         exchange=found.exchange or "BSE",
@@ -1269,27 +1283,10 @@ async def update_pe_analysis(
                         THEN 'completed' ELSE extraction_status END
                 WHERE (valuation IS NULL OR valuation = '')
                   AND quarter = :q
-                  AND RIGHT(financial_year, 2) = RIGHT(:fy, 2)
+                  AND canonical_fy_suffix = RIGHT(:fy, 2)
                   AND id != :rid
-                  AND stock_symbol IN (
-                      SELECT qr2.stock_symbol FROM quarterly_results qr2
-                      LEFT JOIN stocks ss1 ON ss1.symbol = qr2.stock_symbol
-                      LEFT JOIN stocks ss2 ON ss2.bse_token = CASE
-                          WHEN qr2.stock_symbol ~ '^\\d+$' THEN CAST(qr2.stock_symbol AS INT) END
-                      WHERE qr2.id = :rid
-                      UNION
-                      SELECT qr3.stock_symbol FROM quarterly_results qr3
-                      LEFT JOIN stocks ss3 ON ss3.symbol = qr3.stock_symbol
-                      LEFT JOIN stocks ss4 ON ss4.bse_token = CASE
-                          WHEN qr3.stock_symbol ~ '^\\d+$' THEN CAST(qr3.stock_symbol AS INT) END
-                      WHERE ({_resolved_symbol_sql("qr3", "ss3", "ss4")}) = (
-                          SELECT {_resolved_symbol_sql("qr4", "ss5", "ss6")}
-                          FROM quarterly_results qr4
-                          LEFT JOIN stocks ss5 ON ss5.symbol = qr4.stock_symbol
-                          LEFT JOIN stocks ss6 ON ss6.bse_token = CASE
-                              WHEN qr4.stock_symbol ~ '^\\d+$' THEN CAST(qr4.stock_symbol AS INT) END
-                          WHERE qr4.id = :rid
-                      )
+                  AND canonical_symbol = (
+                      SELECT canonical_symbol FROM quarterly_results WHERE id = :rid
                   )
             """), {
                 "val": updates.get("valuation"),
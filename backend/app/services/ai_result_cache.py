@@ -0,0 +1,142 @@
+"""
+Disk cache of raw OpenAI extraction responses.
+
+Retriggers (/api/pe_analysis/{symbol}/retrigger), retry_stuck_extractions and
+Celery retries after a failed DB save all re-run the same request against
+the same PDF. The key is sha256 of the full request body — model, prompt,
+max_tokens and the page images / text built from the selected pages of the
+PDF — so a replay with identical inputs is served from disk, while any change
+to the prompt, model, page selection or image encoding misses naturally.
+
+Layout: PDF_CACHE_DIR/ai/<key>.json = {key, kind, stock_symbol, source,
+pdf_sha256, model, created_at, response}, sharing the pdf_cache volume.
+Entries older than AI_CACHE_TTL_DAYS are ignored and removed on read.
+invalidate_ai_results() drops entries explicitly, e.g. retrigger ?fresh=true.
+It matches by PDF content (pdf_sha256, from pdf_cache) rather than by URL,
+because the NSE and BSE copies of one PDF share entries but only the first
+requester's URL is recorded as source.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from ..config import get_settings
+from .pdf_cache import _atomic_write, known_pdf_digest
+
+logger = logging.getLogger(__name__)
+
+
+def _cache_dir() -> Path:
+    return Path(get_settings().PDF_CACHE_DIR) / "ai"
+
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Stable hash of an OpenAI request body (key order independent)."""
+    canonical = json.dumps(body, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _read(key: str) -> Optional[Dict[str, Any]]:
+    path = _cache_dir() / f"{key}.json"
+    try:
+        with open(path, "r") as f:
+            entry = json.load(f)
+    except (OSError, ValueError):
+        return None
+    ttl_s = get_settings().AI_CACHE_TTL_DAYS * 86400
+    if time.time() - entry.get("created_at", 0) > ttl_s:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+        return None
+    return entry.get("response")
+
+
+def _write(key: str, entry: Dict[str, Any]):
+    _atomic_write(_cache_dir() / f"{key}.json", json.dumps(entry, ensure_ascii=False).encode())
+
+
+async def get_ai_result(key: str) -> Optional[Dict[str, Any]]:
+    if not get_settings().AI_CACHE_ENABLED:
+        return None
+    return await asyncio.to_thread(_read, key)
+
+
+async def put_ai_result(
+    key: str,
+    response: Dict[str, Any],
+    kind: str,
+    stock_symbol: str,
+    model: str,
+    source: Optional[str] = None,
+):
+    """Store a parsed model response; a failed write only logs (the result is still returned to the caller)."""
+    if not get_settings().AI_CACHE_ENABLED:
+        return
+    entry = {
+        "key": key,
+        "kind": kind,
+        "stock_symbol": stock_symbol,
+        "source": source,
+        "pdf_sha256": await known_pdf_digest(source) if source else None,
+        "model": model,
+        "created_at": time.time(),
+        "response": response,
+    }
+    try:
+        await asyncio.to_thread(_write, key, entry)
+    except OSError as e:
+        logger.warning(f"AI result cache write failed ({e})")
+
+
+def _invalidate(source: Optional[str], pdf_sha256: Optional[str], stock_symbol: Optional[str]) -> int:
+    removed = 0
+    try:
+        entries = list(os.scandir(_cache_dir()))
+    except OSError:
+        return 0
+    for entry in entries:
+        if not entry.name.endswith(".json"):
+            continue
+        try:
+            with open(entry.path, "r") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if source is not None or pdf_sha256 is not None:
+            same_pdf = (pdf_sha256 is not None and meta.get("pdf_sha256") == pdf_sha256) or (
+                source is not None and meta.get("source") == source
+            )
+            if not same_pdf:
+                continue
+        if stock_symbol is not None and meta.get("stock_symbol") != stock_symbol:
+            continue
+        try:
+            os.unlink(entry.path)
+            removed += 1
+        except OSError:
+            pass
+    return removed
+
+
+async def invalidate_ai_results(
+    source: Optional[str] = None,
+    stock_symbol: Optional[str] = None,
+    pdf_sha256: Optional[str] = None,
+) -> int:
+    """
+    Delete cached responses for a PDF and/or symbol (all None = everything). Returns count.
+    A PDF matches by content digest or by source URL (entries written before digests were recorded).
+    """
+    removed = await asyncio.to_thread(_invalidate, source, pdf_sha256, stock_symbol)
+    if removed:
+        logger.info(f"AI result cache: invalidated {removed} entries "
+                    f"(source={source}, pdf_sha256={pdf_sha256}, symbol={stock_symbol})")
+    return removed
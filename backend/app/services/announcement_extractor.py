@@ -4,19 +4,20 @@ Extracts comprehensive financial data from Investor Presentations and Monthly Bu
 Supports two modes: Vision (image-based) and Text (text-based PDFs).
 """
 
-import base64
 import json
 import logging
 import re
 from datetime import datetime, timedelta, timezone
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Union
 
-import fitz
 from sqlalchemy import text
 
 from ..config import get_settings
 from ..database import get_db_session
-from .ocr_extractor import _get_openai_client, download_pdf_bytes, _render_pages_to_png
+from .ocr_extractor import _chat_extract_json, download_pdf_bytes
+from .page_image_encoder import encode_pages, image_data_url, log_encode_stats
+from .pdf_document import PdfDocument, open_pdf
+from .pdf_render_pool import run_pdf_job
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -27,21 +28,18 @@ _MAX_VISION_PAGES = 15
 _MAX_TEXT_CHARS = 60000
 
 
-def _detect_extraction_mode(pdf_bytes: bytes) -> tuple[str, int]:
+def _detect_extraction_mode(pdf: Union[bytes, PdfDocument]) -> tuple[str, int]:
     """Detect whether to use vision or text mode.
     Returns (mode, total_pages). Vision for image-heavy PDFs, text for text-rich."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    total = doc.page_count
-    text_pages = 0
-    total_text_len = 0
+    with open_pdf(pdf) as doc:
+        total = doc.page_count
+        text_pages = 0
+        total_text_len = 0
 
-    for idx in range(min(total, 10)):
-        page_text = doc.load_page(idx).get_text("text")
-        if len(page_text.strip()) > 100:
-            text_pages += 1
-            total_text_len += len(page_text)
-
-    doc.close()
+        for idx in range(min(total, 10)):
+            if doc.has_text(idx, min_chars=101):
+                text_pages += 1
+                total_text_len += len(doc.page_text(idx))
 
     # If average text per page is low, it's likely image-heavy (investor pres with charts)
     avg_text = total_text_len / max(text_pages, 1)
@@ -51,34 +49,26 @@ def _detect_extraction_mode(pdf_bytes: bytes) -> tuple[str, int]:
     return "text", total
 
 
-def _extract_full_text(pdf_bytes: bytes) -> str:
-    """Extract all text from PDF using PyMuPDF."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    pages = []
-    for idx in range(doc.page_count):
-        t = doc.load_page(idx).get_text("text")
-        if t.strip():
-            pages.append(t)
-    doc.close()
-    combined = "\n\n".join(pages)
+def _extract_full_text(pdf: Union[bytes, PdfDocument]) -> str:
+    """Extract all text from PDF using PyMuPDF (reuses page text cached by mode detection)."""
+    with open_pdf(pdf) as doc:
+        combined = doc.full_text()
     if len(combined) > _MAX_TEXT_CHARS:
         combined = combined[:_MAX_TEXT_CHARS] + "\n\n[...truncated...]"
     return combined
 
 
-def _select_pages_for_vision(pdf_bytes: bytes) -> List[int]:
+def _select_pages_for_vision(pdf: Union[bytes, PdfDocument]) -> List[int]:
     """Select most relevant pages for vision extraction (skip cover, legal pages)."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    total = doc.page_count
+    with open_pdf(pdf) as doc:
+        total = doc.page_count
     # Skip first page (usually cover) and last 1-2 (disclaimers)
     start = 1 if total > 3 else 0
     end = min(total, _MAX_VISION_PAGES + start)
     if total > _MAX_VISION_PAGES + 2:
         end = total - 1  # skip last disclaimer page
         end = min(end, start + _MAX_VISION_PAGES)
-    pages = list(range(start, end))
-    doc.close()
-    return pages
+    return list(range(start, end))
 
 
 _ANNOUNCEMENT_EXTRACTION_PROMPT = """You are a senior equity research analyst extracting comprehensive investment data from an Indian company's Investor Presentation or Monthly Business Update PDF.
@@ -171,64 +161,41 @@ Return ONLY raw JSON. No markdown, no code blocks.
 
 
 async def extract_announcement_vision(
-    pdf_bytes: bytes,
+    pdf: Union[bytes, PdfDocument],
     stock_symbol: str,
     company_name: str,
     page_indices: List[int],
+    source: Optional[str] = None,
 ) -> Optional[Dict]:
     """Extract insights using Vision API (image-based)."""
     if not settings.OPENAI_API_KEY:
         return None
 
-    images = _render_pages_to_png(pdf_bytes, page_indices, zoom=1.5)
+    pdf_bytes = pdf.source if isinstance(pdf, PdfDocument) else pdf
+    images, stats = await run_pdf_job(encode_pages, pdf_bytes, page_indices, 1.5)
+    log_encode_stats(stock_symbol, stats)
     if not images:
         return None
 
     content = [{"type": "text", "text": _ANNOUNCEMENT_EXTRACTION_PROMPT}]
     content.append({"type": "text", "text": f"\nCompany: {company_name} ({stock_symbol})\n"})
     for img_bytes in images:
-        b64 = base64.b64encode(img_bytes).decode()
         content.append({
             "type": "image_url",
-            "image_url": {"url": f"data:image/png;base64,{b64}"},
+            "image_url": {"url": image_data_url(img_bytes)},
         })
 
-    try:
-        client = _get_openai_client()
-        resp = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "gpt-4.1-mini",
-                "messages": [{"role": "user", "content": content}],
-                "temperature": 0,
-                "max_tokens": 6000,
-                "response_format": {"type": "json_object"},
-            },
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        usage = data.get("usage", {})
-        logger.info(
-            f"Announcement Vision AI for {stock_symbol}: prompt_tokens={usage.get('prompt_tokens')}, "
-            f"completion_tokens={usage.get('completion_tokens')}, images={len(images)}"
-        )
-        ai_content = data["choices"][0]["message"].get("content")
-        if not ai_content:
-            return None
-        return json.loads(ai_content)
-    except Exception as e:
-        logger.error(f"Announcement Vision extraction failed for {stock_symbol}: {e}")
-        return None
+    return await _chat_extract_json(
+        [{"role": "user", "content": content}], stock_symbol, "announcement vision",
+        f"images={len(images)}", max_tokens=6000, kind="announcement", source=source,
+    )
 
 
 async def extract_announcement_text(
     text_content: str,
     stock_symbol: str,
     company_name: str,
+    source: Optional[str] = None,
 ) -> Optional[Dict]:
     """Extract insights using text mode."""
     if not settings.OPENAI_API_KEY:
@@ -242,36 +209,9 @@ async def extract_announcement_text(
         {"role": "user", "content": f"Company: {company_name} ({stock_symbol})\n\nDOCUMENT:\n{text_content}"},
     ]
 
-    try:
-        client = _get_openai_client()
-        resp = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "gpt-4.1-mini",
-                "messages": messages,
-                "temperature": 0,
-                "max_tokens": 6000,
-                "response_format": {"type": "json_object"},
-            },
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        usage = data.get("usage", {})
-        logger.info(
-            f"Announcement Text AI for {stock_symbol}: prompt_tokens={usage.get('prompt_tokens')}, "
-            f"completion_tokens={usage.get('completion_tokens')}"
-        )
-        ai_content = data["choices"][0]["message"].get("content")
-        if not ai_content:
-            return None
-        return json.loads(ai_content)
-    except Exception as e:
-        logger.error(f"Announcement Text extraction failed for {stock_symbol}: {e}")
-        return None
+    return await _chat_extract_json(
+        messages, stock_symbol, "announcement text", max_tokens=6000, kind="announcement", source=source,
+    )
 
 
 def _normalize_fy(fy: str) -> str:
@@ -0,0 +1,67 @@
+"""
+Shared keep-alive HTTP client for Kotak Neo API calls.
+
+One long-lived httpx.AsyncClient per event loop replaces the per-call
+`requests.get` in run_in_executor (get_quote.py) and the per-order
+aiohttp.ClientSession + TCPConnector + SSL context (place_order.py).
+Reusing the pool keeps TLS sessions and TCP connections warm, so an order
+costs one round trip instead of handshake + round trip.
+
+HTTP/2 is enabled when the `h2` package is installed (`httpx[http2]`);
+otherwise the client falls back to HTTP/1.1 keep-alive.
+
+Singleton-per-loop mirrors _get_openai_client() in ocr_extractor.py — safe
+under Celery --pool=threads (each thread owns its own loop). Like
+broker_rate_limiter, this module aliases itself under both import names
+(`broker_http` and `app.services.broker_http`) so there is one pool per loop.
+"""
+
+import asyncio
+import importlib.util
+import logging
+import sys
+
+import httpx
+
+logger = logging.getLogger(__name__)
+
+_HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+# Kotak endpoints are rate-limited to ~200/min, so a small pool is plenty.
+KOTAK_TIMEOUT = httpx.Timeout(30.0, connect=10.0)
+KOTAK_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=20, keepalive_expiry=120.0)
+
+_kotak_clients_per_loop: dict[int, httpx.AsyncClient] = {}
+
+
+def get_kotak_client() -> httpx.AsyncClient:
+    """Return (or create) the Kotak httpx.AsyncClient bound to the current event loop."""
+    try:
+        loop_id = id(asyncio.get_running_loop())
+    except RuntimeError:
+        loop_id = 0
+    client = _kotak_clients_per_loop.get(loop_id)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=KOTAK_TIMEOUT,
+            limits=KOTAK_LIMITS,
+            http2=_HTTP2_AVAILABLE,
+            verify=False,  # Kotak endpoints were always called with CERT_NONE
+        )
+        _kotak_clients_per_loop[loop_id] = client
+        logger.info(f"Kotak HTTP client created (http2={_HTTP2_AVAILABLE})")
+    return client
+
+
+async def close_kotak_clients() -> None:
+    """Close all per-loop Kotak clients (call on shutdown)."""
+    for c in list(_kotak_clients_per_loop.values()):
+        try:
+            await c.aclose()
+        except Exception:
+            pass
+    _kotak_clients_per_loop.clear()
+
+
+sys.modules.setdefault("broker_http", sys.modules[__name__])
+sys.modules.setdefault("app.services.broker_http", sys.modules[__name__])
@@ -0,0 +1,193 @@
+"""
+Process-wide token-bucket rate limiter for Kotak Neo API calls.
+
+Replaces the old "fire 190 requests, then sleep out the rest of the 60s window"
+pattern in get_quote.py. Tokens refill continuously (rate/60 per second), so a
+call is released as soon as budget frees up instead of at the next window
+boundary — a 1,850-stock refresh runs at the real API budget, not at
+"number of windows x 60s".
+
+Broker limit is 200 req/min. A bucket with capacity C refilling at R/min admits
+at most C + R requests in any rolling 60s window, so the default burst is
+(200 - R): 190/min + burst 10 never exceeds the broker ceiling.
+
+Thread-safe: bucket state is guarded by a threading.Lock and waiters sleep with
+asyncio.sleep(), so one bucket is shared by the FastAPI loop AND every
+Celery --pool=threads event loop in the process (no loop-bound primitives).
+
+This module is imported both as `broker_rate_limiter` (legacy sys.path modules:
+get_quote.py, place_order.py) and `app.services.broker_rate_limiter` (package
+modules: quote_fetcher.py). It aliases itself under both names at import time
+so every caller sees the same buckets.
+"""
+
+import asyncio
+import logging
+import sys
+import threading
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+# Kotak Neo hard limit per endpoint family (quotes, orders)
+KOTAK_LIMIT_PER_MINUTE = 200
+
+# Limiter names
+QUOTES = "kotak_quotes"
+ORDERS = "kotak_orders"
+
+_DEFAULT_RATES = {
+    QUOTES: 190,  # 5% under the 200/min broker limit
+    ORDERS: 185,  # 7.5% buffer — order rejections are costlier than slow quotes
+}
+
+
+class TokenBucket:
+    """
+    Continuous-refill token bucket with reservation semantics.
+
+    acquire() reserves a token immediately (tokens may go negative) and sleeps
+    until that reservation matures — callers are released in FIFO order at
+    exactly the configured rate, with no lock held while sleeping.
+    """
+
+    def __init__(self, name: str, rate_per_minute: float, burst: Optional[int] = None):
+        self.name = name
+        self._lock = threading.Lock()
+        self._rate_per_sec = 0.0
+        self._burst = 1
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        # Release times of granted tokens (for "used in the last 60s")
+        self._grants: Deque[float] = deque()
+        self._waiting = 0
+        self._in_flight = 0
+        self._total_granted = 0
+        self._total_wait = 0.0
+        self.configure(rate_per_minute, burst)
+        self._tokens = float(self._burst)
+
+    @property
+    def rate_per_minute(self) -> float:
+        return self._rate_per_sec * 60.0
+
+    def configure(self, rate_per_minute: float, burst: Optional[int] = None):
+        """Change rate (and burst). Default burst keeps burst + rate <= broker limit."""
+        rate_per_minute = max(1.0, float(rate_per_minute))
+        if burst is None:
+            burst = int(KOTAK_LIMIT_PER_MINUTE - rate_per_minute)
+        with self._lock:
+            self._refill(time.monotonic())
+            self._rate_per_sec = rate_per_minute / 60.0
+            self._burst = max(1, int(burst))
+            self._tokens = min(self._tokens, float(self._burst))
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._tokens = min(float(self._burst), self._tokens + elapsed * self._rate_per_sec)
+            self._updated = now
+
+    def _reserve(self) -> float:
+        """Take one token; return seconds to wait until it is usable."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self._tokens -= 1.0
+            wait = -self._tokens / self._rate_per_sec if self._tokens < 0 else 0.0
+            self._grants.append(now + wait)
+            while self._grants and self._grants[0] < now - 60.0:
+                self._grants.popleft()
+            self._total_granted += 1
+            self._total_wait += wait
+            return wait
+
+    def pause(self, seconds: float):
+        """Hold back every new grant for at least `seconds` (e.g. after a broker 429)."""
+        with self._lock:
+            self._refill(time.monotonic())
+            self._tokens = min(self._tokens, -seconds * self._rate_per_sec)
+
+    async def acquire(self) -> float:
+        """Wait for one request's worth of budget. Returns seconds waited."""
+        wait = self._reserve()
+        if wait > 0:
+            with self._lock:
+                self._waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            finally:
+                with self._lock:
+                    self._waiting -= 1
+        return wait
+
+    @asynccontextmanager
+    async def slot(self):
+        """`async with bucket.slot():` — acquire a token and track the call as in-flight."""
+        await self.acquire()
+        with self._lock:
+            self._in_flight += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Budget usage: requests granted in the last 60s vs the per-minute rate."""
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            used = sum(1 for t in self._grants if now - 60.0 <= t <= now)
+            queued = sum(1 for t in self._grants if t > now)
+            rate = self.rate_per_minute
+            return {
+                "name": self.name,
+                "rate_per_minute": round(rate, 1),
+                "burst": self._burst,
+                "tokens_available": round(max(0.0, self._tokens), 2),
+                "used_last_minute": used,
+                "utilization_pct": round(used / rate * 100, 1) if rate else 0.0,
+                "queued": queued,
+                "waiting": self._waiting,
+                "in_flight": self._in_flight,
+                "total_granted": self._total_granted,
+                "avg_wait_s": round(self._total_wait / self._total_granted, 3) if self._total_granted else 0.0,
+            }
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_registry_lock = threading.Lock()
+
+
+def get_rate_limiter(name: str = QUOTES, rate_per_minute: Optional[float] = None) -> TokenBucket:
+    """
+    Return the process-wide bucket for `name` (created on first use).
+    Passing a different rate_per_minute re-configures the shared bucket.
+    """
+    with _registry_lock:
+        bucket = _limiters.get(name)
+        if bucket is None:
+            rate = rate_per_minute or _DEFAULT_RATES.get(name, KOTAK_LIMIT_PER_MINUTE - 10)
+            bucket = TokenBucket(name, rate)
+            _limiters[name] = bucket
+            logger.info(f"Rate limiter '{name}' created: {rate}/min, burst {bucket._burst}")
+            return bucket
+    if rate_per_minute and abs(bucket.rate_per_minute - rate_per_minute) > 1e-6:
+        bucket.configure(rate_per_minute)
+    return bucket
+
+
+def rate_limiter_snapshots() -> Dict[str, Dict[str, Any]]:
+    """Snapshot of every limiter created in this process."""
+    with _registry_lock:
+        buckets = list(_limiters.values())
+    return {b.name: b.snapshot() for b in buckets}
+
+
+# Alias under both import names (see module docstring)
+sys.modules.setdefault("broker_rate_limiter", sys.modules[__name__])
+sys.modules.setdefault("app.services.broker_rate_limiter", sys.modules[__name__])
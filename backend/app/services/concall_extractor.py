@@ -10,14 +10,14 @@ import re
 from datetime import datetime, timedelta, timezone
 from typing import Any, Dict, List, Optional
 
-import fitz
 import httpx
 from sqlalchemy import text
 
 from ..config import get_settings
 from ..database import get_db_session
 from ..cache_keys import invalidate_messages
-from .ocr_extractor import _get_openai_client, download_pdf_bytes
+from .ocr_extractor import _chat_extract_json, download_pdf_bytes
+from .pdf_document import open_pdf
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -41,14 +41,8 @@ def _is_concall_transcript(text_content: str) -> bool:
 
 def _extract_text_sync(pdf_bytes: bytes) -> Optional[str]:
     """Synchronous PDF text extraction — runs in thread pool."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    full_text = []
-    for page_idx in range(doc.page_count):
-        page_text = doc.load_page(page_idx).get_text("text")
-        if page_text.strip():
-            full_text.append(page_text)
-    doc.close()
-    combined = "\n\n".join(full_text)
+    with open_pdf(pdf_bytes) as doc:
+        combined = doc.full_text()
     return combined if combined.strip() else None
 
 
@@ -161,6 +155,7 @@ async def extract_concall_insights_ai(
     transcript: str,
     stock_symbol: str,
     company_name: str,
+    source: Optional[str] = None,
 ) -> Optional[Dict]:
     """Send concall transcript to OpenAI for structured insight extraction."""
     if not settings.OPENAI_API_KEY:
@@ -178,37 +173,9 @@ async def extract_concall_insights_ai(
         {"role": "user", "content": f"Company: {company_name} ({stock_symbol})\n\nTRANSCRIPT:\n{truncated}"},
     ]
 
-    try:
-        client = _get_openai_client()
-        resp = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "gpt-4.1-mini",
-                "messages": messages,
-                "temperature": 0,
-                "max_tokens": 4000,
-                "response_format": {"type": "json_object"},
-            },
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        usage = data.get("usage", {})
-        logger.info(
-            f"Concall AI for {stock_symbol}: prompt_tokens={usage.get('prompt_tokens')}, "
-            f"completion_tokens={usage.get('completion_tokens')}"
-        )
-        ai_content = data["choices"][0]["message"].get("content")
-        if not ai_content:
-            logger.error(f"OpenAI returned empty content for concall {stock_symbol}")
-            return None
-        return json.loads(ai_content)
-    except Exception as e:
-        logger.error(f"Concall AI extraction failed for {stock_symbol}: {e}")
-        return None
+    return await _chat_extract_json(
+        messages, stock_symbol, "concall", max_tokens=4000, kind="concall", source=source,
+    )
 
 
 def _derive_quarter_fy(transcript: str) -> tuple[Optional[str], Optional[str]]:
@@ -0,0 +1,234 @@
+"""
+Cross-exchange filing deduplication for quarterly-results extraction.
+
+A dual-listed company files the same results PDF on NSE and BSE, and each
+fetcher used to dispatch its own run_quarterly_extraction. At dispatch time
+every filing is now keyed by
+
+    filing:<canonical NSE symbol via stocks>:<sha256 of the PDF bytes>
+
+The first filing to claim the key (Redis SET NX) is dispatched as the leader.
+Later filings with the same key are recorded as followers and not
+dispatched. Once the leader's extraction is saved, the same extraction_data
+is written to every follower row (save_quarterly_result upserts, so a
+duplicate write is harmless). A final failure (no retry will follow) is
+mirrored to the followers too.
+
+The claimed key is stored per leader PDF URL at claim time, and the leader's
+worker reads it back from there. It is never recomputed at save time: by then
+the pdf_cache digest may be gone or the bytes revalidated to a new digest, and
+the canonical symbol may have changed.
+
+Fingerprinting downloads the PDF through pdf_cache, so the extraction worker
+reuses the same bytes from disk. The claim expires after _CLAIM_TTL_S; every
+extraction stage refreshes it (refresh_claim), so only a dead leader lets it
+lapse, and retry_stuck_extractions then re-queues the followers (see
+follower_has_active_leader). Any Redis or download error fails open: the
+filing is simply dispatched on its own.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from ..cache import get_redis
+from ..database import get_db_session
+from .ocr_extractor import download_pdf_bytes
+from .pdf_cache import cached_pdf_digest
+
+logger = logging.getLogger(__name__)
+
+_CLAIM_TTL_S = 45 * 60
+_FINGERPRINT_CONCURRENCY = 6
+
+
+def _followers_key(filing_key: str) -> str:
+    return f"{filing_key}:followers"
+
+
+def _follower_marker(pdf_url: str) -> str:
+    return f"filing_follower:{hashlib.sha256(pdf_url.encode()).hexdigest()}"
+
+
+def _leader_marker(pdf_url: str) -> str:
+    return f"filing_leader:{hashlib.sha256(pdf_url.encode()).hexdigest()}"
+
+
+async def canonical_symbol(stock_symbol: str) -> str:
+    """
+    NSE symbol for an NSE symbol or BSE scrip code (same priority as the
+    qr_canonical_symbol() DB function); the input itself when stocks has no match.
+    """
+    async with get_db_session() as db:
+        if stock_symbol.isdigit():
+            row = await db.execute(
+                text("SELECT symbol FROM stocks WHERE bse_token = :tok LIMIT 1"),
+                {"tok": int(stock_symbol)},
+            )
+        else:
+            row = await db.execute(text("""
+                SELECT symbol FROM stocks
+                WHERE symbol = :sym OR nse_symbol = :sym OR bse_scrip_code = :sym
+                ORDER BY (symbol = :sym) DESC
+                LIMIT 1
+            """), {"sym": stock_symbol})
+        found = row.scalar()
+    return found or stock_symbol
+
+
+async def _pdf_digest(pdf_url: str) -> Optional[str]:
+    digest = await cached_pdf_digest(pdf_url)
+    if digest:
+        return digest
+    pdf_bytes = await download_pdf_bytes(pdf_url)
+    return hashlib.sha256(pdf_bytes).hexdigest() if pdf_bytes else None
+
+
+async def filing_key_for(stock_symbol: str, pdf_url: str) -> Optional[str]:
+    """Dedup key for a filing, or None if the PDF cannot be fingerprinted."""
+    try:
+        digest = await _pdf_digest(pdf_url)
+        if not digest:
+            return None
+        return f"filing:{await canonical_symbol(stock_symbol)}:{digest}"
+    except Exception as e:
+        logger.warning(f"Filing fingerprint failed for {stock_symbol} ({pdf_url}): {e}")
+        return None
+
+
+async def _claim(item: Dict[str, Any], key: Optional[str]) -> bool:
+    """True if item should be dispatched (leader or dedup unavailable), False if coalesced."""
+    if key is None:
+        return True
+    try:
+        r = get_redis()
+        leader = json.dumps({"symbol": item["symbol"], "pdf_url": item["pdf_url"], "exchange": item["exchange"]})
+        if await r.set(key, leader, nx=True, ex=_CLAIM_TTL_S):
+            await r.set(_leader_marker(item["pdf_url"]), key, ex=_CLAIM_TTL_S * 4)
+            return True
+        await r.rpush(_followers_key(key), json.dumps(item, default=str))
+        await r.expire(_followers_key(key), _CLAIM_TTL_S * 4)
+        await r.set(_follower_marker(item["pdf_url"]), key, ex=_CLAIM_TTL_S * 4)
+    except Exception as e:
+        logger.warning(f"Filing dedup unavailable ({e}) — dispatching {item['symbol']} separately")
+        return True
+    logger.info(f"Coalesced {item['exchange']} filing {item['symbol']} into {key}")
+    return False
+
+
+async def coalesce_extraction_items(items: List[Dict[str, Any]], exchange: str) -> List[Dict[str, Any]]:
+    """
+    Claim each extraction item; return only the ones to dispatch.
+    Items are the fetcher dicts (symbol, pdf_url, company_name, announcement_date).
+    """
+    if not items:
+        return []
+    sem = asyncio.Semaphore(_FINGERPRINT_CONCURRENCY)
+
+    async def _key(item):
+        async with sem:
+            return await filing_key_for(item["symbol"], item["pdf_url"])
+
+    tagged = [dict(item, exchange=exchange) for item in items]
+    keys = await asyncio.gather(*(_key(item) for item in tagged))
+    # Claims run in fetch order so the first copy seen is the leader
+    keep = [item for item, key in zip(tagged, keys) if await _claim(item, key)]
+    if len(keep) < len(items):
+        logger.info(f"{exchange} results: {len(items) - len(keep)} of {len(items)} filings coalesced with an earlier copy")
+    return keep
+
+
+async def _pop_followers(pdf_url: str) -> Tuple[Optional[str], List[Dict[str, Any]]]:
+    """(claimed key, followers) for a leader PDF URL, releasing the claim; (None, []) if it led nothing."""
+    r = get_redis()
+    key = await r.get(_leader_marker(pdf_url))
+    if not key:
+        return None, []
+    raw = await r.lrange(_followers_key(key), 0, -1)
+    followers = [json.loads(x) for x in raw]
+    await r.delete(_followers_key(key), key, _leader_marker(pdf_url),
+                   *(_follower_marker(f["pdf_url"]) for f in followers))
+    return key, followers
+
+
+async def refresh_claim(pdf_url: str):
+    """Extend a leader's claim while its extraction is still running (called at the start of every stage)."""
+    try:
+        r = get_redis()
+        key = await r.get(_leader_marker(pdf_url))
+        if not key or not await r.expire(key, _CLAIM_TTL_S):
+            return
+        await r.expire(_leader_marker(pdf_url), _CLAIM_TTL_S * 4)
+        await r.expire(_followers_key(key), _CLAIM_TTL_S * 4)
+        for raw in await r.lrange(_followers_key(key), 0, -1):
+            await r.expire(_follower_marker(json.loads(raw)["pdf_url"]), _CLAIM_TTL_S * 4)
+    except Exception as e:
+        logger.warning(f"Could not refresh filing claim for {pdf_url}: {e}")
+
+
+async def complete_followers(
+    stock_symbol: str,
+    pdf_url: str,
+    save_fn: Callable[[Dict[str, Any]], Awaitable[Any]],
+) -> int:
+    """After the leader saved: run save_fn(follower_item) for every coalesced filing and release the claim."""
+    try:
+        key, followers = await _pop_followers(pdf_url)
+    except Exception as e:
+        logger.warning(f"Could not read coalesced filings for {pdf_url}: {e}")
+        return 0
+    done = 0
+    for f in followers:
+        if f["pdf_url"] == pdf_url and f["symbol"] == stock_symbol:
+            continue
+        try:
+            await save_fn(f)
+            done += 1
+        except Exception as e:
+            logger.error(f"Saving coalesced filing {f['symbol']} ({f['exchange']}) failed: {e}")
+    if done:
+        logger.info(f"Wrote {stock_symbol} extraction to {done} coalesced filing(s) of {key}")
+    return done
+
+
+async def fail_followers(
+    stock_symbol: str,
+    pdf_url: str,
+    fail_fn: Callable[[Dict[str, Any]], Awaitable[Any]],
+    final: bool = False,
+):
+    """
+    Mirror a leader failure onto its followers and release them. Only a final
+    failure (no retry will follow) is mirrored; until then the leader may still
+    succeed and write the followers itself.
+    """
+    if not final:
+        return
+    try:
+        key, followers = await _pop_followers(pdf_url)
+    except Exception as e:
+        logger.warning(f"Could not read coalesced filings for {pdf_url}: {e}")
+        return
+    for f in followers:
+        if f["pdf_url"] == pdf_url and f["symbol"] == stock_symbol:
+            continue
+        try:
+            await fail_fn(f)
+        except Exception as e:
+            logger.warning(f"Could not mark coalesced filing {f['symbol']} failed: {e}")
+    if followers:
+        logger.info(f"Released {len(followers)} coalesced filing(s) of {key} after {stock_symbol} failed")
+
+
+async def follower_has_active_leader(pdf_url: str) -> bool:
+    """True while pdf_url is coalesced behind a leader whose claim has not expired."""
+    try:
+        r = get_redis()
+        key = await r.get(_follower_marker(pdf_url))
+        return bool(key) and bool(await r.exists(key))
+    except Exception:
+        return False
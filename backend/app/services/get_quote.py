@@ -6,10 +6,12 @@ from typing import List, Dict, Any, Optional, Union
 import logging
 from urllib.parse import quote
 from neo_login.session_manager import KotakSessionManager
-from functools import partial
-import requests
+from broker_rate_limiter import QUOTES, get_rate_limiter
+from broker_http import get_kotak_client
+import httpx
 
 from gsheet_stock_get import GSheetStockClient
+import numpy as np
 import pandas as pd 
 import os 
 from dotenv import load_dotenv
@@ -82,11 +84,9 @@ class KotakQuoteClient:
         # logger.info(f"Calling API URL: {url}")
         
         try:
-            # Use requests in executor for truly async non-blocking I/O
-            # This is production-grade: non-blocking, concurrent, thread-safe
-            loop = asyncio.get_running_loop()
-            func = partial(requests.get, url, headers=headers, verify=False, timeout=30)
-            response = await loop.run_in_executor(None, func)
+            # Shared keep-alive client: no per-batch thread hop or TLS handshake
+            client = get_kotak_client()
+            response = await client.get(url, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -97,7 +97,7 @@ class KotakQuoteClient:
                 logger.error(f"Quote fetch failed. Status: {response.status_code}, Response: {response.text}")
                 return None
                         
-        except requests.Timeout:
+        except httpx.TimeoutException:
             logger.error("Request timed out while fetching quotes")
             return None
         except Exception as e:
@@ -126,7 +126,9 @@ class KotakQuoteClient:
         requests_per_minute: int = 190
         ) -> List[Optional[Dict[str, Any]]]:
         """
-        Get quotes with rate limiting (190 req/min, 5% under API limit)
+        Get quotes paced by the shared Kotak token bucket (190 req/min, 5% under API limit).
+        Requests are released continuously as budget refills — no 60s window stalls.
+        The bucket is process-wide, so retries and other quote callers share the budget.
         
         Args:
             symbol_batches: List of symbol lists (each inner list = 1 API request)
@@ -142,60 +144,36 @@ class KotakQuoteClient:
             return []
         
         total_requests = len(symbol_batches)
-        all_results = []
-        
-        # Calculate batches based on rate limit (190 = 5% buffer vs 200/min)
-        batch_size = min(requests_per_minute, 190)
-        total_batches = (total_requests + batch_size - 1) // batch_size
+        limiter = get_rate_limiter(QUOTES, requests_per_minute)
+        budget = limiter.snapshot()
+        backlog = max(0.0, total_requests - budget["tokens_available"] + budget["queued"])
         
         logger.info(f"🚀 Starting rate-limited quote fetching")
         logger.info(f"📊 Total API requests: {total_requests}")
-        logger.info(f"📦 Max requests per minute: {batch_size}")
-        logger.info(f"🔢 Time windows needed: {total_batches}")
-        logger.info(f"⏱️ Estimated time: ~{total_batches} minute(s)")
-        
-        for batch_num in range(total_batches):
-            start_idx = batch_num * batch_size
-            end_idx = min(start_idx + batch_size, total_requests)
-            batch = symbol_batches[start_idx:end_idx]
-            
-            logger.info(f"\n{'='*60}")
-            logger.info(f"📋 Time Window {batch_num + 1}/{total_batches}: Processing API requests {start_idx + 1} to {end_idx}")
-            logger.info(f"{'='*60}")
-            
-            # Record batch start time
-            batch_start_time = time.time()
-            
-            # Execute all API calls in this time window concurrently
-            batch_results = await self.get_quotes_concurrent(batch)
-            all_results.extend(batch_results)
-            
-            # Calculate batch execution time
-            batch_elapsed = time.time() - batch_start_time
-            logger.info(f"⏱️ Time window {batch_num + 1} completed in {batch_elapsed:.2f} seconds")
-            
-            # Count successes in this batch
-            batch_success = sum(1 for r in batch_results if r is not None)
-            logger.info(f"✅ Time window {batch_num + 1} success: {batch_success}/{len(batch)} API requests")
-            
-            # Wait remaining time to complete 60-second window (except for last batch)
-            if batch_num < total_batches - 1:
-                wait_time = max(5, 60 - batch_elapsed)  # Minimum 5s buffer
-                if batch_elapsed < 60:
-                    logger.info(f"⏸️ Waiting {wait_time:.1f} seconds to complete 60-second window...")
-                else:
-                    logger.info(f"⚠️ Batch took {batch_elapsed:.1f}s (>60s) - waiting minimum 5s buffer...")
-                await asyncio.sleep(wait_time)
+        logger.info(f"📦 Rate: {budget['rate_per_minute']}/min (burst {budget['burst']}), budget in use: {budget['utilization_pct']}%")
+        logger.info(f"⏱️ Estimated time: ~{backlog / budget['rate_per_minute'] * 60:.1f}s + response time")
+        
+        start_time = time.time()
+        
+        async def _paced_get_quote(batch):
+            async with limiter.slot():
+                return await self.get_quote(batch)
+        
+        results = await asyncio.gather(*[_paced_get_quote(b) for b in symbol_batches], return_exceptions=True)
+        all_results = [r if not isinstance(r, Exception) else None for r in results]
+        elapsed = time.time() - start_time
         
         # Final summary
         total_success = sum(1 for r in all_results if r is not None)
         total_failed = total_requests - total_success
+        budget = limiter.snapshot()
         
         logger.info(f"\n{'='*60}")
-        logger.info(f"🎯 FINAL SUMMARY")
+        logger.info(f"🎯 FINAL SUMMARY ({elapsed:.2f}s)")
         logger.info(f"{'='*60}")
         logger.info(f"✅ Successful API requests: {total_success}/{total_requests} ({total_success/total_requests*100:.1f}%)")
         logger.info(f"❌ Failed API requests: {total_failed}/{total_requests} ({total_failed/total_requests*100:.1f}%)")
+        logger.info(f"📈 Quote budget used: {budget['used_last_minute']}/{budget['rate_per_minute']} in last 60s ({budget['utilization_pct']}%)")
         logger.info(f"{'='*60}\n")
         
         return all_results
@@ -216,7 +194,7 @@ async def get_quotes_with_rate_limit(
     requests_per_minute: int = 190
 ) -> List[Optional[Dict[str, Any]]]:
     """
-    Get quotes with rate limiting (190 req/min, 5% under API limit)
+    Get quotes paced by the shared Kotak token bucket (190 req/min, 5% under API limit)
     
     Args:
         symbol_batches: List of symbol lists (each inner list = 1 API request)
@@ -230,20 +208,49 @@ async def get_quotes_with_rate_limit(
   
 
 
+def _token_series(values) -> pd.Series:
+    """
+    Vectorised str(int(float(token))): coerce EXCHANGE_TOKEN / exchange_token values
+    to truncated float keys (NaN for blank/invalid), preserving the input index.
+    """
+    tokens = pd.to_numeric(pd.Series(values), errors='coerce').astype('float64')
+    return np.trunc(tokens.where(np.isfinite(tokens)))
+
+
+def _quote_price_map(quote_ohlc):
+    """
+    Build the token→open price Series (open > 0, last quote per token wins) from
+    fetch_ohlc_from_quote_result() output. Also returns the columnar quotes frame.
+    """
+    quotes = pd.DataFrame(list(quote_ohlc), columns=['exchange_token', 'display_symbol', 'open'])
+    quotes['token'] = _token_series(quotes['exchange_token'])
+    quotes['open'] = pd.to_numeric(quotes['open'], errors='coerce')
+    priced = quotes[quotes['token'].notna() & (quotes['open'] > 0)]
+    price_map = priced.drop_duplicates('token', keep='last').set_index('token')['open']
+    return price_map, quotes
+
+
+def _apply_order_prices(df):
+    """
+    BUY ORDER = OPEN PRICE - (GAP% of OPEN PRICE), SELL ORDER = OPEN PRICE + (GAP% of OPEN PRICE),
+    rounded to 0 decimals in one columnar pass. NaN rows (no price) stay NaN.
+    """
+    df['OPEN PRICE'] = pd.to_numeric(df['OPEN PRICE'], errors='coerce')
+    df['GAP'] = pd.to_numeric(df['GAP'], errors='coerce')
+    gap_frac = df['GAP'] / 100
+    df['BUY ORDER'] = (df['OPEN PRICE'] * (1 - gap_frac)).round(0)
+    df['SELL ORDER'] = (df['OPEN PRICE'] * (1 + gap_frac)).round(0)
+    return df
+
+
 async def get_gsheet_stocks_df(df):
     """Get stock data from Google Sheet as pandas DataFrame"""
 
-    all_rows = []
-    
     if df is not None:
         print("\n📊 Stock Data DataFrame from Google Sheet:")
 
         # Convert to list of dicts for compatibility
-        for index, row in df.iterrows():
-            # Convert row to key-value dictionary
-            row_dict = row.to_dict()
-            all_rows.append(row_dict)
-        return all_rows
+        return df.to_dict(orient='records')
     else:
         print("❌ Failed to fetch stock data from Google Sheet")
         return None
@@ -253,48 +260,32 @@ async def get_symbol_from_gsheet_stocks_df(all_rows):
     Create symbols list and track valid row indices with duplicate detection
     Returns: (symbols_list, valid_indices) - only UNIQUE valid symbols, with their first occurrence positions
     Duplicates are skipped to save API calls
+    Accepts the list of row dicts or the DataFrame itself (validated column-wise).
     """
-    symbols_list = []
-    valid_indices = []  # Track which rows have valid data
-    seen_tokens = {}  # Track duplicate tokens: {token: first_row_index}
-    duplicate_count = 0
-    
-    for idx, row in enumerate(all_rows):
-        # Check if row has valid EXCHANGE_TOKEN and GAP
-        token_value = row.get('EXCHANGE_TOKEN')
-        gap_value = row.get('GAP')
-        
-        # Skip rows with invalid/empty EXCHANGE_TOKEN or GAP
-        if pd.isna(token_value) or token_value is None or token_value == '' or token_value == 0:
-            logger.debug(f"Row {idx}: Skipping - invalid EXCHANGE_TOKEN")
-            continue
-        
-        if pd.isna(gap_value) or gap_value is None or gap_value == '':
-            logger.debug(f"Row {idx}: Skipping - invalid GAP")
-            continue
-        
-        # Valid row - convert to symbol
-        try:
-            exchange_token = int(float(token_value))
-            if exchange_token > 0:  # Only valid positive tokens
-                # Check for duplicate token
-                if exchange_token in seen_tokens:
-                    # Duplicate found - skip to save API call
-                    duplicate_count += 1
-                    logger.debug(f"Row {idx}: Duplicate token {exchange_token} (first seen at row {seen_tokens[exchange_token]}), skipping")
-                    continue
-                
-                # First occurrence - add to fetch list
-                symbol = f"nse_cm|{exchange_token}"
-                symbols_list.append(symbol)
-                valid_indices.append(idx)  # Track original row position
-                seen_tokens[exchange_token] = idx  # Mark as seen
-        except (ValueError, TypeError):
-            logger.debug(f"Row {idx}: Skipping - could not convert EXCHANGE_TOKEN to int")
-            continue
+    rows = all_rows if isinstance(all_rows, pd.DataFrame) else pd.DataFrame(list(all_rows))
+    total_rows = len(rows)
+    
+    if total_rows == 0 or 'EXCHANGE_TOKEN' not in rows.columns or 'GAP' not in rows.columns:
+        logger.info(f"📊 Created 0 unique symbols from {total_rows} total rows")
+        return [], []
+    
+    # Valid row = positive EXCHANGE_TOKEN (int-convertible) and non-empty GAP
+    tokens = _token_series(rows['EXCHANGE_TOKEN']).to_numpy()
+    gap = rows['GAP']
+    gap_ok = (gap.notna() & gap.ne('')).to_numpy()
+    valid_pos = np.flatnonzero(gap_ok & (np.nan_to_num(tokens, nan=0.0) > 0))
+    valid_tokens = tokens[valid_pos].astype(np.int64)
+    
+    # Keep first occurrence of each token - duplicates are skipped to save API calls
+    _, first_idx = np.unique(valid_tokens, return_index=True)
+    first_idx.sort()
+    duplicate_count = len(valid_pos) - len(first_idx)
+    
+    valid_indices = valid_pos[first_idx].tolist()  # Track original row positions
+    symbols_list = [f"nse_cm|{t}" for t in valid_tokens[first_idx].tolist()]
 
-    logger.info(f"📊 Created {len(symbols_list)} unique symbols from {len(all_rows)} total rows")
-    logger.info(f"📊 Skipped: {len(all_rows) - len(symbols_list)} rows ({duplicate_count} duplicates, {len(all_rows) - len(symbols_list) - duplicate_count} invalid)")
+    logger.info(f"📊 Created {len(symbols_list)} unique symbols from {total_rows} total rows")
+    logger.info(f"📊 Skipped: {total_rows - len(symbols_list)} rows ({duplicate_count} duplicates, {total_rows - len(symbols_list) - duplicate_count} invalid)")
     return symbols_list, valid_indices
 
 async def flatten_quote_result_list(data):
@@ -371,79 +362,47 @@ async def update_df_with_quote_ohlc(df, quote_ohlc, valid_indices):
     """
     Update DataFrame with OHLC data using exchange_token matching (not positional).
     Falls back to positional mapping only if token matching fails.
+    Columnar: the token→open Series is joined onto EXCHANGE_TOKEN in one vectorised map.
     """
-    df['OPEN PRICE'] = None
+    df['OPEN PRICE'] = np.nan
     
     logger.info(f"📊 Mapping {len(quote_ohlc)} quotes to {len(valid_indices)} valid row positions out of {len(df)} total rows")
     
-    # Build token→open_price lookup from API results for O(1) matching
-    token_price_map = {}
-    zero_price_tokens = []
-    for q in quote_ohlc:
-        token = q.get('exchange_token', '')
-        open_price = q.get('open', '')
-        if token and str(token).strip():
-            token_key = str(int(float(token)))
-            if open_price != '' and open_price is not None:
-                price_val = float(open_price)
-                if price_val > 0:
-                    token_price_map[token_key] = price_val
-                else:
-                    zero_price_tokens.append(f"{q.get('display_symbol', '?')}(token={token_key})")
-    
-    if zero_price_tokens:
-        logger.warning(f"⚠️ {len(zero_price_tokens)} stocks returned open=0 (pre-market/no trade): {zero_price_tokens[:20]}")
-    
-    logger.info(f"📊 Token price map built: {len(token_price_map)} valid prices from {len(quote_ohlc)} quotes")
-    
-    mapped_count = 0
-    skipped_count = 0
-    token_match_count = 0
-    
-    for i, idx in enumerate(valid_indices):
-        row_token = df.at[idx, 'EXCHANGE_TOKEN'] if 'EXCHANGE_TOKEN' in df.columns else None
-        matched = False
-        
-        if row_token is not None and not pd.isna(row_token):
-            token_key = str(int(float(row_token)))
-            if token_key in token_price_map:
-                df.at[idx, 'OPEN PRICE'] = token_price_map[token_key]
-                mapped_count += 1
-                token_match_count += 1
-                matched = True
-        
-        if not matched:
-            # Fallback: positional mapping (only if token match failed)
-            if i < len(quote_ohlc):
-                open_price = quote_ohlc[i].get('open', '')
-                if open_price != '' and open_price is not None:
-                    price_val = float(open_price)
-                    if price_val > 0:
-                        df.at[idx, 'OPEN PRICE'] = price_val
-                        mapped_count += 1
-                    else:
-                        skipped_count += 1
-                else:
-                    skipped_count += 1
-            else:
-                skipped_count += 1
+    # Build token→open_price lookup from API results
+    price_map, quotes = _quote_price_map(quote_ohlc)
+    zero_price = quotes[quotes['token'].notna() & (quotes['open'] <= 0)]
     
-    logger.info(f"✅ Mapped {mapped_count} prices ({token_match_count} by token, {mapped_count - token_match_count} by position), skipped {skipped_count}")
+    if len(zero_price):
+        zero_price_tokens = [
+            f"{sym or '?'}(token={int(tok)})"
+            for sym, tok in zip(zero_price['display_symbol'].head(20), zero_price['token'].head(20))
+        ]
+        logger.warning(f"⚠️ {len(zero_price)} stocks returned open=0 (pre-market/no trade): {zero_price_tokens}")
     
-    # Convert both OPEN PRICE and GAP to numeric (handle string/empty/None values)
-    df['OPEN PRICE'] = pd.to_numeric(df['OPEN PRICE'], errors='coerce')
-    df['GAP'] = pd.to_numeric(df['GAP'], errors='coerce')
+    logger.info(f"📊 Token price map built: {len(price_map)} valid prices from {len(quote_ohlc)} quotes")
+    
+    if valid_indices:
+        if 'EXCHANGE_TOKEN' in df.columns:
+            by_token = _token_series(df.loc[valid_indices, 'EXCHANGE_TOKEN']).map(price_map)
+        else:
+            by_token = pd.Series(np.nan, index=valid_indices)
+        
+        # Fallback: positional mapping (only where token match failed)
+        positional = quotes['open'].where(quotes['open'] > 0).reindex(range(len(valid_indices)))
+        positional.index = by_token.index
+        prices = by_token.fillna(positional)
+        df.loc[valid_indices, 'OPEN PRICE'] = prices.to_numpy()
+        
+        token_match_count = int(by_token.notna().sum())
+        mapped_count = int(prices.notna().sum())
+    else:
+        token_match_count = mapped_count = 0
+    skipped_count = len(valid_indices) - mapped_count
     
-    # Calculate BUY ORDER and SELL ORDER based on GAP%
-    # BUY ORDER = OPEN PRICE - (GAP% of OPEN PRICE)
-    # SELL ORDER = OPEN PRICE + (GAP% of OPEN PRICE)
-    # NaN values will be preserved in calculations (invalid rows will have NaN)
-    df['BUY ORDER'] = df['OPEN PRICE'] * (1 - df['GAP'] / 100)
-    df['SELL ORDER'] = df['OPEN PRICE'] * (1 + df['GAP'] / 100)
+    logger.info(f"✅ Mapped {mapped_count} prices ({token_match_count} by token, {mapped_count - token_match_count} by position), skipped {skipped_count}")
     
-    # Round to 0 decimal places
-    df['BUY ORDER'] = df['BUY ORDER'].round(0)
-    df['SELL ORDER'] = df['SELL ORDER'].round(0)
+    # Calculate BUY ORDER and SELL ORDER based on GAP% (NaN preserved for invalid rows)
+    _apply_order_prices(df)
     
     valid_count = df['OPEN PRICE'].notna().sum()
     invalid_count = df['OPEN PRICE'].isna().sum()
@@ -459,17 +418,22 @@ async def retry_missing_quotes(df, valid_indices, max_retries=2, retry_delay=120
     """
     total_retried = 0
     
+    def _missing_labels():
+        if not valid_indices:
+            return pd.Index([])
+        open_prices = pd.to_numeric(df.loc[valid_indices, 'OPEN PRICE'], errors='coerce')
+        return open_prices.index[open_prices.isna()]
+    
     for attempt in range(1, max_retries + 1):
-        missing_indices = [idx for idx in valid_indices if pd.isna(df.at[idx, 'OPEN PRICE'])]
-        if not missing_indices:
+        missing = _missing_labels()
+        if len(missing) == 0:
             logger.info(f"✅ No missing prices — retry not needed")
             break
         
-        retry_symbols = []
-        for idx in missing_indices:
-            token = df.at[idx, 'EXCHANGE_TOKEN'] if 'EXCHANGE_TOKEN' in df.columns else None
-            if token is not None and not pd.isna(token):
-                retry_symbols.append(f"nse_cm|{int(float(token))}")
+        if 'EXCHANGE_TOKEN' not in df.columns:
+            break
+        missing_tokens = _token_series(df.loc[missing, 'EXCHANGE_TOKEN']).dropna()
+        retry_symbols = ('nse_cm|' + missing_tokens.astype(np.int64).astype(str)).tolist()
         
         if not retry_symbols:
             break
@@ -483,24 +447,11 @@ async def retry_missing_quotes(df, valid_indices, max_retries=2, retry_delay=120
         retry_flattened = await flatten_quote_result_list(retry_results)
         retry_ohlc = await fetch_ohlc_from_quote_result(retry_flattened)
         
-        # Build token→price map from retry results
-        retry_price_map = {}
-        for q in retry_ohlc:
-            token = q.get('exchange_token', '')
-            open_price = q.get('open', '')
-            if token and str(token).strip() and open_price != '' and open_price is not None:
-                price_val = float(open_price)
-                if price_val > 0:
-                    retry_price_map[str(int(float(token)))] = price_val
-        
-        filled = 0
-        for idx in missing_indices:
-            token = df.at[idx, 'EXCHANGE_TOKEN'] if 'EXCHANGE_TOKEN' in df.columns else None
-            if token is not None and not pd.isna(token):
-                token_key = str(int(float(token)))
-                if token_key in retry_price_map:
-                    df.at[idx, 'OPEN PRICE'] = retry_price_map[token_key]
-                    filled += 1
+        # Join token→price map from retry results onto the missing rows
+        retry_price_map, _ = _quote_price_map(retry_ohlc)
+        fills = missing_tokens.map(retry_price_map).dropna()
+        df.loc[fills.index, 'OPEN PRICE'] = fills.to_numpy()
+        filled = len(fills)
         
         total_retried += filled
         logger.info(f"🔄 Retry {attempt}: filled {filled}/{len(retry_symbols)} missing prices")
@@ -510,13 +461,10 @@ async def retry_missing_quotes(df, valid_indices, max_retries=2, retry_delay=120
     
     # Recalculate BUY/SELL ORDER after retries
     if total_retried > 0:
-        df['OPEN PRICE'] = pd.to_numeric(df['OPEN PRICE'], errors='coerce')
-        df['GAP'] = pd.to_numeric(df['GAP'], errors='coerce')
-        df['BUY ORDER'] = (df['OPEN PRICE'] * (1 - df['GAP'] / 100)).round(0)
-        df['SELL ORDER'] = (df['OPEN PRICE'] * (1 + df['GAP'] / 100)).round(0)
+        _apply_order_prices(df)
         logger.info(f"✅ Retry complete: {total_retried} additional prices filled")
     
-    still_missing = sum(1 for idx in valid_indices if pd.isna(df.at[idx, 'OPEN PRICE']))
+    still_missing = len(_missing_labels())
     if still_missing > 0:
         logger.warning(f"⚠️ {still_missing} stocks still have no price after all retries")
     
@@ -7,22 +7,39 @@ Flow:
   2. GET /script-details/1.0/masterscrip/file-paths → CSV download URLs
   3. Download nse_cm-v1.csv → filter pGroup='EQ' → build {symbol: (stock_name, token)} map
   4. Download bse_cm-v1.csv → filter pGroup IN ('A','B') → fallback map
+     CSVs are streamed to a per-request temp file (off the event loop) and parsed
+     column-wise (usecols + vectorised filters).
+     The parsed maps are kept in MASTER_SCRIP_CACHE_DIR as small JSON indexes:
+     a second sync on the same IST day skips the network entirely, and a new
+     day revalidates with If-None-Match / If-Modified-Since (304 → reuse index).
   5. UPDATE order_stocks SET stock_name, exchange_token for all matching symbols
+     (single UPDATE ... FROM unnest(arrays))
      Priority: NSE EQ first, BSE A/B for anything still missing
 """
 
-import io
+import asyncio
+import json
 import logging
-from typing import Dict, Tuple, Optional
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Tuple, Optional
 
-import httpx
 import pandas as pd
 from sqlalchemy import text
 
+from ..config import get_settings
 from ..database import get_db_session
+from .broker_http import get_kotak_client
 
 logger = logging.getLogger(__name__)
 
+_IST = timezone(timedelta(hours=5, minutes=30))
+
+# Columns the parsers need — everything else in the ~60-column master file is skipped
+_MASTER_COLUMNS = {"pSymbolName", "pTrdSymbol", "pSymbol", "pGroup"}
+
 
 async def _get_session_auth() -> Optional[Dict]:
     """Get base_url + access_token from active Kotak session."""
@@ -43,13 +60,12 @@ async def _fetch_csv_urls(base_url: str, access_token: str) -> Dict[str, Optiona
     url = f"{base_url}/script-details/1.0/masterscrip/file-paths"
     headers = {"accept": "*/*", "Authorization": access_token}
 
-    async with httpx.AsyncClient(verify=False, timeout=60, follow_redirects=True) as client:
-        resp = await client.get(url, headers=headers)
-        if resp.status_code != 200:
-            logger.error(f"Master scrip file-paths failed: HTTP {resp.status_code}")
-            return {"nse": None, "bse": None}
+    resp = await get_kotak_client().get(url, headers=headers, timeout=60, follow_redirects=True)
+    if resp.status_code != 200:
+        logger.error(f"Master scrip file-paths failed: HTTP {resp.status_code}")
+        return {"nse": None, "bse": None}
 
-        paths = resp.json().get("data", {}).get("filesPaths", [])
+    paths = resp.json().get("data", {}).get("filesPaths", [])
 
     nse_url = None
     bse_url = None
@@ -62,131 +78,234 @@ async def _fetch_csv_urls(base_url: str, access_token: str) -> Dict[str, Optiona
     return {"nse": nse_url, "bse": bse_url}
 
 
-def _parse_nse_csv(csv_text: str) -> Dict[str, Tuple[str, int]]:
+def _read_master_csv(source) -> pd.DataFrame:
+    """Read only the parser columns as strings (source: path or file-like)."""
+    df = pd.read_csv(
+        source,
+        usecols=lambda c: c.strip() in _MASTER_COLUMNS,
+        dtype=str,
+        keep_default_na=False,
+        na_values=[""],
+    )
+    df.columns = [c.strip() for c in df.columns]
+    return df
+
+
+def _clean_master_rows(df: pd.DataFrame, groups) -> pd.DataFrame:
+    """Filter pGroup and bad tokens; add token (int), symbol (name before '-') and has_name."""
+    if "pGroup" in df.columns:
+        df = df[df["pGroup"].str.strip().isin(groups)]
+    tokens = pd.to_numeric(df["pSymbol"], errors="coerce")
+    df = df.loc[tokens.notna()]
+    names = df["pSymbolName"].str.strip()
+    return df.assign(
+        pSymbolName=names,
+        token=tokens[tokens.notna()].astype("int64"),
+        symbol=names.str.split("-").str[0].str.strip().str.upper(),
+        has_name=names.notna() & (names != ""),
+    )
+
+
+def _parse_nse_csv(source) -> Dict[str, Tuple[str, int]]:
     """
     Parse NSE CM CSV → {SYMBOL: (pSymbolName, pSymbol)}
     Kotak columns: pSymbolName='ACC-EQ', pSymbol=22, pGroup='EQ'
     """
-    df = pd.read_csv(io.StringIO(csv_text))
-    df.columns = [c.strip() for c in df.columns]
-
-    if "pGroup" in df.columns:
-        df = df[df["pGroup"] == "EQ"].copy()
-
-    result: Dict[str, Tuple[str, int]] = {}
-    for _, row in df.iterrows():
-        sym_name = str(row.get("pSymbolName", "")).strip()
-        token = row.get("pSymbol")
-        if not sym_name or pd.isna(token):
-            continue
-        clean_sym = sym_name.split("-")[0].strip().upper()
-        try:
-            result[clean_sym] = (sym_name, int(float(token)))
-        except (ValueError, TypeError):
-            continue
+    df = _clean_master_rows(_read_master_csv(source), ["EQ"])
+    df = df[df["has_name"]]
+    result = dict(zip(df["symbol"], zip(df["pSymbolName"], df["token"].tolist())))
 
     logger.info(f"Parsed {len(result)} NSE EQ symbols from master scrip")
     return result
 
 
-def _parse_bse_csv(csv_text: str) -> Dict[str, Tuple[str, int]]:
+def _parse_bse_csv(source) -> Dict[str, Tuple[str, int]]:
     """
     Parse BSE CM CSV → {SYMBOL: (pSymbolName, pSymbol)}
     Filter pGroup IN ('A', 'B') only.
+    Each row is also indexed under its pTrdSymbol when that differs.
     """
-    df = pd.read_csv(io.StringIO(csv_text))
-    df.columns = [c.strip() for c in df.columns]
+    df = _clean_master_rows(_read_master_csv(source), ["A", "B"])
+    entries = pd.DataFrame({"symbol": df["symbol"], "name": df["pSymbolName"], "token": df["token"], "k": 0})
+    entries = entries[df["has_name"]]
 
-    if "pGroup" in df.columns:
-        df = df[df["pGroup"].isin(["A", "B"])].copy()
-
-    result: Dict[str, Tuple[str, int]] = {}
-    for _, row in df.iterrows():
-        sym_name = str(row.get("pSymbolName", "")).strip()
-        trd_sym = str(row.get("pTrdSymbol", "")).strip()
-        token = row.get("pSymbol")
-        if not sym_name or pd.isna(token):
-            continue
-        clean_sym = sym_name.split("-")[0].strip().upper()
-        clean_trd = trd_sym.split("-")[0].strip().upper() if trd_sym else ""
-        try:
-            tok = int(float(token))
-            result[clean_sym] = (sym_name, tok)
-            if clean_trd and clean_trd != clean_sym:
-                result[clean_trd] = (trd_sym, tok)
-        except (ValueError, TypeError):
-            continue
+    if "pTrdSymbol" in df.columns:
+        trd = df["pTrdSymbol"].str.strip()
+        trd_clean = trd.str.split("-").str[0].str.strip().str.upper()
+        has_trd = df["has_name"] & trd.notna() & (trd != "") & (trd_clean != df["symbol"])
+        by_trd = pd.DataFrame({"symbol": trd_clean, "name": trd, "token": df["token"], "k": 1})[has_trd]
+        # Interleave per source row (name, then trd) so later rows win exactly as before
+        entries = pd.concat([entries, by_trd]).rename_axis("row").sort_values(["row", "k"], kind="stable")
+
+    result = dict(zip(entries["symbol"], zip(entries["name"], entries["token"].tolist())))
 
     logger.info(f"Parsed {len(result)} BSE A/B symbols from master scrip")
     return result
 
 
-async def sync_master_scrip_to_order_stocks() -> Dict:
+# ─── On-disk master scrip index ───
+
+def _cache_dir() -> Path:
+    path = Path(get_settings().MASTER_SCRIP_CACHE_DIR)
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def _load_index(exchange: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_cache_dir() / f"{exchange}.json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_index(exchange: str, index: Dict[str, Any]):
+    path = _cache_dir() / f"{exchange}.json"
+    # Unique temp name: two concurrent syncs must not interleave writes into one file
+    with tempfile.NamedTemporaryFile("w", dir=path.parent, prefix=f".{exchange}-", suffix=".json.tmp",
+                                     delete=False) as f:
+        json.dump(index, f, separators=(",", ":"))
+    os.replace(f.name, path)
+
+
+def _new_csv_part(exchange: str):
+    """Open a uniquely named temp file for one streamed master CSV (binary, caller closes and unlinks)."""
+    return tempfile.NamedTemporaryFile(dir=_cache_dir(), prefix=f".{exchange}-", suffix=".csv.part", delete=False)
+
+
+def _index_map(index: Dict[str, Any]) -> Dict[str, Tuple[str, int]]:
+    return {sym: (name, token) for sym, (name, token) in index["symbols"].items()}
+
+
+def _today_ist() -> str:
+    return datetime.now(_IST).date().isoformat()
+
+
+def _fresh_today(index: Optional[Dict[str, Any]], url: Optional[str] = None) -> bool:
+    if not index or index.get("fetched_date") != _today_ist():
+        return False
+    return url is None or index.get("url") == url
+
+
+async def _load_master_map(exchange: str, url: str, parser, force: bool = False) -> Tuple[Dict[str, Tuple[str, int]], str]:
+    """
+    Return ({SYMBOL: (name, token)}, source) for one exchange master file.
+    source is "cache" (same-day index), "not_modified" (304 revalidation) or "download".
+    """
+    index = None if force else await asyncio.to_thread(_load_index, exchange)
+    if _fresh_today(index, url):
+        return _index_map(index), "cache"
+
+    headers = {}
+    if index and index.get("url") == url:
+        if index.get("etag"):
+            headers["If-None-Match"] = index["etag"]
+        if index.get("last_modified"):
+            headers["If-Modified-Since"] = index["last_modified"]
+
+    client = get_kotak_client()
+    logger.info(f"Downloading {exchange} master scrip...")
+    async with client.stream("GET", url, headers=headers, timeout=120, follow_redirects=True) as resp:
+        if resp.status_code == 304 and index:
+            index["fetched_date"] = _today_ist()
+            await asyncio.to_thread(_save_index, exchange, index)
+            logger.info(f"{exchange} master scrip not modified — reusing local index")
+            return _index_map(index), "not_modified"
+        if resp.status_code != 200:
+            logger.error(f"{exchange} download failed: HTTP {resp.status_code}")
+            return {}, "error"
+        part = await asyncio.to_thread(_new_csv_part, exchange)
+        csv_path = Path(part.name)
+        try:
+            async for chunk in resp.aiter_bytes(1 << 20):
+                await asyncio.to_thread(part.write, chunk)
+        except BaseException:
+            await asyncio.to_thread(part.close)
+            csv_path.unlink(missing_ok=True)
+            raise
+        await asyncio.to_thread(part.close)
+        etag = resp.headers.get("etag")
+        last_modified = resp.headers.get("last-modified")
+
+    try:
+        result = await asyncio.to_thread(parser, csv_path)
+    finally:
+        csv_path.unlink(missing_ok=True)
+
+    await asyncio.to_thread(_save_index, exchange, {
+        "url": url,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_date": _today_ist(),
+        "symbols": result,
+    })
+    return result, "download"
+
+
+async def sync_master_scrip_to_order_stocks(force: bool = False) -> Dict:
     """
     Main entry: fetch Kotak master scrip CSVs and update order_stocks table.
+    force=True ignores the local index and re-downloads both files.
     Returns summary dict.
     """
     auth = await _get_session_auth()
     if not auth:
         return {"success": False, "message": "No active Kotak session. Authenticate with TOTP first."}
 
-    urls = await _fetch_csv_urls(auth["base_url"], auth["access_token"])
-    if not urls["nse"] and not urls["bse"]:
-        return {"success": False, "message": "Failed to fetch master scrip file paths from Kotak API"}
-
     nse_map: Dict[str, Tuple[str, int]] = {}
     bse_map: Dict[str, Tuple[str, int]] = {}
+    sources = {"nse": "none", "bse": "none"}
+
+    nse_index = None if force else await asyncio.to_thread(_load_index, "nse_cm")
+    bse_index = None if force else await asyncio.to_thread(_load_index, "bse_cm")
+    if _fresh_today(nse_index) and _fresh_today(bse_index):
+        # Both indexes already refreshed today — no Kotak round trips at all
+        nse_map, bse_map = _index_map(nse_index), _index_map(bse_index)
+        sources = {"nse": "cache", "bse": "cache"}
+    else:
+        urls = await _fetch_csv_urls(auth["base_url"], auth["access_token"])
+        if not urls["nse"] and not urls["bse"]:
+            return {"success": False, "message": "Failed to fetch master scrip file paths from Kotak API"}
 
-    async with httpx.AsyncClient(verify=False, timeout=120, follow_redirects=True) as client:
         if urls["nse"]:
-            logger.info(f"Downloading NSE CM master scrip...")
-            resp = await client.get(urls["nse"])
-            if resp.status_code == 200:
-                nse_map = _parse_nse_csv(resp.text)
-            else:
-                logger.error(f"NSE CM download failed: HTTP {resp.status_code}")
-
+            nse_map, sources["nse"] = await _load_master_map("nse_cm", urls["nse"], _parse_nse_csv, force)
         if urls["bse"]:
-            logger.info(f"Downloading BSE CM master scrip...")
-            resp = await client.get(urls["bse"])
-            if resp.status_code == 200:
-                bse_map = _parse_bse_csv(resp.text)
-            else:
-                logger.error(f"BSE CM download failed: HTTP {resp.status_code}")
+            bse_map, sources["bse"] = await _load_master_map("bse_cm", urls["bse"], _parse_bse_csv, force)
 
     if not nse_map and not bse_map:
         return {"success": False, "message": "Failed to download any master scrip CSV"}
 
-    # Update order_stocks: NSE first, BSE fallback
-    nse_updated = 0
-    bse_updated = 0
-    still_missing = 0
-
+    # Update order_stocks: NSE first, BSE fallback — one set-based UPDATE
     async with get_db_session() as db:
         rows = await db.execute(text(
             "SELECT symbol FROM order_stocks WHERE is_active = true"
         ))
         symbols = [r[0] for r in rows.fetchall()]
 
+        syms, names, tokens = [], [], []
+        nse_updated = 0
+        bse_updated = 0
         for sym in symbols:
             if sym in nse_map:
                 stock_name, token = nse_map[sym]
-                await db.execute(text("""
-                    UPDATE order_stocks
-                    SET stock_name = :sn, exchange_token = :et, updated_at = now()
-                    WHERE symbol = :sym
-                """), {"sn": stock_name, "et": token, "sym": sym})
                 nse_updated += 1
             elif sym in bse_map:
                 stock_name, token = bse_map[sym]
-                await db.execute(text("""
-                    UPDATE order_stocks
-                    SET stock_name = :sn, exchange_token = :et, updated_at = now()
-                    WHERE symbol = :sym
-                """), {"sn": stock_name, "et": token, "sym": sym})
                 bse_updated += 1
             else:
-                still_missing += 1
+                continue
+            syms.append(sym)
+            names.append(stock_name)
+            tokens.append(token)
+        still_missing = len(symbols) - len(syms)
+
+        if syms:
+            await db.execute(text("""
+                UPDATE order_stocks AS os
+                SET stock_name = v.sn, exchange_token = v.et, updated_at = now()
+                FROM unnest(CAST(:syms AS text[]), CAST(:sns AS text[]), CAST(:ets AS int[])) AS v(sym, sn, et)
+                WHERE os.symbol = v.sym
+            """), {"syms": syms, "sns": names, "ets": tokens})
 
     total = nse_updated + bse_updated
     logger.info(
@@ -203,4 +322,5 @@ async def sync_master_scrip_to_order_stocks() -> Dict:
         "total_symbols": len(symbols),
         "nse_master_count": len(nse_map),
         "bse_master_count": len(bse_map),
+        "master_source": sources,
     }
@@ -6,12 +6,34 @@ import os
 from datetime import datetime, timedelta
 from typing import Optional, Dict, Any
 import logging
+import time
 from pathlib import Path
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# ─── Process-wide session cache ──────────────────────────────────────────────
+# load_session() is called for every quote batch and every order. Parsing
+# kotak_session.json each time meant thousands of blocking file reads inside the
+# event loop during order placement. The parsed session is cached per resolved
+# file path and keyed on (mtime_ns, size):
+#   - save_session()/clear_session() in this process update the cache directly
+#   - other processes (API workers, Celery) see a new TOTP login on the next
+#     stat(), which runs at most once per _STAT_INTERVAL seconds
+#   - expires_at is checked on every hit, so a midnight expiry still clears it
+_STAT_INTERVAL = 1.0
+# {path: {"key": (mtime_ns, size), "data": dict, "expires_at": datetime, "checked": monotonic}}
+_session_cache: Dict[Path, Dict[str, Any]] = {}
+
+
+def _file_key(path: Path) -> Optional[tuple]:
+    try:
+        st = path.stat()
+    except FileNotFoundError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
 class KotakSessionManager:
     """
     Comprehensive session management for Kotak Securities API
@@ -21,6 +43,36 @@ class KotakSessionManager:
     def __init__(self, session_file: str = "kotak_session.json"):
         self.session_file = Path(session_file)
         self._session_data = None
+
+    @property
+    def _cache_path(self) -> Path:
+        return self.session_file.resolve()
+
+    def _cache_store(self, session_data: Dict[str, Any], file_key: Optional[tuple] = None):
+        """Remember parsed session data under the file's (mtime, size) at read/write time."""
+        try:
+            expires_at = datetime.fromisoformat(session_data.get("expires_at", ""))
+        except Exception:
+            expires_at = None
+        _session_cache[self._cache_path] = {
+            "key": file_key or _file_key(self.session_file),
+            "data": session_data,
+            "expires_at": expires_at,
+            "checked": time.monotonic(),
+        }
+
+    def _cache_lookup(self) -> Optional[Dict[str, Any]]:
+        """Return cached session if the file is unchanged, else None (caller re-reads)."""
+        entry = _session_cache.get(self._cache_path)
+        if entry is None:
+            return None
+        now = time.monotonic()
+        if now - entry["checked"] >= _STAT_INTERVAL:
+            if _file_key(self.session_file) != entry["key"]:
+                _session_cache.pop(self._cache_path, None)
+                return None
+            entry["checked"] = now
+        return entry
     
     def _get_next_midnight(self) -> datetime:
         """
@@ -98,6 +150,7 @@ class KotakSessionManager:
                     json.dump(session_info, f, indent=2)
 
             self._session_data = session_info
+            self._cache_store(session_info)
             logger.info(f"Session saved successfully to {self.session_file}")
             return True
             
@@ -107,13 +160,25 @@ class KotakSessionManager:
     
     async def load_session(self) -> Optional[Dict[str, Any]]:
         """
-        Load session data from persistent storage
+        Load session data from the process-wide cache, falling back to
+        persistent storage when the session file changed (new TOTP login).
         
         Returns:
             Dict containing session data if valid, None otherwise
         """
         try:
-            if not self.session_file.exists():
+            cached = self._cache_lookup()
+            if cached is not None:
+                expires_at = cached["expires_at"]
+                if expires_at is None or datetime.now() > expires_at:
+                    logger.warning("Cached session is expired")
+                    await self.clear_session()
+                    return None
+                self._session_data = cached["data"]
+                return cached["data"]
+
+            file_key = _file_key(self.session_file)
+            if file_key is None:
                 logger.info("No existing session file found")
                 return None
             
@@ -127,6 +192,7 @@ class KotakSessionManager:
                 return None
             
             self._session_data = session_data
+            self._cache_store(session_data, file_key)
             logger.info("Session loaded successfully from storage")
             return session_data
             
@@ -218,6 +284,7 @@ class KotakSessionManager:
             bool: True if cleared successfully
         """
         try:
+            _session_cache.pop(self._cache_path, None)
             if self.session_file.exists():
                 self.session_file.unlink()
             
@@ -5,21 +5,25 @@ Extracted from: nse_url_test.py (run_quarterly_extraction, _upsert_quarterly_res
 """
 
 import asyncio
-import base64
 import io
 import json
 import logging
 import re
 from datetime import datetime, timedelta, timezone
-from typing import Any, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Union
 
-import fitz
 import httpx
 from sqlalchemy import text
 
 from ..database import get_db_session
 from ..config import get_settings
 from ..cache_keys import invalidate_pe_analysis
+from .pdf_cache import get_cached_pdf
+from .ai_result_cache import get_ai_result, put_ai_result, request_key
+from .openai_governor import openai_slot
+from .page_image_encoder import encode_pages, image_data_url, log_encode_stats
+from .pdf_document import PdfDocument, open_pdf
+from .pdf_render_pool import run_pdf_job
 from .quote_fetcher import get_single_quote
 
 logger = logging.getLogger(__name__)
@@ -116,25 +120,17 @@ _MAX_PAGES_TO_AI = 8
 _MAX_PAGES_SCAN = 25
 
 
-def _render_pages_to_png(pdf_bytes: bytes, page_indices: List[int], zoom: float = 2.0) -> List[bytes]:
-    """Render given PDF page indices (0-based) to PNG bytes via PyMuPDF."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    out: List[bytes] = []
-    mat = fitz.Matrix(zoom, zoom)
-    for idx in page_indices:
-        if idx < 0 or idx >= doc.page_count:
-            continue
-        try:
-            pix = doc.load_page(idx).get_pixmap(matrix=mat, alpha=False)
-            out.append(pix.tobytes("png"))
-        except Exception as e:
-            logger.warning(f"Page {idx} render failed: {e}")
-    doc.close()
-    return out
+def _render_pages_to_png(pdf: Union[bytes, str, PdfDocument], page_indices: List[int], zoom: float = 2.0) -> List[bytes]:
+    """Legacy full-colour PNG render (baseline for the vision image comparison)."""
+    with open_pdf(pdf) as doc:
+        return doc.render_png(page_indices, zoom=zoom)
 
 
 async def download_pdf_bytes(pdf_url: str) -> Optional[bytes]:
-    """Download PDF with BSE-friendly headers."""
+    """
+    Download PDF with BSE-friendly headers, through the shared disk cache
+    (pdf_cache.py) — repeat passes, fallbacks and Celery retries reuse one fetch.
+    """
     headers = {
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36",
         "Accept": "application/pdf,application/octet-stream,*/*",
@@ -142,35 +138,42 @@ async def download_pdf_bytes(pdf_url: str) -> Optional[bytes]:
         "Referer": "https://www.bseindia.com/",
     }
     try:
-        async with httpx.AsyncClient(timeout=60, follow_redirects=True) as client:
-            resp = await client.get(pdf_url, headers=headers)
-            resp.raise_for_status()
-            return resp.content
+        return await get_cached_pdf(pdf_url, headers, timeout=60)
     except Exception as e:
         logger.error(f"PDF download failed ({pdf_url}): {e}")
         return None
 
 
-def _select_financial_pages(pdf_bytes: bytes) -> tuple:
+def _select_financial_pages(pdf: Union[bytes, PdfDocument]) -> tuple:
     """Return (filtered_page_indices, total_pages, has_text_layer)."""
-    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
-    total = doc.page_count
-    filtered: List[int] = []
-    text_pages = 0
-    for idx in range(min(total, _MAX_PAGES_SCAN)):
-        try:
-            text = doc.load_page(idx).get_text("text")
-        except Exception:
-            continue
-        if text.strip():
-            text_pages += 1
-        text_lower = text.lower()
-        hits = sum(1 for kw in _FINANCIAL_KEYWORDS if kw in text_lower)
-        if hits >= _MIN_KEYWORD_MATCHES:
-            filtered.append(idx)
-    doc.close()
-    has_text = text_pages > 0
-    return filtered, total, has_text
+    with open_pdf(pdf) as doc:
+        scan = range(min(doc.page_count, _MAX_PAGES_SCAN))
+        filtered = [idx for idx in scan if doc.keyword_hits(idx, _FINANCIAL_KEYWORDS) >= _MIN_KEYWORD_MATCHES]
+        has_text = any(doc.has_text(idx) for idx in scan)
+        return filtered, doc.page_count, has_text
+
+
+def _render_first_pages(pdf: Union[bytes, str, PdfDocument], limit: int) -> tuple:
+    """Encode pages 0..limit-1 (full-document fallback). Returns (images, encode_stats)."""
+    with open_pdf(pdf) as doc:
+        return encode_pages(doc, range(min(doc.page_count, limit)))
+
+
+def _select_and_render_financial_pages(pdf: Union[bytes, str]) -> tuple:
+    """
+    Page selection + rendering on one open document (strategy: see download_and_convert_pdf).
+    Returns (images, total_pages, keyword_matched, mode, encode_stats).
+    """
+    with open_pdf(pdf) as doc:
+        filtered, total, has_text = _select_financial_pages(doc)
+        if has_text and filtered:
+            page_indices = filtered[:_MAX_PAGES_TO_AI]
+            mode = "keyword"
+        else:
+            page_indices = list(range(min(total, 6)))
+            mode = "fallback" if has_text else "image-pdf"
+        images, stats = encode_pages(doc, page_indices)
+        return images, total, len(filtered), mode, stats
 
 
 async def download_and_convert_pdf(pdf_url: str) -> List[bytes]:
@@ -186,23 +189,20 @@ async def download_and_convert_pdf(pdf_url: str) -> List[bytes]:
         return []
 
     try:
-        filtered, total, has_text = await asyncio.to_thread(_select_financial_pages, pdf_bytes)
+        return await convert_pdf_bytes(pdf_bytes, pdf_url)
     except Exception as e:
         logger.error(f"PDF page-selection failed: {e}")
         return []
 
-    if has_text and filtered:
-        page_indices = filtered[:_MAX_PAGES_TO_AI]
-        mode = "keyword"
-    else:
-        page_indices = list(range(min(total, 6)))
-        mode = "fallback" if has_text else "image-pdf"
 
-    images = await asyncio.to_thread(_render_pages_to_png, pdf_bytes, page_indices)
+async def convert_pdf_bytes(pdf_bytes: bytes, pdf_url: str) -> List[bytes]:
+    """Page selection + rendering for bytes already in hand (download_and_convert_pdf, extraction_pipeline)."""
+    images, total, matched, mode, stats = await run_pdf_job(_select_and_render_financial_pages, pdf_bytes)
     logger.info(
-        f"PDF: {total} pages total, {len(filtered)} keyword-matched, "
+        f"PDF: {total} pages total, {matched} keyword-matched, "
         f"selected {len(images)} ({mode})"
     )
+    log_encode_stats(pdf_url, stats)
     return images
 
 
@@ -211,18 +211,113 @@ async def download_and_convert_pdf_full(pdf_url: str, max_pages: int = 12) -> Li
     pdf_bytes = await download_pdf_bytes(pdf_url)
     if pdf_bytes is None:
         return []
+    return await convert_pdf_bytes_full(pdf_bytes, pdf_url, max_pages)
 
-    def _get_page_count_and_render(data: bytes, limit: int) -> List[bytes]:
-        doc = fitz.open(stream=data, filetype="pdf")
-        n = min(doc.page_count, limit)
-        doc.close()
-        return _render_pages_to_png(data, list(range(n)))
 
-    images = await asyncio.to_thread(_get_page_count_and_render, pdf_bytes, max_pages)
+async def convert_pdf_bytes_full(pdf_bytes: bytes, pdf_url: str, max_pages: int = 12) -> List[bytes]:
+    """First max_pages of bytes already in hand, without keyword filtering."""
+    images, stats = await run_pdf_job(_render_first_pages, pdf_bytes, max_pages)
     logger.info(f"PDF (full fallback): {len(images)} pages rendered")
+    log_encode_stats(pdf_url, stats)
     return images
 
 
+# ─── Text-layer path (digitally generated PDFs) ─────────────────────────────
+# Most NSE/BSE results PDFs are generated from Excel/Word and carry a usable
+# text layer. For those the tables are rebuilt from word positions as TSV and
+# sent as plain text — a few thousand text tokens instead of 8 page images.
+
+_NUMBER_RE = re.compile(r"^\(?-?[\d,]*\d(\.\d+)?\)?$")
+_MIN_TABLE_NUMBERS = 24   # fewer numeric cells than this on the selected pages → not a usable table layer
+_MAX_GARBLED_RATIO = 0.02  # (cid:..)/U+FFFD share of characters → broken font encoding, use vision
+
+
+def _page_tsv(page) -> str:
+    """
+    Rebuild one page as TSV from word positions: words are clustered into rows
+    by vertical centre, and a horizontal gap wider than ~1 em starts a new cell.
+    """
+    words = page.get_text("words")
+    if not words:
+        return ""
+    words.sort(key=lambda w: ((w[1] + w[3]) / 2, w[0]))
+    heights = sorted(w[3] - w[1] for w in words)
+    row_tol = heights[len(heights) // 2] * 0.5
+
+    rows, current, row_y = [], [], None
+    for w in words:
+        y = (w[1] + w[3]) / 2
+        if row_y is not None and y - row_y > row_tol:
+            rows.append(current)
+            current = []
+        if not current:
+            row_y = y
+        current.append(w)
+    rows.append(current)
+
+    lines = []
+    for row in rows:
+        row.sort(key=lambda w: w[0])
+        cells, cell, prev_x1 = [], [], None
+        for x0, y0, x1, y1, word, *_ in row:
+            if prev_x1 is not None and x0 - prev_x1 > (y1 - y0):
+                cells.append(" ".join(cell))
+                cell = []
+            cell.append(word)
+            prev_x1 = x1
+        cells.append(" ".join(cell))
+        lines.append("\t".join(cells))
+    return "\n".join(lines)
+
+
+def _extract_tables_text(pdf: Union[bytes, str, PdfDocument]) -> tuple:
+    """
+    TSV for the keyword-matched pages, or None when the PDF needs vision
+    (no text layer, no financial pages, too few numbers, garbled encoding).
+    Returns (tsv_or_None, total_pages, keyword_matched, reason).
+    """
+    with open_pdf(pdf) as doc:
+        filtered, total, has_text = _select_financial_pages(doc)
+        if not has_text:
+            return None, total, 0, "image-pdf"
+        if not filtered:
+            return None, total, 0, "no-financial-pages"
+        sections = []
+        for idx in filtered[:_MAX_PAGES_TO_AI]:
+            sections.append(f"=== Page {idx + 1} ===\n{_page_tsv(doc.load_page(idx))}")
+        tsv = "\n\n".join(sections)
+
+    garbled = tsv.count("(cid:") * 6 + tsv.count("\ufffd")
+    if garbled > _MAX_GARBLED_RATIO * len(tsv):
+        return None, total, len(filtered), "garbled-text-layer"
+    numbers = sum(1 for cell in re.split(r"[\t\n]", tsv) if _NUMBER_RE.match(cell.strip()))
+    if numbers < _MIN_TABLE_NUMBERS:
+        return None, total, len(filtered), f"too-few-numbers ({numbers})"
+    return tsv, total, len(filtered), "text"
+
+
+async def download_and_extract_tables_text(pdf_url: str) -> Optional[str]:
+    """Text-first quarterly path: TSV of the financial pages, or None to fall back to vision."""
+    pdf_bytes = await download_pdf_bytes(pdf_url)
+    if pdf_bytes is None:
+        return None
+    try:
+        return await extract_tables_text_from_bytes(pdf_bytes)
+    except Exception as e:
+        logger.warning(f"PDF text-layer extraction failed: {e}")
+        return None
+
+
+async def extract_tables_text_from_bytes(pdf_bytes: bytes) -> Optional[str]:
+    """TSV of the financial pages for bytes already in hand, or None to fall back to vision."""
+    tsv, total, matched, reason = await run_pdf_job(_extract_tables_text, pdf_bytes)
+    if tsv is None:
+        logger.info(f"PDF text mode skipped ({reason}): {total} pages, {matched} keyword-matched")
+        return None
+    logger.info(f"PDF text mode: {total} pages, {matched} keyword-matched, {len(tsv)} chars TSV")
+    return tsv
+
+
 _BASE_PROMPT = """You are extracting data from an Indian company's quarterly financial results PDF.
 
 The document may have TWO tables: Standalone and Consolidated (check the title of each table).
@@ -322,10 +417,86 @@ _STEP_BY_STEP = (
 )
 
 
+_AI_MODEL = "gpt-4.1-mini"
+
+
+async def _chat_extract_json(
+    messages: List[Dict],
+    stock_symbol: str,
+    label: str,
+    count_note: str = "",
+    max_tokens: int = 16000,
+    kind: str = "quarterly",
+    source: Optional[str] = None,
+    cacheable: Optional[Callable[[Dict], bool]] = None,
+) -> Optional[Dict]:
+    """
+    POST one gpt-4.1-mini JSON-mode request; parsed JSON or None (errors logged).
+    Identical requests are replayed from the AI result cache (ai_result_cache.py).
+    Only non-empty answers that pass `cacheable` are stored, so a one-off bad
+    answer is re-asked on retry instead of replayed.
+    """
+    body = {
+        "model": _AI_MODEL,
+        "messages": messages,
+        "temperature": 0,
+        "max_tokens": max_tokens,
+        "response_format": {"type": "json_object"},
+    }
+    key = request_key(body)
+    cached = await get_ai_result(key)
+    # Also skip entries written before results were checked on the way in
+    if cached and (cacheable is None or cacheable(cached)):
+        logger.info(f"OpenAI {label} for {stock_symbol}: served from AI result cache")
+        return cached
+
+    try:
+        client = _get_openai_client()
+        async with openai_slot(kind, body) as lease:
+            resp = await client.post(
+                f"{settings.OPENAI_BASE_URL}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
+                    "Content-Type": "application/json",
+                },
+                json=body,
+            )
+            if resp.status_code == 429:
+                lease.mark_rate_limited()
+            resp.raise_for_status()
+            data = resp.json()
+            lease.record_usage(data.get("usage"))
+        usage = data.get("usage", {})
+        logger.info(
+            f"OpenAI {label} for {stock_symbol}: prompt_tokens={usage.get('prompt_tokens')}, "
+            f"completion_tokens={usage.get('completion_tokens')}"
+            + (f", {count_note}" if count_note else "")
+        )
+        ai_content = data["choices"][0]["message"].get("content")
+        if not ai_content:
+            logger.error(f"OpenAI returned empty content for {label} {stock_symbol}")
+            return None
+        result = json.loads(ai_content)
+    except Exception as e:
+        logger.error(f"OpenAI {label} extraction failed for {stock_symbol}: {e}")
+        return None
+
+    if result and (cacheable is None or cacheable(result)):
+        await put_ai_result(key, result, kind, stock_symbol, _AI_MODEL, source)
+    else:
+        logger.info(f"OpenAI {label} for {stock_symbol}: result not cached (empty or failed checks)")
+    return result
+
+
+def _has_periods(result: Dict) -> bool:
+    return bool((result.get("standalone_periods") or []) + (result.get("consolidated_periods") or []))
+
+
 async def extract_financial_data_ai(
     images: List[bytes],
     stock_symbol: str,
     company_name: str,
+    source: Optional[str] = None,
 ) -> Optional[Dict]:
     """
     Send financial-page images to OpenAI Vision (gpt-4.1-mini) to extract
@@ -341,45 +512,71 @@ async def extract_financial_data_ai(
 
     content = [{"type": "text", "text": _BASE_PROMPT}]
     for img_bytes in images:
-        b64 = base64.b64encode(img_bytes).decode()
         content.append({
             "type": "image_url",
-            "image_url": {"url": f"data:image/png;base64,{b64}"},
+            "image_url": {"url": image_data_url(img_bytes)},
         })
     content.append({"type": "text", "text": _STEP_BY_STEP})
+    return await _chat_extract_json(
+        [{"role": "user", "content": content}], stock_symbol, "vision",
+        f"images={len(images)}", source=source, cacheable=_has_periods,
+    )
 
-    try:
-        client = _get_openai_client()
-        resp = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "gpt-4.1-mini",
-                "messages": [{"role": "user", "content": content}],
-                "temperature": 0,
-                "max_tokens": 16000,
-                "response_format": {"type": "json_object"},
-            },
-        )
-        resp.raise_for_status()
-        data = resp.json()
-        usage = data.get("usage", {})
-        logger.info(
-            f"OpenAI vision for {stock_symbol}: prompt_tokens={usage.get('prompt_tokens')}, "
-            f"completion_tokens={usage.get('completion_tokens')}, images={len(images)}"
-        )
-        ai_content = data["choices"][0]["message"].get("content")
-        if not ai_content:
-            logger.error(f"OpenAI returned empty content for {stock_symbol}")
-            return None
-        return json.loads(ai_content)
-    except Exception as e:
-        logger.error(f"OpenAI extraction failed for {stock_symbol}: {e}")
+
+_TEXT_MODE_NOTE = (
+    "\nThe pages below were extracted from the PDF's text layer as TSV: one line per "
+    "printed row, cells separated by TAB, each page starting with '=== Page N ==='. "
+    "Column headers may span two or three lines above the numbers — read them together. "
+    "Wherever the steps below say 'image', read 'page'.\n\n"
+)
+
+
+async def extract_financial_data_text(
+    tables_tsv: str,
+    stock_symbol: str,
+    company_name: str,
+    source: Optional[str] = None,
+) -> Optional[Dict]:
+    """Same schema as extract_financial_data_ai, from text-layer TSV instead of page images."""
+    if not settings.OPENAI_API_KEY:
+        logger.error("OPENAI_API_KEY not configured")
         return None
 
+    content = [
+        {"type": "text", "text": _BASE_PROMPT},
+        {"type": "text", "text": _TEXT_MODE_NOTE + tables_tsv},
+        {"type": "text", "text": _STEP_BY_STEP},
+    ]
+    return await _chat_extract_json(
+        [{"role": "user", "content": content}], stock_symbol, "text",
+        f"tsv_chars={len(tables_tsv)}", source=source,
+        cacheable=lambda r: validate_text_extraction(r) is None,
+    )
+
+
+def validate_text_extraction(result: Optional[Dict]) -> Optional[str]:
+    """
+    Sanity checks for a text-mode result; returns the failure reason or None if usable.
+    Misaligned columns show up as periods without headline numbers or as
+    Total Income != Revenue + Other Income.
+    """
+    if not result:
+        return "empty response"
+    periods = (result.get("standalone_periods") or []) + (result.get("consolidated_periods") or [])
+    if not periods:
+        return "no periods"
+    for p in periods:
+        revenue = _to_float(p.get("revenue_from_operations"))
+        other = _to_float(p.get("other_income"))
+        total = _to_float(p.get("total_income"))
+        if revenue is None and _to_float(p.get("profit_after_tax")) is None and _to_float(p.get("eps_basic")) is None:
+            return f"period {p.get('column_header')} has no revenue/PAT/EPS"
+        if revenue is not None and total is not None:
+            expected = revenue + (other or 0.0)
+            if abs(total - expected) > max(1.0, 0.02 * abs(total)):
+                return f"period {p.get('column_header')}: total_income {total} != revenue + other income {expected}"
+    return None
+
 
 def _derive_quarter(period_ended: Optional[str], financial_year: Optional[str]) -> Optional[str]:
     """Derive quarter (Q1-Q4) from period_ended date string when AI returns null.
@@ -1046,23 +1243,28 @@ Use UNDER_VALUED only if conviction is high; use IGNORE for shell companies / il
 data-quality issues; use INLINE for in-line-with-market PE; use FAIRLY_VALUED for slightly
 above-cheap to slightly-below-expensive range."""
 
+    body = {
+        "model": "gpt-4o-mini",
+        "messages": [{"role": "user", "content": prompt}],
+        "max_tokens": 500,
+        "response_format": {"type": "json_object"},
+    }
     try:
         client = _get_openai_client()
-        resp = await client.post(
-            "https://api.openai.com/v1/chat/completions",
-            headers={
-                "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
-                "Content-Type": "application/json",
-            },
-            json={
-                "model": "gpt-4o-mini",
-                "messages": [{"role": "user", "content": prompt}],
-                "max_tokens": 500,
-                "response_format": {"type": "json_object"},
-            },
-        )
-        resp.raise_for_status()
-        data = resp.json()
+        async with openai_slot("analysis", body) as lease:
+            resp = await client.post(
+                f"{settings.OPENAI_BASE_URL}/chat/completions",
+                headers={
+                    "Authorization": f"Bearer {settings.OPENAI_API_KEY}",
+                    "Content-Type": "application/json",
+                },
+                json=body,
+            )
+            if resp.status_code == 429:
+                lease.mark_rate_limited()
+            resp.raise_for_status()
+            data = resp.json()
+            lease.record_usage(data.get("usage"))
         result = json.loads(data["choices"][0]["message"]["content"])
 
         if result.get("valuation") or result.get("recommendation"):
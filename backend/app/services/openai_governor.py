@@ -0,0 +1,291 @@
+"""
+Cluster-wide governor for OpenAI calls (all API + Celery worker processes).
+
+Every thread of every cpu_queue worker used to call OpenAI on its own, so on
+results days 12+ concurrent vision requests tripped provider rate limits and
+failed into _mark_extraction_failed. Each call now holds a lease from this
+governor, which is kept entirely in Redis:
+
+  - Concurrency: at most OPENAI_MAX_CONCURRENCY leases cluster-wide
+    (ZSET of holders scored by lease expiry, so a crashed worker's slot
+    frees itself after _LEASE_MS).
+  - Tokens per minute: a token bucket of OPENAI_TPM_LIMIT refilling
+    continuously. A call reserves prompt estimate + max_tokens (which is how
+    the provider counts a request against TPM) and is refunded the unused
+    part once the real usage is known. A 429 drains the bucket, so every
+    worker backs off together.
+  - Priority: waiters queue in a ZSET scored by (priority, arrival), and only
+    the head may take a lease. Quarterly results go before announcements,
+    concalls and ad-hoc analysis. Waiters heartbeat on every poll, and dead
+    waiters are dropped.
+  - Metrics: per-kind grant count, total and max queue wait in a Redis hash,
+    exposed via governor_snapshot() (GET /api/jobs/ai_governor).
+
+The acquire step is a single Lua script, so concurrent pollers never
+over-grant. All timestamps (arrival, heartbeats, lease expiry, bucket
+refill) come from the Redis server clock (TIME), so clock skew between
+worker hosts cannot evict live waiters or distort the bucket. If Redis is
+unreachable the governor fails open and the call proceeds ungated; a
+warning is logged.
+"""
+
+import asyncio
+import logging
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from ..cache import get_redis
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+# Lower number = served first
+PRIORITY_QUARTERLY = 0
+PRIORITY_ANNOUNCEMENT = 1
+PRIORITY_CONCALL = 2
+PRIORITY_ANALYSIS = 3
+
+KIND_PRIORITY = {
+    "quarterly": PRIORITY_QUARTERLY,
+    "announcement": PRIORITY_ANNOUNCEMENT,
+    "concall": PRIORITY_CONCALL,
+    "analysis": PRIORITY_ANALYSIS,
+}
+
+_QUEUE_KEY = "ai_gov:queue"
+_HEARTBEAT_KEY = "ai_gov:heartbeat"
+_HOLDERS_KEY = "ai_gov:holders"
+_BUCKET_KEY = "ai_gov:tpm"
+_STATS_KEY = "ai_gov:stats"
+
+_LEASE_MS = 240_000          # > OpenAI client timeout (180s)
+_STALE_WAITER_MS = 15_000
+_POLL_S = 0.2
+_IMAGE_TOKEN_ESTIMATE = 2_500  # gpt-4.1-mini ceiling per image (1536 patches x 1.62)
+
+# KEYS: queue, heartbeat, holders, bucket
+# ARGV: member, queue_score (0 on the first poll), priority, max_concurrency, tokens_needed,
+#       capacity, refill_per_ms, stale_ms, lease_ms
+# Returns {granted(1)/slot-wait(0)/token-wait(-1), detail, queue_score}
+_ACQUIRE_LUA = """
+local queue, hb, holders, bucket = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local member = ARGV[1]
+local score = tonumber(ARGV[2])
+local priority = tonumber(ARGV[3])
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local limit = tonumber(ARGV[4])
+local need = tonumber(ARGV[5])
+local cap = tonumber(ARGV[6])
+local rate = tonumber(ARGV[7])
+local stale = tonumber(ARGV[8])
+local lease = tonumber(ARGV[9])
+if score == 0 then score = priority * 10000000000000 + now end
+
+redis.call('ZREMRANGEBYSCORE', holders, '-inf', now)
+local dead = redis.call('ZRANGEBYSCORE', hb, '-inf', now - stale)
+for _, m in ipairs(dead) do
+  redis.call('ZREM', queue, m)
+  redis.call('ZREM', hb, m)
+end
+redis.call('ZADD', hb, now, member)
+-- Re-enter at the original position if we were dropped as stale (e.g. a long token wait)
+redis.call('ZADD', queue, 'NX', score, member)
+
+local head = redis.call('ZRANGE', queue, 0, 0)[1]
+if head ~= member then return {0, redis.call('ZCARD', queue), score} end
+if redis.call('ZCARD', holders) >= limit then return {0, 0, score} end
+
+local b = redis.call('HMGET', bucket, 'tokens', 'ts')
+local tokens = tonumber(b[1]) or cap
+local ts = tonumber(b[2]) or now
+tokens = math.min(cap, tokens + math.max(0, now - ts) * rate)
+if need > cap then need = cap end
+if tokens < need then
+  redis.call('HSET', bucket, 'tokens', tokens, 'ts', now)
+  return {-1, math.ceil((need - tokens) / rate), score}
+end
+redis.call('HSET', bucket, 'tokens', tokens - need, 'ts', now)
+redis.call('ZADD', holders, now + lease, member)
+redis.call('ZREM', queue, member)
+redis.call('ZREM', hb, member)
+return {1, 0, score}
+"""
+
+_acquire_scripts: Dict[int, Any] = {}
+
+
+def _acquire_script(r):
+    # register_script objects are bound to a client; clients are per event loop (see cache.get_redis)
+    script = _acquire_scripts.get(id(r))
+    if script is None:
+        script = r.register_script(_ACQUIRE_LUA)
+        _acquire_scripts[id(r)] = script
+    return script
+
+
+def estimate_request_tokens(body: Dict[str, Any]) -> int:
+    """Provider-style TPM charge for a chat request: prompt estimate (~4 chars/token) + max_tokens."""
+    chars, images = 0, 0
+    for msg in body.get("messages", []):
+        content = msg.get("content")
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content or []:
+            if part.get("type") == "image_url":
+                images += 1
+            else:
+                chars += len(part.get("text", ""))
+    return chars // 4 + images * _IMAGE_TOKEN_ESTIMATE + int(body.get("max_tokens") or 0)
+
+
+class OpenAILease:
+    """Handle for one governed call; record_usage() refunds the unused part of the reservation."""
+
+    def __init__(self, member: Optional[str], reserved: int):
+        self.member = member
+        self.reserved = reserved
+        self.used: Optional[int] = None
+        self.rate_limited = False
+
+    def record_usage(self, usage: Optional[Dict[str, Any]]):
+        if usage and usage.get("total_tokens") is not None:
+            self.used = int(usage["total_tokens"])
+
+    def mark_rate_limited(self):
+        self.rate_limited = True
+
+
+async def _record_wait(kind: str, wait_ms: int):
+    r = get_redis()
+    await r.hincrby(_STATS_KEY, f"{kind}:granted", 1)
+    await r.hincrby(_STATS_KEY, f"{kind}:wait_ms_total", wait_ms)
+    current_max = await r.hget(_STATS_KEY, f"{kind}:wait_ms_max")
+    if current_max is None or wait_ms > int(current_max):
+        await r.hset(_STATS_KEY, f"{kind}:wait_ms_max", wait_ms)
+
+
+async def _server_ms(r) -> int:
+    sec, usec = await r.time()
+    return int(sec) * 1000 + int(usec) // 1000
+
+
+async def _acquire(kind: str, need: int) -> Optional[str]:
+    settings = get_settings()
+    r = get_redis()
+    script = _acquire_script(r)
+    member = f"{kind}:{uuid.uuid4().hex}"
+    priority = KIND_PRIORITY.get(kind, PRIORITY_ANALYSIS)
+    start_ms = int(time.time() * 1000)  # local, only for the wait metric
+    queue_score = 0  # assigned by the script from server time on the first poll
+    capacity = settings.OPENAI_TPM_LIMIT
+    try:
+        while True:
+            granted, detail, queue_score = await script(
+                keys=[_QUEUE_KEY, _HEARTBEAT_KEY, _HOLDERS_KEY, _BUCKET_KEY],
+                args=[member, queue_score, priority, settings.OPENAI_MAX_CONCURRENCY, need, capacity,
+                      capacity / 60_000.0, _STALE_WAITER_MS, _LEASE_MS],
+            )
+            if int(granted) == 1:
+                break
+            # Token wait: sleep until the deficit should have refilled (bounded so the heartbeat stays fresh)
+            delay = min(int(detail) / 1000.0, 5.0) if int(granted) == -1 else _POLL_S
+            await asyncio.sleep(max(delay, _POLL_S))
+    except BaseException:
+        try:
+            await r.zrem(_QUEUE_KEY, member)
+            await r.zrem(_HEARTBEAT_KEY, member)
+        except Exception:
+            pass
+        raise
+    wait_ms = int(time.time() * 1000) - start_ms
+    if wait_ms > 1000:
+        logger.info(f"OpenAI governor: {kind} waited {wait_ms / 1000:.1f}s for a slot ({need} tokens reserved)")
+    try:
+        await _record_wait(kind, wait_ms)
+    except Exception:
+        pass
+    return member
+
+
+async def _release(lease: OpenAILease):
+    r = get_redis()
+    await r.zrem(_HOLDERS_KEY, lease.member)
+    if lease.rate_limited:
+        # Provider says we're over: drain the shared bucket so every worker backs off
+        await r.hset(_BUCKET_KEY, mapping={"tokens": 0, "ts": await _server_ms(r)})
+    elif lease.used is not None and lease.used < lease.reserved:
+        await r.hincrbyfloat(_BUCKET_KEY, "tokens", lease.reserved - lease.used)
+
+
+@asynccontextmanager
+async def openai_slot(kind: str, body: Dict[str, Any]):
+    """
+    `async with openai_slot("quarterly", body) as lease:` — wait for a
+    cluster-wide concurrency slot and TPM budget for this request body.
+    """
+    settings = get_settings()
+    need = estimate_request_tokens(body)
+    member = None
+    if settings.OPENAI_GOVERNOR:
+        try:
+            member = await _acquire(kind, need)
+        except (asyncio.CancelledError, KeyboardInterrupt):
+            raise
+        except Exception as e:
+            logger.warning(f"OpenAI governor unavailable ({e}) — calling ungated")
+    lease = OpenAILease(member, need)
+    try:
+        yield lease
+    finally:
+        if member is not None:
+            try:
+                await _release(lease)
+            except Exception as e:
+                logger.warning(f"OpenAI governor release failed ({e}); lease expires in {_LEASE_MS // 1000}s")
+
+
+async def governor_snapshot() -> Dict[str, Any]:
+    """Current holders / queue per kind / TPM bucket, plus cumulative queue-wait metrics."""
+    settings = get_settings()
+    r = get_redis()
+    now_ms = await _server_ms(r)
+    holders = await r.zrangebyscore(_HOLDERS_KEY, now_ms, "+inf")
+    queue = await r.zrange(_QUEUE_KEY, 0, -1)
+    bucket = await r.hgetall(_BUCKET_KEY)
+    raw_stats = await r.hgetall(_STATS_KEY)
+
+    capacity = settings.OPENAI_TPM_LIMIT
+    tokens = float(bucket.get("tokens", capacity))
+    ts = int(bucket.get("ts", now_ms))
+    tokens = min(capacity, tokens + max(0, now_ms - ts) * capacity / 60_000.0)
+
+    waits: Dict[str, Dict[str, Any]] = {}
+    for field, value in raw_stats.items():
+        kind, metric = field.split(":", 1)
+        waits.setdefault(kind, {})[metric] = int(float(value))
+    for kind, m in waits.items():
+        granted = m.get("granted", 0)
+        m["avg_wait_ms"] = round(m.get("wait_ms_total", 0) / granted) if granted else 0
+
+    def _by_kind(members):
+        out: Dict[str, int] = {}
+        for m in members:
+            kind = m.split(":", 1)[0]
+            out[kind] = out.get(kind, 0) + 1
+        return out
+
+    return {
+        "enabled": settings.OPENAI_GOVERNOR,
+        "max_concurrency": settings.OPENAI_MAX_CONCURRENCY,
+        "in_flight": len(holders),
+        "in_flight_by_kind": _by_kind(holders),
+        "queued": len(queue),
+        "queued_by_kind": _by_kind(queue),
+        "tpm_limit": capacity,
+        "tpm_available": round(tokens),
+        "waits": waits,
+    }
@@ -8,6 +8,7 @@ Falls back to stocks table JOIN only if stored values are NULL.
 """
 
 import logging
+import time
 from datetime import datetime, timezone
 from typing import List, Dict, Any, Optional
 
@@ -74,103 +75,190 @@ async def get_order_stocks_df() -> Optional[pd.DataFrame]:
         return None
 
 
-async def save_order_stock_prices(df: pd.DataFrame) -> bool:
+async def get_stale_order_symbols(cutoff: datetime) -> set:
+    """
+    Active symbols whose open price is missing/non-positive or whose prices
+    were last written before `cutoff` (or never, or GAP changed since) — the
+    rows an incremental quote refresh has to re-fetch. Uses prices_updated_at,
+    not updated_at, which imports and the master-scrip sync also bump.
+    """
+    async with get_db_session() as db:
+        result = await db.execute(text("""
+            SELECT symbol FROM order_stocks
+            WHERE is_active = true
+              AND (open_price IS NULL OR open_price <= 0
+                   OR prices_updated_at IS NULL OR prices_updated_at < :cutoff)
+        """), {"cutoff": cutoff})
+        return {r[0] for r in result.fetchall()}
+
+
+async def save_order_stock_prices(df: pd.DataFrame) -> Dict[str, Any]:
     """
     Write OPEN PRICE, BUY ORDER, SELL ORDER back to order_stocks table.
     Replaces write_quote_ohlc_to_gsheet for Postgres mode.
+
+    One set-based UPDATE ... FROM unnest(arrays) instead of one UPDATE per row,
+    so ~1,850 prices land in a single round trip.
+    Returns {"success", "rows_written", "elapsed_ms"}.
     """
+    start = time.perf_counter()
     try:
-        now = datetime.now(timezone.utc)
-        updates = []
-        for _, row in df.iterrows():
-            symbol = row.get("OK")
-            open_price = row.get("OPEN PRICE")
-            buy_order = row.get("BUY ORDER")
-            sell_order = row.get("SELL ORDER")
-            if symbol and pd.notna(open_price):
-                updates.append({
-                    "sym": str(symbol),
-                    "op": float(open_price) if pd.notna(open_price) else None,
-                    "bo": float(buy_order) if pd.notna(buy_order) else None,
-                    "so": float(sell_order) if pd.notna(sell_order) else None,
-                    "ts": now,
-                })
-
-        if not updates:
+        symbols = df["OK"].astype("string").str.strip()
+        open_price = pd.to_numeric(df["OPEN PRICE"], errors="coerce")
+        mask = symbols.notna() & (symbols != "") & open_price.notna()
+        if not mask.any():
             logger.warning("No prices to save")
-            return False
+            return {"success": False, "rows_written": 0, "elapsed_ms": 0.0}
+
+        def _floats(col: str) -> List[Optional[float]]:
+            values = pd.to_numeric(df.loc[mask, col], errors="coerce").astype(object)
+            return values.where(values.notna(), None).tolist()
+
+        params = {
+            "syms": symbols[mask].tolist(),
+            "ops": _floats("OPEN PRICE"),
+            "bos": _floats("BUY ORDER"),
+            "sos": _floats("SELL ORDER"),
+            "ts": datetime.now(timezone.utc),
+        }
 
         async with get_db_session() as db:
-            for u in updates:
-                await db.execute(text("""
-                    UPDATE order_stocks
-                    SET open_price = :op, buy_order = :bo, sell_order = :so, updated_at = :ts
-                    WHERE symbol = :sym
-                """), u)
-
-        logger.info(f"Saved prices for {len(updates)} order stocks to Postgres")
-        return True
+            result = await db.execute(text("""
+                UPDATE order_stocks AS os
+                SET open_price = v.op, buy_order = v.bo, sell_order = v.so,
+                    prices_updated_at = :ts, updated_at = :ts
+                FROM unnest(
+                    CAST(:syms AS text[]), CAST(:ops AS float8[]),
+                    CAST(:bos AS float8[]), CAST(:sos AS float8[])
+                ) AS v(sym, op, bo, so)
+                WHERE os.symbol = v.sym
+            """), params)
+            rows_written = result.rowcount
+
+        elapsed_ms = round((time.perf_counter() - start) * 1000, 1)
+        logger.info(
+            f"Saved prices for {rows_written}/{len(params['syms'])} order stocks to Postgres in {elapsed_ms}ms"
+        )
+        return {"success": True, "rows_written": rows_written, "elapsed_ms": elapsed_ms}
     except Exception as e:
         logger.exception(f"Error saving order stock prices: {e}")
-        return False
+        return {
+            "success": False,
+            "rows_written": 0,
+            "elapsed_ms": round((time.perf_counter() - start) * 1000, 1),
+        }
+
+
+_UPSERT_ORDER_STOCKS_SQL = text("""
+    INSERT INTO order_stocks (symbol, gap, market, quantity, stock_name, exchange_token)
+    SELECT * FROM unnest(
+        CAST(:syms AS text[]), CAST(:gaps AS numeric[]), CAST(:mkts AS text[]),
+        CAST(:qtys AS int[]), CAST(:sns AS text[]), CAST(:ets AS int[])
+    )
+    ON CONFLICT (symbol) DO UPDATE SET
+        -- New GAP: BUY/SELL levels are out of date, so the next incremental refresh re-prices the row
+        prices_updated_at = CASE WHEN order_stocks.gap IS DISTINCT FROM EXCLUDED.gap
+                                 THEN NULL ELSE order_stocks.prices_updated_at END,
+        gap = EXCLUDED.gap,
+        market = EXCLUDED.market,
+        quantity = EXCLUDED.quantity,
+        stock_name = COALESCE(EXCLUDED.stock_name, order_stocks.stock_name),
+        exchange_token = COALESCE(EXCLUDED.exchange_token, order_stocks.exchange_token),
+        is_active = true,
+        updated_at = now()
+    RETURNING symbol, (xmax = 0) AS is_insert
+""")
+
+
+def _normalize_import_row(r: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Coerce one import row to order_stocks column values.
+    Returns None for rows without a symbol; raises ValueError/TypeError on bad numbers.
+    """
+    symbol = str(r.get("symbol", r.get("OK", ""))).strip().upper()
+    if not symbol:
+        return None
+
+    gap = float(r.get("gap", r.get("GAP", 3)))
+    market = str(r.get("market", r.get("MARKET", "nse_cm")))
+    quantity = int(float(r.get("quantity", r.get("QUANTITY", 1))))
+    stock_name = r.get("stock_name", r.get("STOCK_NAME"))
+    exchange_token = r.get("exchange_token", r.get("EXCHANGE_TOKEN"))
+
+    if stock_name and str(stock_name).strip():
+        stock_name = str(stock_name).strip()
+    else:
+        stock_name = None
+    if exchange_token is not None and not pd.isna(exchange_token):
+        try:
+            exchange_token = int(float(exchange_token))
+        except (ValueError, TypeError):
+            exchange_token = None
+    else:
+        exchange_token = None
+
+    return {"sym": symbol, "gap": gap, "mkt": market, "qty": quantity, "sn": stock_name, "et": exchange_token}
+
+
+def _upsert_params(batch: List[Dict[str, Any]]) -> Dict[str, List[Any]]:
+    return {
+        "syms": [b["sym"] for b in batch],
+        "gaps": [b["gap"] for b in batch],
+        "mkts": [b["mkt"] for b in batch],
+        "qtys": [b["qty"] for b in batch],
+        "sns": [b["sn"] for b in batch],
+        "ets": [b["et"] for b in batch],
+    }
 
 
 async def bulk_import_stocks(rows: List[Dict[str, Any]]) -> Dict[str, Any]:
     """
     Upsert rows into order_stocks table.
     Each row must have at least 'symbol'. Optional: gap, market, quantity, stock_name, exchange_token.
+
+    Rows are validated in Python (bad values are reported per symbol), then
+    written with one INSERT ... SELECT FROM unnest(...) ON CONFLICT statement.
+    If Postgres rejects the batch, rows are retried one by one inside
+    savepoints so the offending symbols are reported and the rest still land.
     """
     inserted = 0
     updated = 0
     errors = []
 
-    try:
-        async with get_db_session() as db:
-            for r in rows:
-                symbol = str(r.get("symbol", r.get("OK", ""))).strip().upper()
-                if not symbol:
-                    continue
-
-                gap = float(r.get("gap", r.get("GAP", 3)))
-                market = str(r.get("market", r.get("MARKET", "nse_cm")))
-                quantity = int(float(r.get("quantity", r.get("QUANTITY", 1))))
-                stock_name = r.get("stock_name", r.get("STOCK_NAME"))
-                exchange_token = r.get("exchange_token", r.get("EXCHANGE_TOKEN"))
-
-                if stock_name and str(stock_name).strip():
-                    stock_name = str(stock_name).strip()
-                else:
-                    stock_name = None
-                if exchange_token is not None and not pd.isna(exchange_token):
-                    try:
-                        exchange_token = int(float(exchange_token))
-                    except (ValueError, TypeError):
-                        exchange_token = None
-                else:
-                    exchange_token = None
+    # Last occurrence wins — ON CONFLICT cannot touch the same row twice in one statement
+    by_symbol: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        try:
+            norm = _normalize_import_row(r)
+        except (ValueError, TypeError) as row_err:
+            sym = str(r.get("symbol", r.get("OK", ""))).strip().upper()
+            errors.append(f"{sym}: {str(row_err)}")
+            continue
+        if norm:
+            by_symbol[norm["sym"]] = norm
+    batch = list(by_symbol.values())
 
+    try:
+        if batch:
+            async with get_db_session() as db:
                 try:
-                    result = await db.execute(text("""
-                        INSERT INTO order_stocks (symbol, gap, market, quantity, stock_name, exchange_token)
-                        VALUES (:sym, :gap, :mkt, :qty, :sn, :et)
-                        ON CONFLICT (symbol) DO UPDATE SET
-                            gap = EXCLUDED.gap,
-                            market = EXCLUDED.market,
-                            quantity = EXCLUDED.quantity,
-                            stock_name = COALESCE(EXCLUDED.stock_name, order_stocks.stock_name),
-                            exchange_token = COALESCE(EXCLUDED.exchange_token, order_stocks.exchange_token),
-                            is_active = true,
-                            updated_at = now()
-                        RETURNING (xmax = 0) AS is_insert
-                    """), {"sym": symbol, "gap": gap, "mkt": market, "qty": quantity, "sn": stock_name, "et": exchange_token})
-                    is_insert = result.scalar()
-                    if is_insert:
-                        inserted += 1
-                    else:
-                        updated += 1
-                except Exception as row_err:
-                    errors.append(f"{symbol}: {str(row_err)}")
+                    async with db.begin_nested():
+                        result = await db.execute(_UPSERT_ORDER_STOCKS_SQL, _upsert_params(batch))
+                        flags = [row.is_insert for row in result]
+                except Exception as batch_err:
+                    logger.warning(f"Batch upsert rejected ({batch_err}), retrying {len(batch)} rows individually")
+                    flags = []
+                    for b in batch:
+                        try:
+                            async with db.begin_nested():
+                                result = await db.execute(_UPSERT_ORDER_STOCKS_SQL, _upsert_params([b]))
+                                flags.append(result.one().is_insert)
+                        except Exception as row_err:
+                            errors.append(f"{b['sym']}: {str(row_err)}")
+                inserted = sum(1 for f in flags if f)
+                updated = len(flags) - inserted
 
+        logger.info(f"Bulk import: {inserted} inserted, {updated} updated, {len(errors)} errors")
         return {
             "success": True,
             "inserted": inserted,
@@ -0,0 +1,215 @@
+"""
+Token-budgeted page images for the OpenAI vision calls.
+
+The legacy path rendered every selected page as a full-colour PNG at zoom 2.0.
+For gpt-4.1-mini an image costs ceil(w/32) * ceil(h/32) patches (capped at
+1536, larger images are downscaled server-side) * 1.62 tokens, so pixels
+beyond that cap are uploaded and then thrown away. encode_pages() instead:
+
+  - crops each page to its content bounding box (tables plus their titles /
+    unit lines — margins, blank letterhead space and footers are dropped),
+  - renders grayscale (results tables carry no colour information),
+  - picks the zoom from a per-request token budget split across the pages,
+    never above the requested max zoom nor below a legibility floor,
+  - encodes PNG / JPEG (/ WebP when Pillow is installed) and keeps the
+    smallest, stepping quality then zoom down until the page fits its share
+    of the byte budget.
+
+Budgets come from settings (VISION_MAX_IMAGE_TOKENS / VISION_MAX_IMAGE_BYTES /
+VISION_IMAGE_FORMAT / VISION_IMAGE_GRAYSCALE). With VISION_IMAGE_COMPARE on,
+the legacy PNG is also rendered so the logged bytes saved are measured rather
+than estimated (costs one extra render per page — diagnostics only).
+
+Functions here run inside render-pool children (pdf_render_pool.py), so they
+return plain (images, stats) and leave logging to the caller.
+"""
+
+import base64
+import io
+import logging
+import math
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+import fitz
+
+from ..config import get_settings
+from .pdf_document import PdfDocument, open_pdf
+
+try:  # optional: only needed for VISION_IMAGE_FORMAT=webp / auto-with-webp
+    from PIL import Image
+except ImportError:
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+# gpt-4.1-mini image accounting (32px patches, 1536 patch cap, 1.62 tokens/patch)
+_PATCH_PX = 32
+_MAX_PATCHES = 1536
+_TOKENS_PER_PATCH = 1.62
+
+_LEGACY_ZOOM = 2.0
+_MIN_ZOOM = 1.25          # ~90 DPI: 7pt table digits stay ~9px tall
+_CROP_PAD_PT = 12
+_JPEG_QUALITIES = (85, 75, 65)
+_ZOOM_STEP = 0.85
+
+
+def estimate_image_tokens(width: int, height: int) -> int:
+    """Prompt tokens gpt-4.1-mini charges for a width x height image."""
+    patches = math.ceil(width / _PATCH_PX) * math.ceil(height / _PATCH_PX)
+    if patches > _MAX_PATCHES:
+        scale = math.sqrt(_PATCH_PX * _PATCH_PX * _MAX_PATCHES / (width * height))
+        patches = min(_MAX_PATCHES, math.ceil(width * scale / _PATCH_PX) * math.ceil(height * scale / _PATCH_PX))
+    return math.ceil(patches * _TOKENS_PER_PATCH)
+
+
+def image_mime(data: bytes) -> str:
+    """MIME type of an encoded page image (sniffed from its magic bytes)."""
+    if data[:3] == b"\xff\xd8\xff":
+        return "image/jpeg"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return "image/png"
+
+
+def image_data_url(data: bytes) -> str:
+    """data: URL for an image_url content part."""
+    return f"data:{image_mime(data)};base64,{base64.b64encode(data).decode()}"
+
+
+def _content_clip(page: fitz.Page) -> fitz.Rect:
+    """Bounding box of everything drawn on the page (minus full-page backgrounds), padded."""
+    page_rect = page.rect
+    page_area = page_rect.width * page_rect.height
+    box = fitz.Rect()
+    try:
+        for _kind, bbox in page.get_bboxlog():
+            r = fitz.Rect(bbox) & page_rect
+            if r.is_empty or r.width * r.height >= 0.9 * page_area:
+                continue  # white page fill / full-page scan: not a crop hint
+            box |= r
+    except Exception:
+        return page_rect
+    if box.is_empty:
+        return page_rect
+    box = fitz.Rect(box.x0 - _CROP_PAD_PT, box.y0 - _CROP_PAD_PT, box.x1 + _CROP_PAD_PT, box.y1 + _CROP_PAD_PT)
+    return box & page_rect
+
+
+def _zoom_for_tokens(clip: fitz.Rect, token_budget: float, max_zoom: float) -> float:
+    """Largest zoom <= max_zoom whose image fits token_budget (and the server-side patch cap)."""
+    patches = min(_MAX_PATCHES, token_budget / _TOKENS_PER_PATCH)
+    zoom = min(max_zoom, math.sqrt(patches * _PATCH_PX * _PATCH_PX / max(clip.width * clip.height, 1.0)))
+    while zoom > _MIN_ZOOM and estimate_image_tokens(int(clip.width * zoom), int(clip.height * zoom)) > token_budget:
+        zoom *= 0.97
+    return max(zoom, min(_MIN_ZOOM, max_zoom))
+
+
+def _encode_pixmap(pix: fitz.Pixmap, fmt: str, quality: int) -> List[bytes]:
+    """Candidate encodings of pix for the configured format."""
+    out = []
+    if fmt in ("png", "auto"):
+        out.append(pix.tobytes("png"))
+    if fmt in ("jpeg", "auto"):
+        out.append(pix.tobytes("jpeg", jpg_quality=quality))
+    if fmt in ("webp", "auto") and Image is not None:
+        mode = "L" if pix.n == 1 else "RGB"
+        buf = io.BytesIO()
+        Image.frombytes(mode, (pix.width, pix.height), pix.samples).save(buf, "WEBP", quality=quality)
+        out.append(buf.getvalue())
+    if not out:  # webp requested without Pillow
+        out.append(pix.tobytes("png"))
+    return out
+
+
+def _encode_page(
+    page: fitz.Page,
+    token_budget: float,
+    byte_budget: float,
+    max_zoom: float,
+    fmt: str,
+    grayscale: bool,
+) -> Tuple[bytes, Dict[str, Any]]:
+    clip = _content_clip(page)
+    zoom = _zoom_for_tokens(clip, token_budget, max_zoom)
+    colorspace = fitz.csGRAY if grayscale else fitz.csRGB
+    while True:
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), clip=clip, colorspace=colorspace, alpha=False)
+        best = None
+        for quality in _JPEG_QUALITIES:
+            candidates = _encode_pixmap(pix, fmt, quality)
+            best = min(candidates if best is None else candidates + [best], key=len)
+            if len(best) <= byte_budget or fmt == "png":
+                break
+        if len(best) <= byte_budget or zoom <= _MIN_ZOOM:
+            break
+        zoom = max(_MIN_ZOOM, zoom * _ZOOM_STEP)
+    return best, {
+        "width": pix.width,
+        "height": pix.height,
+        "zoom": round(zoom, 3),
+        "bytes": len(best),
+        "tokens": estimate_image_tokens(pix.width, pix.height),
+        "mime": image_mime(best),
+        "cropped": clip != page.rect,
+    }
+
+
+def encode_pages(
+    pdf: Union[bytes, str, PdfDocument],
+    page_indices: Iterable[int],
+    max_zoom: float = _LEGACY_ZOOM,
+    compare: Optional[bool] = None,
+) -> Tuple[List[bytes], Dict[str, Any]]:
+    """
+    Encode the given pages (0-based) within the request budgets.
+    Returns (images, stats); stats carries per-request totals plus, in compare
+    mode, the measured size of the legacy colour PNGs.
+    """
+    settings = get_settings()
+    fmt = settings.VISION_IMAGE_FORMAT.lower()
+    compare = settings.VISION_IMAGE_COMPARE if compare is None else compare
+    images: List[bytes] = []
+    pages: List[Dict[str, Any]] = []
+    stats: Dict[str, Any] = {"pages": pages, "bytes": 0, "tokens": 0, "legacy_tokens": 0}
+
+    with open_pdf(pdf) as doc:
+        indices = [i for i in page_indices if 0 <= i < doc.page_count]
+        if not indices:
+            return images, stats
+        token_share = settings.VISION_MAX_IMAGE_TOKENS / len(indices)
+        byte_share = settings.VISION_MAX_IMAGE_BYTES / len(indices)
+        legacy_bytes = 0
+        for idx in indices:
+            try:
+                page = doc.load_page(idx)
+                data, info = _encode_page(page, token_share, byte_share, max_zoom, fmt, settings.VISION_IMAGE_GRAYSCALE)
+            except Exception as e:
+                logger.warning(f"Page {idx} encode failed: {e}")
+                continue
+            images.append(data)
+            info["page"] = idx
+            pages.append(info)
+            stats["bytes"] += info["bytes"]
+            stats["tokens"] += info["tokens"]
+            stats["legacy_tokens"] += estimate_image_tokens(int(page.rect.width * max_zoom), int(page.rect.height * max_zoom))
+            if compare:
+                legacy_bytes += sum(len(b) for b in doc.render_png([idx], zoom=max_zoom))
+        if compare:
+            stats["legacy_bytes"] = legacy_bytes
+    return images, stats
+
+
+def log_encode_stats(label: str, stats: Dict[str, Any]):
+    """One info line per request: size, estimated tokens and savings vs the legacy colour PNG path."""
+    if not stats.get("pages"):
+        return
+    msg = (
+        f"Vision images for {label}: {len(stats['pages'])} pages, {stats['bytes'] / 1024:.0f} KB, "
+        f"~{stats['tokens']} tokens (legacy ~{stats['legacy_tokens']}, "
+        f"saved ~{stats['legacy_tokens'] - stats['tokens']})"
+    )
+    if "legacy_bytes" in stats:
+        saved = stats["legacy_bytes"] - stats["bytes"]
+        msg += f"; bytes saved {saved / 1024:.0f} KB ({saved / max(stats['legacy_bytes'], 1):.0%}) vs legacy PNG"
+    logger.info(msg)
@@ -0,0 +1,200 @@
+"""
+Content-addressed disk cache for filing PDFs (NSE/BSE attachments).
+
+Layout under PDF_CACHE_DIR (shared volume across api + Celery workers):
+    blobs/<sha256>.pdf      PDF bytes, keyed by content hash
+    urls/<sha256(url)>.json {url, sha256, etag, last_modified, fetched_date, size}
+
+A URL seen earlier the same IST day is served straight from disk. On a later
+day it is revalidated with If-None-Match / If-Modified-Since (304 → reuse
+blob). The same PDF published under two URLs (NSE + BSE mirrors) is stored
+once. Blob mtime is bumped on every hit, and the oldest blobs are evicted
+once the total exceeds PDF_CACHE_MAX_MB.
+
+All writes are tmp-file + os.replace, so concurrent workers never read a
+partial file; the worst case of a race is one redundant download.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import httpx
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_IST = timezone(timedelta(hours=5, minutes=30))
+
+
+def _cache_root() -> Path:
+    return Path(get_settings().PDF_CACHE_DIR)
+
+
+def _blob_path(digest: str) -> Path:
+    return _cache_root() / "blobs" / f"{digest}.pdf"
+
+
+def _meta_path(url: str) -> Path:
+    return _cache_root() / "urls" / f"{hashlib.sha256(url.encode()).hexdigest()}.json"
+
+
+def _today_ist() -> str:
+    return datetime.now(_IST).date().isoformat()
+
+
+def _atomic_write(path: Path, data: bytes):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=path.parent, prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+    except BaseException:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+        raise
+
+
+def _load_meta(url: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(_meta_path(url), "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _save_meta(url: str, meta: Dict[str, Any]):
+    _atomic_write(_meta_path(url), json.dumps(meta).encode())
+
+
+def _read_blob(digest: str) -> Optional[bytes]:
+    path = _blob_path(digest)
+    try:
+        data = path.read_bytes()
+        os.utime(path)  # LRU: mtime = last use
+        return data
+    except OSError:
+        return None
+
+
+def _store(url: str, content: bytes, etag: Optional[str], last_modified: Optional[str]) -> str:
+    digest = hashlib.sha256(content).hexdigest()
+    blob = _blob_path(digest)
+    if blob.exists():
+        os.utime(blob)
+    else:
+        _atomic_write(blob, content)
+    _save_meta(url, {
+        "url": url,
+        "sha256": digest,
+        "etag": etag,
+        "last_modified": last_modified,
+        "fetched_date": _today_ist(),
+        "size": len(content),
+    })
+    _evict_if_needed()
+    return digest
+
+
+def _evict_if_needed():
+    """Delete least-recently-used blobs until the cache fits PDF_CACHE_MAX_MB."""
+    limit = get_settings().PDF_CACHE_MAX_MB * 1024 * 1024
+    blobs_dir = _cache_root() / "blobs"
+    entries = []
+    total = 0
+    try:
+        for entry in os.scandir(blobs_dir):
+            if entry.is_file() and entry.name.endswith(".pdf"):
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry.path))
+                total += st.st_size
+    except OSError:
+        return
+    if total <= limit:
+        return
+    entries.sort()
+    freed = 0
+    for _, size, path in entries:
+        if total - freed <= limit * 0.9:  # evict to 90% so we don't rescan on every write
+            break
+        try:
+            os.unlink(path)
+            freed += size
+        except OSError:
+            pass
+    # URL metas pointing at evicted blobs are treated as misses on next lookup
+    logger.info(f"PDF cache evicted {freed / 1e6:.1f} MB (was {total / 1e6:.1f} MB)")
+
+
+async def cached_pdf_digest(pdf_url: str) -> Optional[str]:
+    """sha256 of the cached PDF for pdf_url if it was fetched today (IST) and is still on disk."""
+    meta = await asyncio.to_thread(_load_meta, pdf_url)
+    if not meta or meta.get("fetched_date") != _today_ist() or not meta.get("sha256"):
+        return None
+    if not await asyncio.to_thread(_blob_path(meta["sha256"]).exists):
+        return None
+    return meta["sha256"]
+
+
+async def known_pdf_digest(pdf_url: str) -> Optional[str]:
+    """sha256 of the last bytes fetched for pdf_url, however old (the blob may be evicted)."""
+    meta = await asyncio.to_thread(_load_meta, pdf_url)
+    return meta.get("sha256") if meta else None
+
+
+async def get_cached_pdf(pdf_url: str, headers: Dict[str, str], timeout: float = 60) -> Optional[bytes]:
+    """
+    Return PDF bytes for pdf_url, downloading at most once per IST day.
+    Raises httpx errors on a failed download with nothing cached (caller logs).
+    """
+    meta = await asyncio.to_thread(_load_meta, pdf_url)
+    cached = None
+    if meta and meta.get("sha256"):
+        cached = await asyncio.to_thread(_read_blob, meta["sha256"])
+
+    if cached is not None and meta.get("fetched_date") == _today_ist():
+        logger.debug(f"PDF cache hit: {pdf_url}")
+        return cached
+
+    req_headers = dict(headers)
+    if cached is not None:
+        if meta.get("etag"):
+            req_headers["If-None-Match"] = meta["etag"]
+        if meta.get("last_modified"):
+            req_headers["If-Modified-Since"] = meta["last_modified"]
+
+    try:
+        async with httpx.AsyncClient(timeout=timeout, follow_redirects=True) as client:
+            resp = await client.get(pdf_url, headers=req_headers)
+            if resp.status_code == 304 and cached is not None:
+                meta["fetched_date"] = _today_ist()
+                await asyncio.to_thread(_save_meta, pdf_url, meta)
+                logger.info(f"PDF not modified, reusing cache: {pdf_url}")
+                return cached
+            resp.raise_for_status()
+            content = resp.content
+            etag = resp.headers.get("etag")
+            last_modified = resp.headers.get("last-modified")
+    except Exception as e:
+        if cached is not None:
+            # Exchange filings are immutable once published — a stale copy beats none
+            logger.warning(f"PDF revalidation failed ({e}), serving cached copy: {pdf_url}")
+            return cached
+        raise
+
+    try:
+        await asyncio.to_thread(_store, pdf_url, content, etag, last_modified)
+    except OSError as e:
+        logger.warning(f"PDF cache write failed ({e}) — continuing uncached")
+    return content
+
@@ -0,0 +1,106 @@
+"""
+Single-open PDF analysis layer shared by the quarterly, concall and
+announcement extractors.
+
+PdfDocument opens the bytes once and lazily caches per-page text, so page
+selection (keyword hits), text-layer detection, full-text extraction and
+rendering of the chosen pages all reuse the same fitz.Document and the same
+get_text() results instead of re-opening and re-walking the PDF per step.
+
+Not thread-safe: create, use and close a PdfDocument inside one thread
+(e.g. one asyncio.to_thread call). The helper functions in the extractors
+accept raw bytes, a file path (render-pool workers, see pdf_render_pool.py)
+or a PdfDocument via open_pdf().
+"""
+
+import logging
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import fitz
+
+logger = logging.getLogger(__name__)
+
+
+class PdfDocument:
+    """One open fitz.Document plus per-page text / keyword-hit caches."""
+
+    def __init__(self, source: Union[bytes, str, Path]):
+        # Keep the original bytes/path so work can be shipped to the render pool
+        self.source = source
+        if isinstance(source, (bytes, bytearray, memoryview)):
+            self._doc = fitz.open(stream=source, filetype="pdf")
+        else:
+            self._doc = fitz.open(str(source), filetype="pdf")
+        self.page_count = self._doc.page_count
+        self._text: Dict[int, str] = {}
+        self._hits: Dict[Tuple[int, Tuple[str, ...]], int] = {}
+
+    def close(self):
+        if self._doc is not None:
+            self._doc.close()
+            self._doc = None
+
+    def __enter__(self) -> "PdfDocument":
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def load_page(self, idx: int) -> fitz.Page:
+        return self._doc.load_page(idx)
+
+    def page_text(self, idx: int) -> str:
+        """get_text("text") for page idx, cached; "" if the page cannot be read."""
+        if idx not in self._text:
+            try:
+                self._text[idx] = self._doc.load_page(idx).get_text("text")
+            except Exception as e:
+                logger.warning(f"Page {idx} text extraction failed: {e}")
+                self._text[idx] = ""
+        return self._text[idx]
+
+    def has_text(self, idx: int, min_chars: int = 1) -> bool:
+        """True if the page's text layer has at least min_chars non-blank characters."""
+        return len(self.page_text(idx).strip()) >= min_chars
+
+    def keyword_hits(self, idx: int, keywords: Iterable[str]) -> int:
+        """Number of distinct keywords present (case-insensitive) on page idx."""
+        key = (idx, tuple(keywords))
+        if key not in self._hits:
+            text_lower = self.page_text(idx).lower()
+            self._hits[key] = sum(1 for kw in key[1] if kw in text_lower)
+        return self._hits[key]
+
+    def full_text(self, max_pages: Optional[int] = None) -> str:
+        """Non-empty page texts joined by blank lines."""
+        n = self.page_count if max_pages is None else min(self.page_count, max_pages)
+        return "\n\n".join(t for t in (self.page_text(i) for i in range(n)) if t.strip())
+
+    def render_png(self, page_indices: Iterable[int], zoom: float = 2.0) -> List[bytes]:
+        """Render only the given page indices (0-based) to PNG bytes."""
+        out: List[bytes] = []
+        mat = fitz.Matrix(zoom, zoom)
+        for idx in page_indices:
+            if idx < 0 or idx >= self.page_count:
+                continue
+            try:
+                pix = self._doc.load_page(idx).get_pixmap(matrix=mat, alpha=False)
+                out.append(pix.tobytes("png"))
+            except Exception as e:
+                logger.warning(f"Page {idx} render failed: {e}")
+        return out
+
+
+@contextmanager
+def open_pdf(source: Union[bytes, str, Path, PdfDocument]) -> Iterator[PdfDocument]:
+    """Yield a PdfDocument for bytes/path (closed on exit) or pass an open one through untouched."""
+    if isinstance(source, PdfDocument):
+        yield source
+        return
+    doc = PdfDocument(source)
+    try:
+        yield doc
+    finally:
+        doc.close()
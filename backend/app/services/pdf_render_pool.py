@@ -0,0 +1,151 @@
+"""
+Process-pool PDF rendering for the cpu_queue worker.
+
+Under `--pool=threads --concurrency=12` (see worker/celery_app.py) every
+extraction thread renders pages in the same process, so PyMuPDF rasterising
+at zoom 2.0 is serialised on the GIL. run_pdf_job() moves that work to a
+ProcessPoolExecutor so rendering scales with cores:
+
+  - Handoff: the PDF bytes are written once to a temp file on /dev/shm
+    (tmpfs — RAM, not disk) and the child opens it by path; fitz reads the
+    file directly, so the bytes are never pickled through the pool pipe.
+  - Bounded queue: at most PDF_RENDER_PROCESSES * 2 jobs are queued or
+    running per process; further callers wait (asyncio.sleep, no thread
+    held) instead of piling PDFs into memory.
+  - Jobs are plain module-level functions taking (pdf_source, *args) where
+    pdf_source is bytes or a path (see pdf_document.open_pdf).
+
+Falls back to asyncio.to_thread when the pool is disabled
+(PDF_RENDER_POOL=false) or cannot start — e.g. inside a daemonic Celery
+--pool=prefork child, which may not fork children of its own. With prefork
+the worker processes already give per-core parallelism.
+"""
+
+import asyncio
+import atexit
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Optional
+
+from ..config import get_settings
+
+logger = logging.getLogger(__name__)
+
+_SHM_DIR = "/dev/shm" if os.path.isdir("/dev/shm") else None
+
+_pool: Optional[ProcessPoolExecutor] = None
+_pool_disabled = False
+_pool_lock = threading.Lock()
+_slots: Optional[threading.BoundedSemaphore] = None
+
+
+def _worker_count() -> int:
+    return get_settings().PDF_RENDER_PROCESSES or os.cpu_count() or 2
+
+
+def _get_pool() -> Optional[ProcessPoolExecutor]:
+    """Create the process pool on first use; None if disabled or unavailable here."""
+    global _pool, _pool_disabled, _slots
+    if _pool is not None or _pool_disabled:
+        return _pool
+    with _pool_lock:
+        if _pool is not None or _pool_disabled:
+            return _pool
+        if not get_settings().PDF_RENDER_POOL:
+            _pool_disabled = True
+            return None
+        if multiprocessing.current_process().daemon:
+            logger.info("PDF render pool unavailable in daemonic worker process — rendering in-thread")
+            _pool_disabled = True
+            return None
+        workers = _worker_count()
+        try:
+            # spawn: never fork a process that is running event loops / worker threads
+            _pool = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        except Exception as e:
+            logger.warning(f"PDF render pool failed to start ({e}) — rendering in-thread")
+            _pool_disabled = True
+            return None
+        _slots = threading.BoundedSemaphore(workers * 2)
+        logger.info(f"PDF render pool started: {workers} processes, queue bound {workers * 2}")
+    return _pool
+
+
+def _reset_pool(broken: ProcessPoolExecutor, reason: str):
+    """Drop `broken` so the next job starts a fresh pool; no-op if it was already replaced."""
+    global _pool
+    with _pool_lock:
+        if _pool is not broken:
+            return
+        _pool = None
+    broken.shutdown(wait=False)
+    logger.warning(f"PDF render pool reset: {reason}")
+
+
+def shutdown_render_pool():
+    """Stop pool processes (registered atexit; safe to call more than once)."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.shutdown(wait=False, cancel_futures=True)
+            _pool = None
+
+
+atexit.register(shutdown_render_pool)
+
+
+async def _acquire_slot(slots: threading.BoundedSemaphore):
+    while not slots.acquire(blocking=False):
+        await asyncio.sleep(0.02)
+
+
+def _write_temp_pdf(pdf_bytes: bytes) -> str:
+    fd, path = tempfile.mkstemp(suffix=".pdf", prefix="render-", dir=_SHM_DIR)
+    with os.fdopen(fd, "wb") as f:
+        f.write(pdf_bytes)
+    return path
+
+
+async def run_pdf_job(fn: Callable[..., Any], pdf_bytes: bytes, *args) -> Any:
+    """
+    Run fn(pdf_source, *args) in the render pool (or a thread as fallback).
+    fn must be a module-level function so it can be sent to a child process.
+    """
+    pool = _get_pool()
+    if pool is None:
+        return await asyncio.to_thread(fn, pdf_bytes, *args)
+
+    slots = _slots
+    await _acquire_slot(slots)
+    path = None
+    try:
+        path = await asyncio.to_thread(_write_temp_pdf, pdf_bytes)
+        start = time.perf_counter()
+        try:
+            future = pool.submit(fn, path, *args)
+        except (BrokenProcessPool, RuntimeError) as e:
+            # Pool already broken or shut down (reset / atexit) before submit — nothing of ours ran
+            _reset_pool(pool, str(e))
+            return await asyncio.to_thread(fn, pdf_bytes, *args)
+        try:
+            result = await asyncio.wrap_future(future)
+        except BrokenProcessPool as e:
+            # A child died: rebuild next time, finish this job in-thread. Errors raised by
+            # fn itself (corrupt PDF, fitz.FileDataError...) propagate unchanged.
+            _reset_pool(pool, str(e))
+            return await asyncio.to_thread(fn, pdf_bytes, *args)
+        logger.debug(f"PDF render job {fn.__name__} took {(time.perf_counter() - start) * 1000:.0f}ms in pool")
+        return result
+    finally:
+        slots.release()
+        if path:
+            try:
+                os.unlink(path)
+            except OSError:
+                pass
@@ -0,0 +1,119 @@
+"""
+Artifacts handed between the stages of the quarterly extraction pipeline
+(worker/tasks/extraction_pipeline.py).
+
+Celery messages carry only a small job dict. Page images, text-layer TSV and
+model results are written here and referenced by key, so a stage retried on
+another worker picks up exactly what the previous stage produced. Layout,
+under PDF_CACHE_DIR (the volume every worker already mounts):
+
+    artifacts/<key>/manifest.json   {"kind": "images"|"json", "count": n, "created_at": ts}
+    artifacts/<key>/<i>.img         page image i (PNG/JPEG/WebP bytes)
+    artifacts/<key>/data.json       JSON payload
+
+Writes go through pdf_cache._atomic_write with the manifest last, so a reader
+never sees a half-written artifact. purge_artifacts() removes old entries; it
+runs from retry_stuck_extractions.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, List, Optional
+
+from ..config import get_settings
+from .pdf_cache import _atomic_write
+
+logger = logging.getLogger(__name__)
+
+_MAX_AGE_S = 2 * 86400
+
+
+def _artifact_dir(key: str) -> Path:
+    return Path(get_settings().PDF_CACHE_DIR) / "artifacts" / key
+
+
+def _manifest(key: str) -> Optional[dict]:
+    try:
+        with open(_artifact_dir(key) / "manifest.json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_manifest(key: str, kind: str, count: int):
+    _atomic_write(_artifact_dir(key) / "manifest.json",
+                  json.dumps({"kind": kind, "count": count, "created_at": time.time()}).encode())
+
+
+def _put_images(key: str, images: List[bytes]):
+    for i, data in enumerate(images):
+        _atomic_write(_artifact_dir(key) / f"{i}.img", data)
+    _write_manifest(key, "images", len(images))
+
+
+def _get_images(key: str) -> Optional[List[bytes]]:
+    manifest = _manifest(key)
+    if not manifest or manifest.get("kind") != "images":
+        return None
+    try:
+        return [(_artifact_dir(key) / f"{i}.img").read_bytes() for i in range(manifest["count"])]
+    except OSError:
+        return None
+
+
+def _put_json(key: str, payload: Any):
+    _atomic_write(_artifact_dir(key) / "data.json", json.dumps(payload, default=str).encode())
+    _write_manifest(key, "json", 1)
+
+
+def _get_json(key: str) -> Optional[Any]:
+    manifest = _manifest(key)
+    if not manifest or manifest.get("kind") != "json":
+        return None
+    try:
+        with open(_artifact_dir(key) / "data.json", "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+async def put_images(key: str, images: List[bytes]):
+    await asyncio.to_thread(_put_images, key, images)
+
+
+async def get_images(key: str) -> Optional[List[bytes]]:
+    return await asyncio.to_thread(_get_images, key)
+
+
+async def put_json(key: str, payload: Any):
+    await asyncio.to_thread(_put_json, key, payload)
+
+
+async def get_json(key: str) -> Optional[Any]:
+    return await asyncio.to_thread(_get_json, key)
+
+
+def purge_artifacts(max_age_s: float = _MAX_AGE_S) -> int:
+    """Delete artifact directories older than max_age_s. Returns how many were removed."""
+    root = Path(get_settings().PDF_CACHE_DIR) / "artifacts"
+    cutoff = time.time() - max_age_s
+    removed = 0
+    try:
+        entries = list(os.scandir(root))
+    except OSError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_dir() and entry.stat().st_mtime < cutoff:
+                shutil.rmtree(entry.path, ignore_errors=True)
+                removed += 1
+        except OSError:
+            continue
+    if removed:
+        logger.info(f"Purged {removed} extraction pipeline artifacts")
+    return removed
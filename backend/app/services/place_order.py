@@ -1,11 +1,12 @@
-import aiohttp
 import json
+import random
 import urllib.parse
-import ssl
 import logging
 import time
 from pathlib import Path
 from neo_login.session_manager import KotakSessionManager
+from broker_http import get_kotak_client
+from broker_rate_limiter import ORDERS, KOTAK_LIMIT_PER_MINUTE, get_rate_limiter
 from typing import Optional, Dict, Any
 
 # Import required modules
@@ -86,18 +87,19 @@ async def get_gsheet_stocks_df(sheet_url):
 
 
 
-async def place_order(order_data):
+async def place_order(order_data, auth=None):
     """
     Place a single order using Kotak Securities API
     
     Args:
         order_data: Dictionary containing order details
+        auth: Optional pre-fetched _get_order_headers() result (saves a session lookup per order)
         
     Returns:
         dict: Order response or None if failed
     """
     try:
-        auth = await _get_order_headers()
+        auth = auth or await _get_order_headers()
         if not auth:
             logger.error("Failed to get authentication from session manager")
             return None
@@ -105,56 +107,113 @@ async def place_order(order_data):
         headers = auth["headers"]
         
         payload = f"jData={urllib.parse.quote(json.dumps(order_data))}"
-        ssl_context = ssl.create_default_context()
-        ssl_context.check_hostname = False
-        ssl_context.verify_mode = ssl.CERT_NONE
-        connector = aiohttp.TCPConnector(ssl=ssl_context)
         
-        async with aiohttp.ClientSession(
-            connector=connector,
-            timeout=aiohttp.ClientTimeout(total=30)
-        ) as session:
-            async with session.post(
-                f"{base_url}/quick/order/rule/ms/place",
-                data=payload,
-                headers=headers
-            ) as response:
-                
-                result = await response.text()
-                logger.info(f"Order response: {result}")
-                
-                if response.status == 200:
-                    try:
-                        return json.loads(result)
-                    except json.JSONDecodeError:
-                        return {"status": "success", "response": result}
-                else:
-                    logger.error(f"Order failed with status {response.status}: {result}")
-                    return {"status": "error", "code": response.status, "message": result}
+        # Shared keep-alive client: one round trip per order, no TLS handshake
+        client = get_kotak_client()
+        response = await client.post(
+            f"{base_url}/quick/order/rule/ms/place",
+            content=payload,
+            headers=headers
+        )
+        
+        result = response.text
+        logger.info(f"Order response: {result}")
+        
+        if response.status_code == 200:
+            try:
+                return json.loads(result)
+            except json.JSONDecodeError:
+                return {"status": "success", "response": result}
+        else:
+            logger.error(f"Order failed with status {response.status_code}: {result}")
+            return {"status": "error", "code": response.status_code, "message": result}
                     
     except Exception as e:
         logger.error(f"Exception in place_order: {str(e)}")
         return None
 
 
+# ─── Adaptive order dispatch ───
+# Throughput is capped by the shared ORDERS token bucket; concurrency only has
+# to be high enough to keep that budget busy (rate x latency). The AIMD window
+# grows by ~1 per round trip while latency stays near its baseline, shrinks 10%
+# when latency balloons, and halves on a 429 — which also pauses the bucket so
+# every in-flight caller backs off together. Only 429-rejected orders are
+# retried; any other failure (timeout, 5xx) may already have reached the
+# exchange, so it is never re-sent.
+
+_MAX_CONCURRENCY = 12
+_LATENCY_SLOWDOWN = 2.0      # latency > 2x baseline counts as congestion
+_RETRY_LIMIT = 4             # attempts per order (first try + 3 retries on 429)
+_RETRY_BASE_S = 2.0
+_RETRY_CAP_S = 30.0
+
+
+def _retry_delay(attempt: int) -> float:
+    """Exponential backoff with equal jitter: 1-2s, 2-4s, 4-8s ... capped at 30s."""
+    d = min(_RETRY_CAP_S, _RETRY_BASE_S * (2 ** attempt))
+    return d / 2 + random.uniform(0, d / 2)
+
+
+class _AimdWindow:
+    """Additive-increase / multiplicative-decrease cap on in-flight orders."""
+
+    def __init__(self, initial: int, ceiling: int = _MAX_CONCURRENCY):
+        self.ceiling = max(1, ceiling)
+        self.limit = float(min(max(1, initial), self.ceiling))
+        self.peak = self.limit
+        self.in_flight = 0
+        self.baseline: Optional[float] = None
+        self._cond = asyncio.Condition()
+
+    async def acquire(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.in_flight < int(self.limit))
+            self.in_flight += 1
+
+    async def release(self, latency: Optional[float] = None, throttled: bool = False):
+        async with self._cond:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            elif latency is not None:
+                if self.baseline is None:
+                    self.baseline = latency
+                if latency > self.baseline * _LATENCY_SLOWDOWN:
+                    self.limit = max(1.0, self.limit * 0.9)
+                else:
+                    self.limit = min(float(self.ceiling), self.limit + 1.0 / self.limit)
+                self.baseline = 0.9 * self.baseline + 0.1 * latency
+            self.peak = max(self.peak, self.limit)
+            self._cond.notify_all()
+
+
 async def place_orders_with_rate_limit(orders_list, orders_per_minute=185, max_concurrent=2, progress_callback=None):
     """
-    Place orders respecting Kotak 200/min limit. Pace: 185/min (7.5% buffer).
-    2 concurrent + 0.324s delay = ~185 orders/min.
+    Place orders respecting Kotak 200/min limit through the shared ORDERS token bucket.
+    Concurrency adapts (AIMD) to latency and 429s; only 429-rejected orders are
+    retried, with jittered exponential backoff.
+
+    orders_list is treated as a priority ranking (see prioritize_order_rows):
+    dispatch always takes the lowest-index pending order, so a retried order
+    goes ahead of everything ranked below it instead of to the back of the book.
     
     Args:
         orders_list: List of order dictionaries
-        orders_per_minute: Target (default 185, under 200 limit)
-        max_concurrent: Max parallel (default 2, low burst)
+        orders_per_minute: Target rate (default 185, capped under the 200 limit)
+        max_concurrent: Starting concurrency (grows up to _MAX_CONCURRENCY as latency allows)
         progress_callback: Optional async callable(progress_dict) for real-time updates
+
+    Returns:
+        List of results in the same order as orders_list.
     """
     if not orders_list:
         logger.warning("No orders to place")
         return []
     
     total_orders = len(orders_list)
-    all_results = []
-    progress = {"total": total_orders, "completed": 0, "success": 0, "failed": 0}
+    results = [None] * total_orders
+    progress = {"total": total_orders, "completed": 0, "success": 0, "failed": 0, "retries": 0}
 
     async def _emit_progress(stock_name=""):
         if progress_callback:
@@ -164,71 +223,114 @@ async def place_orders_with_rate_limit(orders_list, orders_per_minute=185, max_c
                     "pending": progress["total"] - progress["completed"],
                     "percent": round(progress["completed"] / progress["total"] * 100, 1),
                     "current_stock": stock_name,
+                    "concurrency": int(window.limit),
                 })
             except Exception:
                 pass
 
-    # 60/185 = 0.324s per order. 2 concurrent = ~185/min
-    delay_per_order = 60.0 / min(orders_per_minute, 185)
-    batch_size = min(orders_per_minute, 185)
-    total_batches = (total_orders + batch_size - 1) // batch_size
-    
+    rate = min(orders_per_minute, KOTAK_LIMIT_PER_MINUTE - 5)
+    bucket = get_rate_limiter(ORDERS, rate)
+    window = _AimdWindow(max_concurrent)
+
     logger.info(f"🚀 Starting rate-limited order execution (max 200/min)")
-    logger.info(f"📊 Total orders: {total_orders}, Batch size: {batch_size}, Delay: {delay_per_order:.2f}s/order")
-    logger.info(f"🔢 Total batches: {total_batches}, Est. time: ~{total_batches} min")
+    logger.info(f"📊 Total orders: {total_orders}, Rate: {rate}/min, Start concurrency: {int(window.limit)}")
+    logger.info(f"🔢 Est. time: ~{total_orders / rate:.1f} min")
 
     await _emit_progress()
-    
-    for batch_num in range(total_batches):
-        start_idx = batch_num * batch_size
-        end_idx = min(start_idx + batch_size, total_orders)
-        batch = orders_list[start_idx:end_idx]
-        
-        logger.info(f"\n{'='*60}")
-        logger.info(f"📋 Batch {batch_num + 1}/{total_batches}: orders {start_idx + 1} to {end_idx}")
-        logger.info(f"{'='*60}")
-        
-        batch_start_time = time.time()
-        semaphore = asyncio.Semaphore(max_concurrent)
-        
-        async def _place_one(o):
-            async with semaphore:
-                stock_name = o.get('ts', 'Unknown')
-                r = None
-                for attempt in range(3):
-                    logger.info(f"Placing order: {stock_name} - {o.get('tt', 'Unknown')}")
-                    r = await place_order(o)
-                    if r and r.get('code') == 429:
-                        logger.warning(f"429 rate limit - waiting 60s, retry {attempt + 1}/2")
-                        await asyncio.sleep(60)
-                        continue
-                    break
-                await asyncio.sleep(delay_per_order)
-
-                result = r if r else {"status": "error", "message": "Failed after retries"}
-                is_success = not isinstance(result, Exception) and result and result.get('status') != 'error'
-                progress["completed"] += 1
-                if is_success:
-                    progress["success"] += 1
-                else:
-                    progress["failed"] += 1
-                await _emit_progress(stock_name)
-                return result
 
-        batch_results = await asyncio.gather(*[_place_one(o) for o in batch], return_exceptions=True)
-        all_results.extend(batch_results)
-        
-        batch_elapsed = time.time() - batch_start_time
-        batch_success = sum(1 for r in batch_results if not isinstance(r, Exception) and r and r.get('status') != 'error')
-        logger.info(f"⏱️ Batch {batch_num + 1} done in {batch_elapsed:.2f}s: {batch_success}/{len(batch)} success")
-        
-        if batch_num < total_batches - 1:
-            wait_time = max(5, 60 - batch_elapsed)
-            logger.info(f"⏸️ Waiting {wait_time:.1f}s to complete 60s window...")
-            await asyncio.sleep(wait_time)
-    
+    auth = await _get_order_headers()
+    if not auth:
+        logger.error("Failed to get authentication from session manager")
+        failed = {"status": "error", "message": "No valid Kotak session"}
+        progress.update(completed=total_orders, failed=total_orders)
+        await _emit_progress()
+        return [failed] * total_orders
+
+    start_time = time.time()
+    # (rank, attempt); rank = index in orders_list. Sentinel sorts last.
+    queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+    for i in range(total_orders):
+        queue.put_nowait((i, 0))
+    tasks = set()
+
+    def _spawn(coro):
+        task = asyncio.create_task(coro)
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    def _as_result(r):
+        # place_order returns the broker's parsed JSON, which is not always an object
+        if isinstance(r, dict) and r:
+            return r
+        if not r:
+            return {"status": "error", "message": "Failed after retries"}
+        return {"status": "error", "message": f"Unexpected order response: {r!r}"}
+
+    async def _finish(idx, r):
+        result = _as_result(r)
+        results[idx] = result
+        progress["completed"] += 1
+        if result.get('status') != 'error':
+            progress["success"] += 1
+        else:
+            progress["failed"] += 1
+        try:
+            await _emit_progress(orders_list[idx].get('ts', 'Unknown'))
+        except Exception as e:
+            logger.warning(f"Order progress update failed: {e}")
+        finally:
+            if progress["completed"] == total_orders:
+                queue.put_nowait((total_orders, -1))
+
+    async def _requeue_later(idx, attempt, delay):
+        await asyncio.sleep(delay)
+        queue.put_nowait((idx, attempt))
+
+    async def _send(idx, attempt):
+        o = orders_list[idx]
+        logger.info(f"Placing order: {o.get('ts', 'Unknown')} - {o.get('tt', 'Unknown')}")
+        t0 = time.monotonic()
+        r = None
+        requeued = False
+        # finally: every order that is not requeued is finished exactly once, so the
+        # completion sentinel is always queued and the dispatch loop below ends.
+        try:
+            try:
+                r = await place_order(o, auth=auth)
+            except Exception as e:
+                r = {"status": "error", "message": str(e)}
+            r = _as_result(r)
+            throttled = r.get('code') == 429
+            await window.release(time.monotonic() - t0, throttled)
+
+            if throttled and attempt + 1 < _RETRY_LIMIT:
+                delay = _retry_delay(attempt)
+                bucket.pause(delay)
+                progress["retries"] += 1
+                logger.warning(
+                    f"429 rate limit on {o.get('ts')} — retry {attempt + 1}/{_RETRY_LIMIT - 1} in {delay:.1f}s, "
+                    f"concurrency → {int(window.limit)}"
+                )
+                _spawn(_requeue_later(idx, attempt + 1, delay))
+                requeued = True
+        except Exception as e:
+            logger.error(f"Order dispatch failed for {o.get('ts', 'Unknown')}: {e}")
+            r = {"status": "error", "message": str(e)}
+        finally:
+            if not requeued:
+                await _finish(idx, r)
+
+    while True:
+        item = await queue.get()
+        if item[0] == total_orders:
+            break
+        await window.acquire()
+        await bucket.acquire()
+        _spawn(_send(*item))
+
     # Final summary
-    total_success = sum(1 for r in all_results if not isinstance(r, Exception) and r and r.get('status') != 'error')
+    elapsed = time.time() - start_time
+    total_success = progress["success"]
     total_failed = total_orders - total_success
     
     logger.info(f"\n{'='*60}")
@@ -236,12 +338,58 @@ async def place_orders_with_rate_limit(orders_list, orders_per_minute=185, max_c
     logger.info(f"{'='*60}")
     logger.info(f"✅ Successful orders: {total_success}/{total_orders} ({total_success/total_orders*100:.1f}%)")
     logger.info(f"❌ Failed orders: {total_failed}/{total_orders} ({total_failed/total_orders*100:.1f}%)")
+    logger.info(
+        f"⏱️ {elapsed:.1f}s, {total_orders / max(elapsed, 1e-9) * 60:.0f} orders/min, "
+        f"{progress['retries']} retries on 429, peak concurrency {window.peak:.1f}"
+    )
     logger.info(f"{'='*60}\n")
     
-    return all_results
+    return results
+
+
 
 
 
+# ─── Submission priority ───
+
+def _as_float(value, default: float) -> float:
+    try:
+        f = float(value)
+    except (ValueError, TypeError):
+        return default
+    return default if pd.isna(f) else f
+
+
+ORDER_PRIORITY_KEYS = {
+    # Tightest GAP first — those limits sit closest to the open and fill (or miss) earliest
+    "gap": lambda row, weights: _as_float(row.get('GAP'), float('inf')),
+    # Largest notional first
+    "turnover": lambda row, weights: -_as_float(row.get('OPEN PRICE'), 0.0) * _as_float(row.get('QUANTITY'), 1.0),
+    # User-supplied weight per symbol (OK or STOCK_NAME), highest first; unlisted = 0
+    "weight": lambda row, weights: -_as_float(
+        weights.get(str(row.get('OK', '')).upper(), weights.get(str(row.get('STOCK_NAME', '')).upper(), 0.0)), 0.0
+    ),
+}
+
+
+def prioritize_order_rows(all_rows, key="gap", weights=None):
+    """
+    Sort stock rows by submission priority (stable — ties keep sheet/table order).
+    get_order_data() emits BUY then SELL per row, so each pair stays back to back.
+
+    key: "gap" | "turnover" | "weight" | "none"
+    weights: {symbol: weight} for key="weight" (symbols matched upper-case)
+    """
+    if not key or key == "none":
+        return list(all_rows)
+    if key not in ORDER_PRIORITY_KEYS:
+        logger.warning(f"Unknown order priority '{key}', keeping original order")
+        return list(all_rows)
+    weights = {str(k).upper(): v for k, v in (weights or {}).items()}
+    rank = ORDER_PRIORITY_KEYS[key]
+    ordered = sorted(all_rows, key=lambda row: rank(row, weights))
+    logger.info(f"📌 Orders prioritised by {key}: first {[r.get('STOCK_NAME') for r in ordered[:5]]}")
+    return ordered
 
 
 async def get_order_data(all_rows):
@@ -14,6 +14,7 @@ from sqlalchemy import text
 
 from ..database import get_db_session
 from ..config import get_settings
+from .broker_rate_limiter import QUOTES, get_rate_limiter
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
@@ -50,6 +51,7 @@ async def fetch_quotes_batched(
     """
     Fetch quotes for all stocks in batches with rate limiting.
     Uses Kotak Neo API (or configured broker API).
+    Pacing is done per request by the shared Kotak quote token bucket.
     Returns dict of {symbol: price}.
     """
     if stocks_df.empty:
@@ -59,18 +61,16 @@ async def fetch_quotes_batched(
     if not symbols:
         return {}
 
+    get_rate_limiter(QUOTES, requests_per_minute)
+
     results = {}
     batch_size = min(requests_per_minute, 50)
-    delay = 60.0 / requests_per_minute
 
     for i in range(0, len(symbols), batch_size):
         batch = symbols[i:i + batch_size]
         batch_results = await _fetch_batch(batch)
         results.update(batch_results)
 
-        if i + batch_size < len(symbols):
-            await asyncio.sleep(delay * batch_size)
-
     logger.info(f"Fetched quotes: {len(results)}/{len(symbols)}")
     return results
 
@@ -102,8 +102,8 @@ async def get_single_quote(symbol: str, exchange: str = "NSE") -> Optional[float
         if not token:
             return None
 
-        # Kotak Neo quote API call
-        async with httpx.AsyncClient(timeout=10) as client:
+        # Kotak Neo quote API call (shares the process-wide quote budget)
+        async with get_rate_limiter(QUOTES).slot(), httpx.AsyncClient(timeout=10) as client:
             resp = await client.get(
                 f"https://lapi.kotaksecurities.com/scripmaster/1.1/masterscrip/token",
                 params={"token": token},
@@ -0,0 +1,173 @@
+"""
+Deterministic quarterly-results PDFs for the extraction benchmark.
+
+Fixtures are generated with PyMuPDF rather than committed, so nothing
+binary lives in the repo and every run sees byte-identical input. There are
+three layouts covering the extraction hot path:
+
+    digital   6 pages, text layer: cover letter, standalone + consolidated
+              results tables, notes, auditor review report
+    scanned   the same 6 pages rasterised at 150 dpi with no text layer
+              (image-pdf route: first 6 pages sent to vision)
+    long      28 pages, text layer, results tables on pages 20-21 of an
+              annual-report-style filing (keyword scan over 25 pages)
+
+expected_extraction() returns the response a model should give for a
+fixture. The stub server replays it, so save_quarterly_result gets realistic
+input.
+"""
+
+import random
+from typing import Dict, List
+
+import fitz  # PyMuPDF
+
+FIXTURE_KINDS = ("digital", "scanned", "long")
+
+_PAGE_W, _PAGE_H = 595, 842  # A4 in points
+
+_COLUMNS = [
+    # (column_header, period_type, quarter, financial_year, label)
+    ("30.06.2025", "quarter", "Q1", "2026", "Quarter ended 30.06.2025"),
+    ("31.03.2025", "quarter", "Q4", "2025", "Quarter ended 31.03.2025"),
+    ("30.06.2024", "quarter", "Q1", "2025", "Quarter ended 30.06.2024"),
+    ("31.03.2025", "annual", "FY", "2025", "Year ended 31.03.2025"),
+]
+
+_ROWS = [
+    ("revenue_from_operations", "1. Revenue from operations"),
+    ("other_income", "2. Other income"),
+    ("total_income", "3. Total income (1+2)"),
+    ("total_expenses", "4. Total expenses"),
+    ("profit_before_tax", "5. Profit before tax (3-4)"),
+    ("tax_expense", "6. Tax expense"),
+    ("profit_after_tax", "7. Net profit for the period (5-6)"),
+    ("paid_up_equity_share_capital", "8. Paid-up equity share capital"),
+    ("face_value", "   Face Value Rs. 10/- Each"),
+    ("eps_basic", "9. Earnings per share - Basic (Rs.)"),
+    ("eps_diluted", "   Earnings per share - Diluted (Rs.)"),
+]
+
+_FILLER = (
+    "The Board of Directors reviewed the operations of the Company during the period. "
+    "Management discussion covers industry structure, opportunities, threats, segment "
+    "performance, outlook, risks and concerns, internal control systems and their adequacy, "
+    "human resources and material developments. "
+)
+
+
+def _periods(symbol: str, consolidated: bool) -> List[Dict]:
+    rng = random.Random(f"{symbol}:{consolidated}")
+    shares_cr = rng.choice([5.0, 12.5, 25.0, 48.0])
+    out = []
+    for header, ptype, quarter, fy, _ in _COLUMNS:
+        scale = 4.0 if ptype == "annual" else 1.0
+        revenue = round(rng.uniform(800, 9000) * scale, 2)
+        other = round(revenue * rng.uniform(0.005, 0.04), 2)
+        expenses = round(revenue * rng.uniform(0.72, 0.9), 2)
+        pbt = round(revenue + other - expenses, 2)
+        tax = round(pbt * 0.25, 2)
+        pat = round(pbt - tax, 2)
+        eps = round(pat / (shares_cr * 10), 2)
+        out.append({
+            "column_header": header,
+            "period_type": ptype,
+            "quarter": quarter,
+            "financial_year": fy,
+            "revenue_from_operations": revenue,
+            "other_income": other,
+            "total_income": round(revenue + other, 2),
+            "total_expenses": expenses,
+            "profit_before_tax": pbt,
+            "tax_expense": tax,
+            "profit_after_tax": pat,
+            "paid_up_equity_share_capital": round(shares_cr * 100, 2),
+            "face_value": 10.0,
+            "eps_basic": eps,
+            "eps_diluted": eps,
+        })
+    return out
+
+
+def expected_extraction(symbol: str) -> Dict:
+    """The extraction a model should return for any fixture of `symbol`."""
+    return {
+        "company_name": f"{symbol} Industries Limited",
+        "units": "lakhs",
+        "standalone_periods": _periods(symbol, consolidated=False),
+        "consolidated_periods": _periods(symbol, consolidated=True),
+    }
+
+
+def _text_page(doc: fitz.Document, title: str, body: str):
+    page = doc.new_page(width=_PAGE_W, height=_PAGE_H)
+    page.insert_text((50, 60), title, fontsize=13, fontname="hebo")
+    rect = fitz.Rect(50, 80, _PAGE_W - 50, _PAGE_H - 50)
+    page.insert_textbox(rect, body, fontsize=10, fontname="helv")
+
+
+def _results_page(doc: fitz.Document, symbol: str, consolidated: bool):
+    periods = _periods(symbol, consolidated)
+    kind = "Consolidated" if consolidated else "Standalone"
+    page = doc.new_page(width=_PAGE_W, height=_PAGE_H)
+    page.insert_text((50, 50), f"{symbol} INDUSTRIES LIMITED", fontsize=12, fontname="hebo")
+    page.insert_text(
+        (50, 70), f"Statement of {kind} Unaudited Financial Results for the Quarter ended 30.06.2025",
+        fontsize=10, fontname="hebo",
+    )
+    page.insert_text((50, 86), "(Rs. in lakhs, except per share data)", fontsize=8, fontname="helv")
+
+    x_label, x_cols, col_w, y = 50, 250, 82, 115
+    for i, (_, _, _, _, label) in enumerate(_COLUMNS):
+        words = label.split(" ")
+        page.insert_text((x_cols + i * col_w, y), " ".join(words[:2]), fontsize=8, fontname="hebo")
+        page.insert_text((x_cols + i * col_w, y + 10), " ".join(words[2:]), fontsize=8, fontname="hebo")
+    page.insert_text((x_cols, y + 22), "(Unaudited)   (Audited)   (Unaudited)   (Audited)",
+                     fontsize=7, fontname="helv")
+    y += 45
+    for key, label in _ROWS:
+        page.insert_text((x_label, y), label, fontsize=8, fontname="helv")
+        for i, p in enumerate(periods):
+            page.insert_text((x_cols + i * col_w, y), f"{p[key]:,.2f}", fontsize=8, fontname="helv")
+        y += 18
+    page.draw_rect(fitz.Rect(45, 100, _PAGE_W - 20, y), color=(0, 0, 0), width=0.5)
+
+
+def _digital_pages(doc: fitz.Document, symbol: str):
+    _text_page(doc, "Outcome of Board Meeting",
+               f"Pursuant to Regulation 33 of SEBI (LODR) Regulations, 2015, the Board of {symbol} "
+               "Industries Limited at its meeting held today approved the unaudited results. " * 4)
+    _results_page(doc, symbol, consolidated=False)
+    _results_page(doc, symbol, consolidated=True)
+    _text_page(doc, "Notes", "The above results were reviewed by the Audit Committee. " * 12)
+    _text_page(doc, "Independent Auditor's Limited Review Report",
+               "We have reviewed the accompanying statement of unaudited financial results. " * 14)
+    _text_page(doc, "Independent Auditor's Limited Review Report (contd.)",
+               "Based on our review conducted as above, nothing has come to our attention. " * 14)
+
+
+def build_fixture_pdf(kind: str, symbol: str = "BENCH") -> bytes:
+    """PDF bytes for one fixture layout (see module docstring)."""
+    doc = fitz.open()
+    if kind == "digital":
+        _digital_pages(doc, symbol)
+    elif kind == "scanned":
+        src = fitz.open()
+        _digital_pages(src, symbol)
+        for page in src:
+            pix = page.get_pixmap(dpi=150, colorspace=fitz.csGRAY)
+            out = doc.new_page(width=_PAGE_W, height=_PAGE_H)
+            out.insert_image(out.rect, stream=pix.tobytes("png"))
+        src.close()
+    elif kind == "long":
+        for i in range(19):
+            _text_page(doc, f"Directors' Report ({i + 1})", _FILLER * 6)
+        _results_page(doc, symbol, consolidated=False)
+        _results_page(doc, symbol, consolidated=True)
+        for i in range(7):
+            _text_page(doc, f"Corporate Governance Report ({i + 1})", _FILLER * 6)
+    else:
+        raise ValueError(f"Unknown fixture kind {kind!r} (expected one of {FIXTURE_KINDS})")
+    data = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return data
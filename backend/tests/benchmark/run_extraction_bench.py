@@ -0,0 +1,352 @@
+"""
+Offline benchmark of the quarterly-results extraction hot path.
+
+Runs download_and_convert_pdf → extract_financial_data_ai →
+save_quarterly_result over generated fixture PDFs (fixtures.py), served
+together with a stub /v1/chat/completions (stub_openai.py) from one local
+HTTP server. No network access, OpenAI key or live exchange is needed, and
+save_quarterly_result runs only when Postgres is reachable (or is skipped
+with --no-db).
+
+For each worker count N, jobs run N at a time (asyncio, the way a
+--pool=threads Celery worker overlaps extractions). It reports:
+
+  - per-stage p50 / p95 / max seconds (download+render, ai, save)
+  - throughput (PDFs/s) and the wall time for the batch
+  - peak RSS of this process plus the PDF render pool children
+    (sampled from /proc every 50ms; ru_maxrss where /proc is missing)
+  - stub request count and request MB (vision payload size)
+
+The AI result cache and the OpenAI governor are switched off for the run, so
+every job really calls the stub. PDF_CACHE_DIR points at a temp dir, so every
+download is a real fetch. --baseline compares the run against a saved
+--json file and exits 1 when a stage p50 or the throughput regresses by more
+than --tolerance. CI compares against baseline.json in this directory;
+refresh it from the CI report artifact when the hot path changes on purpose.
+
+Usage: python -m tests.benchmark.run_extraction_bench [--jobs 24] [--workers 1,4,8]
+           [--kinds digital,scanned,long] [--latency-ms 800] [--jitter-ms 200]
+           [--no-db] [--json out.json] [--baseline base.json] [--tolerance 0.5]
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+from sqlalchemy import text  # noqa: E402
+
+from app.config import get_settings  # noqa: E402
+from app.database import get_db_session  # noqa: E402
+from app.services.ocr_extractor import (  # noqa: E402
+    close_openai_clients,
+    download_and_convert_pdf,
+    extract_financial_data_ai,
+    save_quarterly_result,
+)
+from tests.benchmark.fixtures import FIXTURE_KINDS, build_fixture_pdf  # noqa: E402
+from tests.benchmark.stub_openai import StubOpenAIServer  # noqa: E402
+
+STAGES = ("download_and_convert_pdf", "extract_financial_data_ai", "save_quarterly_result")
+BENCH_SYMBOL_PREFIX = "BENCH"
+_ANNOUNCEMENT_DATE = "2025-08-01 18:30:00"
+
+
+# ─── Memory sampling ────────────────────────────────────────────────────────
+
+_PAGE_MB = os.sysconf("SC_PAGE_SIZE") / (1024 * 1024) if hasattr(os, "sysconf") else 0.0
+
+
+def _rss_mb(pid: int) -> float:
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_MB
+    except (OSError, ValueError, IndexError):
+        return 0.0
+
+
+class _PeakRss:
+    """Background sampler of RSS for this process + live multiprocessing children (render pool)."""
+
+    def __init__(self, interval_s: float = 0.05):
+        self.interval_s = interval_s
+        self.peak_mb = 0.0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="bench-rss", daemon=True)
+        self._proc = os.path.exists(f"/proc/{os.getpid()}/statm")
+
+    def _sample(self) -> float:
+        pids = [os.getpid()] + [p.pid for p in multiprocessing.active_children()]
+        return sum(_rss_mb(pid) for pid in pids)
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak_mb = max(self.peak_mb, self._sample())
+            self._stop.wait(self.interval_s)
+
+    def __enter__(self) -> "_PeakRss":
+        if self._proc:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        if self._proc:
+            self._stop.set()
+            self._thread.join()
+            return
+        # No /proc (macOS): lifetime peaks only, kilobytes on Linux / bytes on macOS
+        div = 1024 * 1024 if sys.platform == "darwin" else 1024
+        self.peak_mb = (resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+                        + resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss) / div
+
+
+# ─── Settings for an offline run ────────────────────────────────────────────
+
+@contextmanager
+def bench_settings(base_url: str, cache_dir: str):
+    """Point the cached Settings at the stub for the duration of a run (restored afterwards)."""
+    settings = get_settings()
+    overrides = {
+        "OPENAI_BASE_URL": base_url,
+        "OPENAI_API_KEY": settings.OPENAI_API_KEY or "bench-key",
+        "OPENAI_GOVERNOR": False,
+        "AI_CACHE_ENABLED": False,
+        "PDF_CACHE_DIR": cache_dir,
+    }
+    saved = {k: getattr(settings, k) for k in overrides}
+    for k, v in overrides.items():
+        setattr(settings, k, v)
+    try:
+        yield settings
+    finally:
+        for k, v in saved.items():
+            setattr(settings, k, v)
+
+
+async def db_available(timeout: float = 3.0) -> bool:
+    try:
+        async def _ping():
+            async with get_db_session() as db:
+                await db.execute(text("SELECT 1"))
+        await asyncio.wait_for(_ping(), timeout)
+        return True
+    except Exception:
+        return False
+
+
+async def cleanup_bench_rows():
+    async with get_db_session() as db:
+        await db.execute(
+            text("DELETE FROM quarterly_results WHERE stock_symbol LIKE :p"),
+            {"p": f"{BENCH_SYMBOL_PREFIX}%"},
+        )
+        await db.commit()
+
+
+# ─── Runner ─────────────────────────────────────────────────────────────────
+
+async def _run_job(i: int, pdf_url: str, use_db: bool) -> Dict[str, Any]:
+    symbol = f"{BENCH_SYMBOL_PREFIX}{i:04d}"
+    timings: Dict[str, float] = {}
+
+    t0 = time.perf_counter()
+    images = await download_and_convert_pdf(pdf_url)
+    timings["download_and_convert_pdf"] = time.perf_counter() - t0
+    if not images:
+        return {"ok": False, "error": "no images", "timings": timings}
+
+    t0 = time.perf_counter()
+    result = await extract_financial_data_ai(images, symbol, f"{symbol} Industries Limited", source=pdf_url)
+    timings["extract_financial_data_ai"] = time.perf_counter() - t0
+    if not result or not result.get("standalone_periods"):
+        return {"ok": False, "error": "empty extraction", "timings": timings}
+
+    if use_db:
+        t0 = time.perf_counter()
+        await save_quarterly_result(symbol, f"{symbol} Industries Limited", "NSE", pdf_url,
+                                    _ANNOUNCEMENT_DATE, result)
+        timings["save_quarterly_result"] = time.perf_counter() - t0
+    return {"ok": True, "images": len(images), "timings": timings}
+
+
+def _stage_stats(values: List[float]) -> Dict[str, float]:
+    if not values:
+        return {}
+    ordered = sorted(values)
+    p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+    return {
+        "p50": round(statistics.median(ordered), 4),
+        "p95": round(p95, 4),
+        "max": round(ordered[-1], 4),
+        "count": len(ordered),
+    }
+
+
+async def run_batch(urls: List[str], workers: int, use_db: bool) -> Dict[str, Any]:
+    """Run every URL through the hot path, `workers` at a time."""
+    sem = asyncio.Semaphore(workers)
+
+    async def _one(i, url):
+        async with sem:
+            try:
+                return await _run_job(i, url, use_db)
+            except Exception as e:
+                return {"ok": False, "error": f"{type(e).__name__}: {e}", "timings": {}}
+
+    with _PeakRss() as rss:
+        start = time.perf_counter()
+        jobs = await asyncio.gather(*(_one(i, url) for i, url in enumerate(urls)))
+        wall = time.perf_counter() - start
+
+    ok = [j for j in jobs if j["ok"]]
+    return {
+        "workers": workers,
+        "jobs": len(jobs),
+        "ok": len(ok),
+        "errors": sorted({j["error"] for j in jobs if not j["ok"]}),
+        "wall_s": round(wall, 3),
+        "throughput_pdf_s": round(len(ok) / wall, 3) if wall else 0.0,
+        "peak_rss_mb": round(rss.peak_mb, 1),
+        "images_per_pdf": round(statistics.mean(j["images"] for j in ok), 2) if ok else 0,
+        "stages": {
+            stage: _stage_stats([j["timings"][stage] for j in ok if stage in j["timings"]])
+            for stage in STAGES
+        },
+    }
+
+
+async def run_benchmark(
+    jobs: int = 24,
+    workers: List[int] = (1, 4, 8),
+    kinds: List[str] = FIXTURE_KINDS,
+    latency_ms: float = 800.0,
+    jitter_ms: float = 200.0,
+    use_db: Optional[bool] = None,
+) -> Dict[str, Any]:
+    """
+    Full benchmark; returns the report dict (what --json writes).
+    use_db=None saves to Postgres only if it is reachable.
+    """
+    fixtures = {kind: build_fixture_pdf(kind) for kind in kinds}
+    if use_db is None:
+        use_db = await db_available()
+
+    report: Dict[str, Any] = {
+        "config": {
+            "jobs": jobs, "workers": list(workers), "kinds": list(kinds),
+            "latency_ms": latency_ms, "jitter_ms": jitter_ms, "db": use_db,
+            "fixture_bytes": {k: len(v) for k, v in fixtures.items()},
+            "cpu_count": os.cpu_count(),
+        },
+        "runs": [],
+    }
+    with StubOpenAIServer(latency_ms=latency_ms, jitter_ms=jitter_ms) as stub, \
+            tempfile.TemporaryDirectory(prefix="bench_pdf_cache_") as cache_dir, \
+            bench_settings(stub.base_url, cache_dir):
+        pdf_urls = {kind: stub.add_pdf(f"{kind}.pdf", data) for kind, data in fixtures.items()}
+        for n in workers:
+            # Unique query per job → separate pdf_cache entry → every download is a real fetch
+            urls = [f"{pdf_urls[kinds[i % len(kinds)]]}?run={n}&job={i}" for i in range(jobs)]
+            req_before, bytes_before = stub.requests, stub.request_bytes
+            run = await run_batch(urls, n, use_db)
+            run["stub_requests"] = stub.requests - req_before
+            run["stub_request_mb"] = round((stub.request_bytes - bytes_before) / (1024 * 1024), 2)
+            report["runs"].append(run)
+        if use_db:
+            await cleanup_bench_rows()
+    await close_openai_clients()
+    return report
+
+
+# ─── Reporting / regression check ───────────────────────────────────────────
+
+def print_report(report: Dict[str, Any]):
+    cfg = report["config"]
+    print(f"\nExtraction benchmark: {cfg['jobs']} jobs, kinds={','.join(cfg['kinds'])}, "
+          f"stub latency {cfg['latency_ms']:.0f}±{cfg['jitter_ms']:.0f}ms, db={'on' if cfg['db'] else 'off'}")
+    print("Fixture sizes: " + ", ".join(f"{k}={v / 1024:.0f}KB" for k, v in cfg["fixture_bytes"].items()))
+    for run in report["runs"]:
+        print(f"\n  workers={run['workers']}: {run['ok']}/{run['jobs']} ok in {run['wall_s']:.2f}s "
+              f"→ {run['throughput_pdf_s']:.2f} PDF/s, peak RSS {run['peak_rss_mb']:.0f} MB, "
+              f"{run['images_per_pdf']} images/PDF, {run['stub_request_mb']} MB sent to model")
+        for stage, s in run["stages"].items():
+            if s:
+                print(f"    {stage:<28} p50 {s['p50']:.3f}s  p95 {s['p95']:.3f}s  max {s['max']:.3f}s")
+        for err in run["errors"]:
+            print(f"    ERROR: {err}")
+
+
+def compare_to_baseline(report: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    """Regressions (stage p50 slower / throughput lower than baseline by more than tolerance)."""
+    problems = []
+    base_runs = {r["workers"]: r for r in baseline.get("runs", [])}
+    for run in report["runs"]:
+        base = base_runs.get(run["workers"])
+        if base is None:
+            continue
+        if run["ok"] < run["jobs"]:
+            problems.append(f"workers={run['workers']}: {run['jobs'] - run['ok']} job(s) failed")
+        for stage, s in run["stages"].items():
+            b = base["stages"].get(stage) or {}
+            if s and b.get("p50") and s["p50"] > b["p50"] * (1 + tolerance):
+                problems.append(f"workers={run['workers']} {stage}: p50 {s['p50']:.3f}s vs baseline {b['p50']:.3f}s")
+        if base.get("throughput_pdf_s") and run["throughput_pdf_s"] < base["throughput_pdf_s"] / (1 + tolerance):
+            problems.append(f"workers={run['workers']}: throughput {run['throughput_pdf_s']:.2f} PDF/s "
+                            f"vs baseline {base['throughput_pdf_s']:.2f}")
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline extraction hot-path benchmark")
+    parser.add_argument("--jobs", type=int, default=24)
+    parser.add_argument("--workers", default="1,4,8", help="comma-separated concurrency levels")
+    parser.add_argument("--kinds", default=",".join(FIXTURE_KINDS))
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--no-db", action="store_true", help="skip save_quarterly_result")
+    parser.add_argument("--json", help="write the report to this file")
+    parser.add_argument("--baseline", help="report JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown (0.5 = 50%%)")
+    parser.add_argument("-v", "--verbose", action="store_true", help="show app logs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING)
+    report = asyncio.run(run_benchmark(
+        jobs=args.jobs,
+        workers=[int(w) for w in args.workers.split(",")],
+        kinds=args.kinds.split(","),
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        use_db=False if args.no_db else None,
+    ))
+    print_report(report)
+    if args.json:
+        Path(args.json).write_text(json.dumps(report, indent=2))
+        print(f"\nReport written to {args.json}")
+    if args.baseline:
+        problems = compare_to_baseline(report, json.loads(Path(args.baseline).read_text()), args.tolerance)
+        if problems:
+            print("\nREGRESSIONS vs baseline:")
+            for p in problems:
+                print(f"  - {p}")
+            sys.exit(1)
+        print(f"\nNo regressions vs {args.baseline} (tolerance {args.tolerance:.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,169 @@
+"""
+Local stand-in for the OpenAI chat completions API (and a PDF file host),
+for offline extraction benchmarks.
+
+    POST /v1/chat/completions   sleeps latency_ms ± jitter_ms, then returns a
+                                chat.completion whose content is the fixture's
+                                expected extraction (JSON mode) and whose usage
+                                is estimated from the request size
+    GET  /pdf/<name>            serves fixture PDF bytes (query string ignored,
+                                so ?n=<i> gives each job its own cache key)
+
+The server runs on a ThreadingHTTPServer in a background thread, so
+concurrent requests overlap their latency the way real API calls do.
+
+Standalone: python -m tests.benchmark.stub_openai --port 8765 --latency-ms 1500
+then set OPENAI_BASE_URL=http://127.0.0.1:8765/v1 for the API / workers.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional
+
+from tests.benchmark.fixtures import expected_extraction
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server: "_StubHTTPServer"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):  # keep benchmark output clean
+        pass
+
+    def _send(self, status: int, body: bytes, content_type: str):
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        name = self.path.split("?", 1)[0].rsplit("/", 1)[-1]
+        data = self.server.pdfs.get(name) if self.path.startswith("/pdf/") else None
+        if data is None:
+            self._send(404, b"not found", "text/plain")
+            return
+        self._send(200, data, "application/pdf")
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length)
+        if not self.path.endswith("/chat/completions"):
+            self._send(404, b"not found", "text/plain")
+            return
+        stub = self.server
+        with stub.lock:
+            stub.requests += 1
+            stub.request_bytes += len(raw)
+            rate_limited = stub.rng.random() < stub.error_rate
+            delay = max(0.0, stub.latency_ms + stub.rng.uniform(-stub.jitter_ms, stub.jitter_ms)) / 1000.0
+        time.sleep(delay)
+        if rate_limited:
+            self._send(429, b'{"error": {"message": "Rate limit reached (stub)"}}', "application/json")
+            return
+
+        content = json.dumps(expected_extraction(stub.default_symbol))
+        body = {
+            "id": f"chatcmpl-stub-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": "gpt-4.1-mini",
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(raw) // 4, "completion_tokens": len(content) // 4,
+                      "total_tokens": len(raw) // 4 + len(content) // 4},
+        }
+        self._send(200, json.dumps(body).encode(), "application/json")
+
+
+class _StubHTTPServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, addr, latency_ms: float, jitter_ms: float, error_rate: float, default_symbol: str):
+        super().__init__(addr, _Handler)
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.default_symbol = default_symbol
+        self.pdfs: Dict[str, bytes] = {}
+        self.lock = threading.Lock()
+        self.rng = random.Random(0)
+        self.requests = 0
+        self.request_bytes = 0
+
+
+class StubOpenAIServer:
+    """
+    `with StubOpenAIServer(latency_ms=800) as stub:` — stub.base_url is the
+    OPENAI_BASE_URL to use; stub.add_pdf(name, data) returns a URL for it.
+    """
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        jitter_ms: float = 0.0,
+        error_rate: float = 0.0,
+        default_symbol: str = "BENCH",
+        port: int = 0,
+    ):
+        self._server = _StubHTTPServer(("127.0.0.1", port), latency_ms, jitter_ms, error_rate, default_symbol)
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def root_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def base_url(self) -> str:
+        return f"{self.root_url}/v1"
+
+    @property
+    def requests(self) -> int:
+        return self._server.requests
+
+    @property
+    def request_bytes(self) -> int:
+        return self._server.request_bytes
+
+    def add_pdf(self, name: str, data: bytes) -> str:
+        self._server.pdfs[name] = data
+        return f"{self.root_url}/pdf/{name}"
+
+    def start(self) -> "StubOpenAIServer":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="stub-openai", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def __enter__(self) -> "StubOpenAIServer":
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Stub OpenAI /v1/chat/completions server")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    parser.add_argument("--symbol", default="BENCH", help="fixture symbol whose extraction is returned")
+    args = parser.parse_args()
+    stub = StubOpenAIServer(args.latency_ms, args.jitter_ms, args.error_rate, args.symbol, args.port)
+    print(f"Stub OpenAI listening on {stub.base_url} (latency {args.latency_ms:.0f}ms ± {args.jitter_ms:.0f}ms)")
+    try:
+        stub._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
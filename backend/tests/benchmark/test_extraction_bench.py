@@ -0,0 +1,23 @@
+"""
+Offline extraction benchmark as a CI smoke test: fixture PDFs through
+download_and_convert_pdf → extract_financial_data_ai (stub model) →
+save_quarterly_result (when Postgres is reachable). A broken hot path fails
+here instead of on results day. Timings are only printed: shared runners are
+too noisy for wall-clock asserts, so slowdowns are caught by the CI benchmark
+step, which compares against baseline.json with a tolerance.
+"""
+
+from tests.benchmark.run_extraction_bench import print_report, run_benchmark
+
+
+async def test_extraction_hot_path_offline():
+    report = await run_benchmark(jobs=6, workers=[1, 3], latency_ms=300, jitter_ms=0)
+    print_report(report)
+
+    for run in report["runs"]:
+        assert run["ok"] == run["jobs"], run["errors"]
+        assert run["stub_requests"] == run["jobs"]
+        assert run["stages"]["download_and_convert_pdf"]["count"] == run["jobs"]
+        assert run["stages"]["extract_financial_data_ai"]["count"] == run["jobs"]
+        if report["config"]["db"]:
+            assert run["stages"]["save_quarterly_result"]["count"] == run["jobs"]
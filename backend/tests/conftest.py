@@ -10,6 +10,7 @@ from httpx import AsyncClient, ASGITransport
 
 from app.main import app
 from app.cache import get_redis
+from app.database import AsyncSessionLocal
 
 
 @pytest.fixture(scope="session")
@@ -46,3 +47,11 @@ async def redis_client():
     r = get_redis()
     yield r
     await r.flushdb()
+
+
+@pytest_asyncio.fixture
+async def db_session():
+    """Database session rolled back after the test (trigger side effects included)."""
+    async with AsyncSessionLocal() as session:
+        yield session
+        await session.rollback()
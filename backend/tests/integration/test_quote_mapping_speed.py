@@ -0,0 +1,156 @@
+"""
+Micro-benchmark: quote → DataFrame mapping pipeline in get_quote.py.
+Compares the old row-by-row path (iterrows + per-row df.at + str(int(float(token))))
+against the vectorised path (token Series map + columnar BUY/SELL) on synthetic
+order sheets, and checks both produce identical OPEN PRICE / BUY ORDER / SELL ORDER.
+
+Usage: python test_quote_mapping_speed.py [--sizes 2000 20000 200000] [--repeat 3]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SERVICES_DIR = Path(__file__).resolve().parents[2] / "app" / "services"
+if str(SERVICES_DIR) not in sys.path:
+    sys.path.insert(0, str(SERVICES_DIR))
+
+
+# ─── Old row-by-row implementation (baseline) ───
+
+def legacy_rows_and_symbols(df):
+    all_rows = [row.to_dict() for _, row in df.iterrows()]
+    symbols_list, valid_indices, seen = [], [], set()
+    for idx, row in enumerate(all_rows):
+        token_value, gap_value = row.get('EXCHANGE_TOKEN'), row.get('GAP')
+        if pd.isna(token_value) or token_value == '' or token_value == 0:
+            continue
+        if pd.isna(gap_value) or gap_value == '':
+            continue
+        try:
+            token = int(float(token_value))
+        except (ValueError, TypeError):
+            continue
+        if token > 0 and token not in seen:
+            symbols_list.append(f"nse_cm|{token}")
+            valid_indices.append(idx)
+            seen.add(token)
+    return symbols_list, valid_indices
+
+
+def legacy_update(df, quote_ohlc, valid_indices):
+    df['OPEN PRICE'] = None
+    token_price_map = {}
+    for q in quote_ohlc:
+        token, open_price = q.get('exchange_token', ''), q.get('open', '')
+        if token and str(token).strip() and open_price != '' and open_price is not None:
+            if float(open_price) > 0:
+                token_price_map[str(int(float(token)))] = float(open_price)
+    for i, idx in enumerate(valid_indices):
+        row_token = df.at[idx, 'EXCHANGE_TOKEN']
+        if row_token is not None and not pd.isna(row_token):
+            token_key = str(int(float(row_token)))
+            if token_key in token_price_map:
+                df.at[idx, 'OPEN PRICE'] = token_price_map[token_key]
+                continue
+        if i < len(quote_ohlc):
+            open_price = quote_ohlc[i].get('open', '')
+            if open_price != '' and open_price is not None and float(open_price) > 0:
+                df.at[idx, 'OPEN PRICE'] = float(open_price)
+    df['OPEN PRICE'] = pd.to_numeric(df['OPEN PRICE'], errors='coerce')
+    df['GAP'] = pd.to_numeric(df['GAP'], errors='coerce')
+    df['BUY ORDER'] = (df['OPEN PRICE'] * (1 - df['GAP'] / 100)).round(0)
+    df['SELL ORDER'] = (df['OPEN PRICE'] * (1 + df['GAP'] / 100)).round(0)
+    return df
+
+
+# ─── Synthetic data ───
+
+def make_sheet(n: int, seed: int = 7) -> pd.DataFrame:
+    """Order sheet with ~2% blank tokens, ~1% blank GAP and ~3% duplicate tokens."""
+    rng = np.random.default_rng(seed)
+    tokens = rng.choice(np.arange(1, n * 4), size=n, replace=False).astype(float)
+    tokens[rng.random(n) < 0.03] = tokens[0]
+    tokens[rng.random(n) < 0.02] = np.nan
+    gap = np.full(n, 3.0)
+    gap[rng.random(n) < 0.01] = np.nan
+    return pd.DataFrame({
+        "OK": [f"SYM{i}" for i in range(n)],
+        "STOCK_NAME": [f"SYM{i}-EQ" for i in range(n)],
+        "EXCHANGE_TOKEN": tokens,
+        "GAP": gap,
+        "MARKET": "nse_cm",
+        "QUANTITY": 1,
+        "OPEN PRICE": np.nan,
+        "BUY ORDER": np.nan,
+        "SELL ORDER": np.nan,
+    })
+
+
+def make_quotes(symbols, seed: int = 11):
+    """Broker-shaped OHLC dicts (~2% open=0, shuffled so token matching is exercised)."""
+    rng = np.random.default_rng(seed)
+    quotes = []
+    for sym in symbols:
+        token = sym.split("|")[1]
+        open_price = 0 if rng.random() < 0.02 else round(float(rng.uniform(10, 5000)), 2)
+        quotes.append({"exchange_token": token, "display_symbol": f"T{token}-EQ", "exchange": "nse_cm",
+                       "open": open_price, "high": "", "low": "", "close": ""})
+    order = rng.permutation(len(quotes))
+    return [quotes[i] for i in order]
+
+
+# ─── Runner ───
+
+def _best_of(fn, repeat: int) -> float:
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def run(sizes, repeat: int):
+    import logging
+    logging.disable(logging.WARNING)
+    from get_quote import get_symbol_from_gsheet_stocks_df, update_df_with_quote_ohlc
+
+    print(f"{'rows':>8} | {'legacy (s)':>10} | {'vectorised (s)':>14} | {'speedup':>7}")
+    print("-" * 50)
+    for n in sizes:
+        sheet = make_sheet(n)
+        symbols, _ = legacy_rows_and_symbols(sheet)
+        quotes = make_quotes(symbols)
+
+        # Bind this size's inputs now, not at call time
+        def _legacy(sheet=sheet, quotes=quotes):
+            _, v = legacy_rows_and_symbols(sheet)
+            return legacy_update(sheet.copy(), quotes, v)
+
+        def _vectorised(sheet=sheet, quotes=quotes):
+            async def _go():
+                _, v = await get_symbol_from_gsheet_stocks_df(sheet)
+                return await update_df_with_quote_ohlc(sheet.copy(), quotes, v)
+            return asyncio.run(_go())
+
+        old_df, new_df = _legacy(), _vectorised()
+        for col in ("OPEN PRICE", "BUY ORDER", "SELL ORDER"):
+            pd.testing.assert_series_equal(old_df[col], new_df[col], check_dtype=False)
+
+        t_old = _best_of(_legacy, repeat)
+        t_new = _best_of(_vectorised, repeat)
+        print(f"{n:>8} | {t_old:>10.3f} | {t_new:>14.3f} | {t_old / t_new:>6.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[2_000, 20_000, 200_000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    run(args.sizes, args.repeat)
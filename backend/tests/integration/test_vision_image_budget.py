@@ -0,0 +1,140 @@
+"""
+Comparison: legacy colour PNG pages (zoom 2.0) vs token-budgeted vision images
+(page_image_encoder.encode_pages) on a folder of quarterly-result PDFs.
+
+Always prints per-PDF bytes / estimated image tokens for both paths. With --ai
+it also runs extract_financial_data_ai on both image sets and diffs the key
+fields per period (standalone + consolidated), so a budget/format change can
+be checked for accuracy before rollout. Needs OPENAI_API_KEY in .env for --ai.
+
+Usage: python test_vision_image_budget.py <fixtures_dir> [--ai] [--tokens 16000] [--bytes 4000000]
+                                          [--format auto|png|jpeg|webp] [--color]
+"""
+
+import sys
+import time
+import asyncio
+import argparse
+from pathlib import Path
+
+from dotenv import load_dotenv
+
+BACKEND_DIR = Path(__file__).resolve().parents[2]
+if str(BACKEND_DIR) not in sys.path:
+    sys.path.insert(0, str(BACKEND_DIR))
+
+load_dotenv()
+
+_COMPARE_FIELDS = (
+    "revenue_from_operations", "other_income", "total_income", "total_expenses",
+    "profit_before_tax", "tax_expense", "profit_after_tax", "eps_basic", "eps_diluted",
+)
+
+
+def _period_values(result):
+    """{(table, column_header, period_type, field): value} for the fields above."""
+    out = {}
+    for table in ("standalone_periods", "consolidated_periods"):
+        for period in (result or {}).get(table) or []:
+            key = (table, str(period.get("column_header")), period.get("period_type"))
+            for field in _COMPARE_FIELDS:
+                out[key + (field,)] = period.get(field)
+    return out
+
+
+def _same(a, b) -> bool:
+    if a is None or b is None:
+        return a is None and b is None
+    try:
+        return abs(float(a) - float(b)) <= 0.01 * max(1.0, abs(float(a)))
+    except (TypeError, ValueError):
+        return str(a).strip() == str(b).strip()
+
+
+def _diff(legacy, budgeted):
+    old, new = _period_values(legacy), _period_values(budgeted)
+    keys = set(old) | set(new)
+    mismatches = [(k, old.get(k), new.get(k)) for k in sorted(keys, key=str) if not _same(old.get(k), new.get(k))]
+    return len(keys), mismatches
+
+
+async def run(fixtures: Path, use_ai: bool):
+    from app.services.ocr_extractor import (
+        _select_financial_pages, _render_pages_to_png, _MAX_PAGES_TO_AI, extract_financial_data_ai,
+    )
+    from app.services.page_image_encoder import encode_pages, estimate_image_tokens
+    import fitz
+
+    pdfs = sorted(fixtures.glob("*.pdf"))
+    if not pdfs:
+        print(f"No PDFs in {fixtures}")
+        return
+
+    print(f"{'pdf':<40} | {'pages':>5} | {'legacy KB':>9} | {'new KB':>7} | {'legacy tok':>10} | {'new tok':>7} | {'fields':>6} | {'diff':>4}")
+    print("-" * 108)
+    totals = [0, 0, 0, 0, 0, 0]
+    for path in pdfs:
+        pdf_bytes = path.read_bytes()
+        filtered, total, has_text = _select_financial_pages(pdf_bytes)
+        pages = filtered[:_MAX_PAGES_TO_AI] if has_text and filtered else list(range(min(total, 6)))
+
+        legacy = _render_pages_to_png(pdf_bytes, pages)
+        legacy_tokens = 0
+        for img in legacy:
+            pix = fitz.Pixmap(img)
+            legacy_tokens += estimate_image_tokens(pix.width, pix.height)
+        start = time.perf_counter()
+        budgeted, stats = encode_pages(pdf_bytes, pages)
+        encode_ms = (time.perf_counter() - start) * 1000
+
+        fields, mismatches = "-", []
+        if use_ai:
+            symbol = path.stem.upper()
+            old_res, new_res = await asyncio.gather(
+                extract_financial_data_ai(legacy, symbol, symbol),
+                extract_financial_data_ai(budgeted, symbol, symbol),
+            )
+            fields, mismatches = _diff(old_res, new_res)
+
+        legacy_kb = sum(len(b) for b in legacy) / 1024
+        print(f"{path.name[:40]:<40} | {len(pages):>5} | {legacy_kb:>9.0f} | {stats['bytes'] / 1024:>7.0f} | "
+              f"{legacy_tokens:>10} | {stats['tokens']:>7} | {fields:>6} | {len(mismatches) if use_ai else '-':>4}"
+              f"   ({encode_ms:.0f}ms)")
+        for key, old, new in mismatches[:10]:
+            print(f"    {key}: legacy={old} budgeted={new}")
+        totals[0] += legacy_kb
+        totals[1] += stats["bytes"] / 1024
+        totals[2] += legacy_tokens
+        totals[3] += stats["tokens"]
+        if use_ai:
+            totals[4] += fields
+            totals[5] += len(mismatches)
+
+    print("-" * 108)
+    print(f"bytes: {totals[0]:.0f} KB -> {totals[1]:.0f} KB ({1 - totals[1] / max(totals[0], 1):.0%} saved); "
+          f"image tokens: {totals[2]} -> {totals[3]} ({1 - totals[3] / max(totals[2], 1):.0%} saved)")
+    if use_ai:
+        print(f"accuracy: {totals[4] - totals[5]}/{totals[4]} fields identical to the legacy extraction")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("fixtures", type=Path)
+    parser.add_argument("--ai", action="store_true", help="also run both image sets through OpenAI and diff")
+    parser.add_argument("--tokens", type=int, help="VISION_MAX_IMAGE_TOKENS override")
+    parser.add_argument("--bytes", type=int, help="VISION_MAX_IMAGE_BYTES override")
+    parser.add_argument("--format", choices=["auto", "png", "jpeg", "webp"], help="VISION_IMAGE_FORMAT override")
+    parser.add_argument("--color", action="store_true", help="disable grayscale")
+    args = parser.parse_args()
+
+    from app.config import get_settings
+    settings = get_settings()
+    if args.tokens:
+        settings.VISION_MAX_IMAGE_TOKENS = args.tokens
+    if args.bytes:
+        settings.VISION_MAX_IMAGE_BYTES = args.bytes
+    if args.format:
+        settings.VISION_IMAGE_FORMAT = args.format
+    if args.color:
+        settings.VISION_IMAGE_GRAYSCALE = False
+    asyncio.run(run(args.fixtures, args.ai))
@@ -0,0 +1,103 @@
+"""Tests for the shared Kotak token bucket (broker_rate_limiter)."""
+
+import asyncio
+import sys
+import time
+from itertools import pairwise
+
+import pytest
+from app.services import broker_rate_limiter as brl
+from app.services.broker_rate_limiter import TokenBucket, get_rate_limiter
+
+
+class _FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self):
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = _FakeClock()
+    monkeypatch.setattr(brl, "time", fake)
+    return fake
+
+
+@pytest.fixture
+def fresh_registry(monkeypatch):
+    monkeypatch.setattr(brl, "_limiters", {})
+
+
+def test_burst_then_refill_rate(clock):
+    bucket = TokenBucket("test", rate_per_minute=600, burst=3)  # 10/s
+
+    waits = [bucket._reserve() for _ in range(5)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3:] == pytest.approx([0.1, 0.2])
+
+    # 1s refills 10 tokens: pays back the 2 borrowed, then caps at the burst
+    clock.advance(1.0)
+    waits = [bucket._reserve() for _ in range(4)]
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(0.1)
+
+
+def test_default_burst_keeps_broker_ceiling():
+    bucket = TokenBucket("test", rate_per_minute=190)
+    snap = bucket.snapshot()
+    assert snap["burst"] == 10
+    assert snap["rate_per_minute"] + snap["burst"] <= brl.KOTAK_LIMIT_PER_MINUTE
+
+
+def test_pause_holds_back_new_grants(clock):
+    bucket = TokenBucket("test", rate_per_minute=600, burst=5)
+
+    bucket.pause(2.0)
+    assert bucket._reserve() == pytest.approx(2.1)
+
+    # A shorter pause never shortens an existing hold
+    bucket.pause(0.5)
+    assert bucket._reserve() == pytest.approx(2.2)
+
+    clock.advance(2.2)
+    assert bucket._reserve() == pytest.approx(0.1)
+
+
+@pytest.mark.asyncio
+async def test_concurrent_slots_release_in_reservation_order():
+    bucket = TokenBucket("test", rate_per_minute=1200, burst=1)  # one every 50ms
+    released = []
+
+    async def call(i):
+        async with bucket.slot():
+            released.append((i, time.monotonic()))
+
+    await asyncio.gather(*(call(i) for i in range(5)))
+
+    assert [i for i, _ in released] == [0, 1, 2, 3, 4]
+    gaps = [b - a for (_, a), (_, b) in pairwise(released)]
+    assert all(gap >= 0.04 for gap in gaps)
+    snap = bucket.snapshot()
+    assert snap["total_granted"] == 5
+    assert snap["in_flight"] == 0
+    assert snap["waiting"] == 0
+
+
+def test_get_rate_limiter_shares_one_bucket_per_name(fresh_registry):
+    quotes = get_rate_limiter(brl.QUOTES)
+    assert get_rate_limiter(brl.QUOTES) is quotes
+    assert get_rate_limiter(brl.ORDERS) is not quotes
+    assert quotes.rate_per_minute == pytest.approx(190)
+
+    # Legacy sys.path import name resolves to the same module and buckets
+    assert sys.modules["broker_rate_limiter"].get_rate_limiter(brl.QUOTES) is quotes
+
+    # A new rate re-configures the shared bucket in place
+    assert get_rate_limiter(brl.QUOTES, rate_per_minute=120) is quotes
+    assert quotes.rate_per_minute == pytest.approx(120)
+    assert set(brl.rate_limiter_snapshots()) == {brl.QUOTES, brl.ORDERS}
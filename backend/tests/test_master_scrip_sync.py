@@ -0,0 +1,56 @@
+"""Tests for the Kotak master scrip CSV parsers (master_scrip_sync)."""
+
+from app.services.master_scrip_sync import _parse_bse_csv, _parse_nse_csv
+
+# Extra columns are skipped (usecols); header whitespace is stripped
+NSE_CSV = """pSymbol, pGroup ,pSymbolName,pTrdSymbol,pISIN
+22,EQ,ACC-EQ,ACC-EQ,INE012A01025
+2885,EQ,RELIANCE-EQ,RELIANCE-EQ,INE002A01018
+1594,BE,INFY-BE,INFY-BE,INE009A01021
+abc,EQ,BADTOKEN-EQ,BADTOKEN-EQ,
+,EQ,NOTOKEN-EQ,NOTOKEN-EQ,
+11536.0,EQ,TCS-EQ,TCS-EQ,INE467B01029
+11537,EQ,TCS-EQ,TCS-EQ,INE467B01029
+"""
+
+BSE_CSV = """pSymbol,pGroup,pSymbolName,pTrdSymbol
+500410,A,ACC,ACC
+532540,B,TATA CONSULTANCY SERV,TCS
+500209,T,INFOSYS,INFY
+512599,A,ADANI ENTERPRISES,ADANIENT-A
+500325,B,RELIANCE,
+999999,A,   ,GHOST
+"""
+
+
+def test_parse_nse_csv(tmp_path):
+    path = tmp_path / "nse_cm.csv"
+    path.write_text(NSE_CSV)
+
+    result = _parse_nse_csv(path)
+
+    # pGroup EQ only, bad/missing tokens dropped, tokens as int, later rows win
+    assert result == {
+        "ACC": ("ACC-EQ", 22),
+        "RELIANCE": ("RELIANCE-EQ", 2885),
+        "TCS": ("TCS-EQ", 11537),
+    }
+    assert all(type(token) is int for _, token in result.values())
+
+
+def test_parse_bse_csv(tmp_path):
+    path = tmp_path / "bse_cm.csv"
+    path.write_text(BSE_CSV)
+
+    result = _parse_bse_csv(path)
+
+    # pGroup A/B only; each row also indexed under its pTrdSymbol; a blank name skips the whole row
+    assert result == {
+        "ACC": ("ACC", 500410),
+        "TATA CONSULTANCY SERV": ("TATA CONSULTANCY SERV", 532540),
+        "TCS": ("TCS", 532540),
+        "ADANI ENTERPRISES": ("ADANI ENTERPRISES", 512599),
+        "ADANIENT": ("ADANIENT-A", 512599),
+        "RELIANCE": ("RELIANCE", 500325),
+    }
+    assert all(type(token) is int for _, token in result.values())
@@ -39,3 +39,23 @@ async def test_trigger_message(client: AsyncClient):
         "exchange": "NSE"
     })
     assert resp.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_get_messages_cursor(client: AsyncClient):
+    resp = await client.get("/api/messages?cursor=&per_page=5")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert "next_cursor" in data
+    assert "page" not in data
+    if data["next_cursor"]:
+        nxt = await client.get(f"/api/messages?cursor={data['next_cursor']}&per_page=5")
+        assert nxt.status_code == 200
+        first_ids = {m["id"] for m in data["messages"]}
+        assert not first_ids & {m["id"] for m in nxt.json()["messages"]}
+
+
+@pytest.mark.asyncio
+async def test_get_messages_bad_cursor(client: AsyncClient):
+    resp = await client.get("/api/messages?cursor=not-a-cursor")
+    assert resp.status_code == 400
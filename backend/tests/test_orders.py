@@ -32,3 +32,11 @@ async def test_execute_order_valid(client: AsyncClient):
     data = resp.json()
     assert data["success"] is True
     assert data["status"] == "submitted"
+
+
+@pytest.mark.asyncio
+async def test_get_rate_limits(client: AsyncClient):
+    resp = await client.get("/api/place_order/rate-limits")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert "limiters" in data
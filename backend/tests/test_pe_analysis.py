@@ -19,6 +19,15 @@ async def test_get_pe_analysis_with_filters(client: AsyncClient):
     assert resp.status_code == 200
 
 
+@pytest.mark.asyncio
+async def test_get_pe_analysis_cursor(client: AsyncClient):
+    resp = await client.get("/api/pe_analysis?cursor=&per_page=10")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert "next_cursor" in data
+    assert "total_estimated" in data
+
+
 @pytest.mark.asyncio
 async def test_get_pe_filters(client: AsyncClient):
     resp = await client.get("/api/pe_analysis/filters")
@@ -32,3 +41,18 @@ async def test_get_pe_filters(client: AsyncClient):
 async def test_get_report_summary(client: AsyncClient):
     resp = await client.get("/api/pe_analysis/report_summary")
     assert resp.status_code == 200
+
+
+@pytest.mark.asyncio
+async def test_get_report_detail_pe_range(client: AsyncClient):
+    resp = await client.get("/api/pe_analysis/report_detail?filter_type=pe_range&filter_value=10-20&per_page=5")
+    assert resp.status_code == 200
+    data = resp.json()
+    assert len(data["results"]) <= 5
+    assert all(10 <= r["pe"] < 20 for r in data["results"])
+
+
+@pytest.mark.asyncio
+async def test_get_report_detail_bad_pe_range(client: AsyncClient):
+    resp = await client.get("/api/pe_analysis/report_detail?filter_type=pe_range&filter_value=abc")
+    assert resp.status_code == 400
@@ -0,0 +1,87 @@
+"""Tests for the pe_board triggers (migration 015) against Postgres."""
+
+from datetime import datetime, timezone
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+SYMBOL = "ZZPEBOARD"
+BSE_TOKEN = 999_991
+
+
+async def _insert(db: AsyncSession, symbol: str, quarter: str, exchange: str, day: int, **extra) -> int:
+    cols = {
+        "stock_symbol": symbol, "quarter": quarter, "financial_year": "FY26", "exchange": exchange,
+        "extraction_status": "completed", "announcement_date": datetime(2026, 1, day, tzinfo=timezone.utc), **extra,
+    }
+    row = await db.execute(text(f"""
+        INSERT INTO quarterly_results ({", ".join(cols)})
+        VALUES ({", ".join(f":{c}" for c in cols)})
+        RETURNING id
+    """), cols)
+    return row.scalar()
+
+
+async def _board(db: AsyncSession) -> dict:
+    rows = await db.execute(text("""
+        SELECT view, quarter, qr_id FROM pe_board
+        WHERE canonical_symbol = :sym AND canonical_fy_suffix = '26'
+    """), {"sym": SYMBOL})
+    return {(r.view, r.quarter): r.qr_id for r in rows}
+
+
+@pytest.mark.asyncio
+async def test_pe_board_follows_review_ignore_delete(db_session: AsyncSession):
+    db = db_session
+    await db.execute(text("INSERT INTO stocks (symbol, bse_token) VALUES (:s, :t)"),
+                     {"s": SYMBOL, "t": BSE_TOKEN})
+
+    # Dual-listed pending pair: one group, latest announcement wins
+    nse_id = await _insert(db, SYMBOL, "Q1", "NSE", 10)
+    bse_id = await _insert(db, str(BSE_TOKEN), "Q1", "BSE", 12)
+    assert await _board(db) == {("pending", "Q1"): bse_id}
+
+    # Reviewing one row moves the whole group from pending to reviewed
+    await db.execute(text("UPDATE quarterly_results SET valuation = 'CHEAP', user_reviewed = TRUE WHERE id = :id"),
+                     {"id": nse_id})
+    assert await _board(db) == {("reviewed", "Q1"): nse_id}
+
+    # Ignoring the sibling: both reviewed, BSE preferred on ties
+    await db.execute(text("UPDATE quarterly_results SET valuation = 'ignore', user_reviewed = TRUE WHERE id = :id"),
+                     {"id": bse_id})
+    assert await _board(db) == {("reviewed", "Q1"): bse_id}
+
+    # A signal outranks the exchange preference
+    await db.execute(text("UPDATE quarterly_results SET recommendation = 'BUY' WHERE id = :id"), {"id": nse_id})
+    assert await _board(db) == {("reviewed", "Q1"): nse_id}
+
+    await db.execute(text("DELETE FROM quarterly_results WHERE id = :id"), {"id": nse_id})
+    assert await _board(db) == {("reviewed", "Q1"): bse_id}
+
+    await db.execute(text("DELETE FROM quarterly_results WHERE id = :id"), {"id": bse_id})
+    assert await _board(db) == {}
+
+
+@pytest.mark.asyncio
+async def test_pe_board_q4_hides_pending_fy(db_session: AsyncSession):
+    db = db_session
+    fy_id = await _insert(db, SYMBOL, "FY", "NSE", 20)
+    assert await _board(db) == {("pending", "FY"): fy_id}
+
+    q4_id = await _insert(db, SYMBOL, "Q4", "NSE", 21)
+    assert await _board(db) == {("pending", "Q4"): q4_id}
+
+    await db.execute(text("DELETE FROM quarterly_results WHERE id = :id"), {"id": q4_id})
+    assert await _board(db) == {("pending", "FY"): fy_id}
+
+
+@pytest.mark.asyncio
+async def test_pe_board_rebuild_matches_triggers(db_session: AsyncSession):
+    db = db_session
+    await _insert(db, SYMBOL, "Q2", "NSE", 5)
+    reviewed = await _insert(db, SYMBOL, "Q3", "NSE", 6, valuation="INLINE")
+    before = await _board(db)
+    await db.execute(text("SELECT pe_board_rebuild()"))
+    assert await _board(db) == before
+    assert before[("reviewed", "Q3")] == reviewed
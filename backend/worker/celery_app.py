@@ -9,6 +9,9 @@ Run workers (Windows — use --pool=threads, fork is unsupported):
     # CPU worker (OCR, AI extraction, PDF processing) — main parallelism for PE Pending
     celery -A worker.celery_app worker -Q cpu_queue -n cpu@%COMPUTERNAME% --pool=threads --concurrency=12 --loglevel=info
 
+    # AI worker (OpenAI calls of the staged quarterly pipeline — waits on the network, not the CPU)
+    celery -A worker.celery_app worker -Q ai_queue -n ai@%COMPUTERNAME% --pool=threads --concurrency=16 --loglevel=info
+
     # Beat scheduler (periodic tasks)
     celery -A worker.celery_app beat --loglevel=info
 
@@ -45,6 +48,11 @@ app.conf.update(
 
     # Task routing: separate I/O-bound from CPU-bound
     task_routes={
+        # Staged quarterly extraction (extraction_pipeline.py): each stage on the queue it waits on
+        "worker.tasks.extraction_pipeline.fetch_stage": {"queue": "io_queue"},
+        "worker.tasks.extraction_pipeline.render_stage": {"queue": "cpu_queue"},
+        "worker.tasks.extraction_pipeline.infer_stage": {"queue": "ai_queue"},
+        "worker.tasks.extraction_pipeline.persist_stage": {"queue": "io_queue"},
         "worker.tasks.announcements.*": {"queue": "io_queue"},
         "worker.tasks.quotes.*": {"queue": "io_queue"},
         "worker.tasks.extraction.*": {"queue": "cpu_queue"},
@@ -70,6 +78,7 @@ app.conf.update(
 app.conf.include = [
     "worker.tasks.announcements",
     "worker.tasks.extraction",
+    "worker.tasks.extraction_pipeline",
     "worker.tasks.concall",
     "worker.tasks.announcement_insight",
     "worker.tasks.quotes",
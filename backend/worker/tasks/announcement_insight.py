@@ -22,7 +22,7 @@ from app.services.announcement_extractor import (
     extract_announcement_text,
     save_announcement_insight,
 )
-from app.services.ocr_extractor import _render_pages_to_png
+from app.services.pdf_document import PdfDocument
 
 logger = logging.getLogger(__name__)
 
@@ -116,26 +116,27 @@ async def _do_announcement_extraction(
     if not pdf_bytes:
         raise ValueError(f"Could not download PDF: {pdf_url}")
 
-    # 2. Detect extraction mode
-    mode, total_pages = _detect_extraction_mode(pdf_bytes)
-    logger.info(f"Detected mode={mode} for {stock_symbol} ({total_pages} pages)")
-
-    # 3. Extract via appropriate pipeline
-    extraction_data = None
-    pages_processed = 0
-
-    if mode == "vision":
-        page_indices = _select_pages_for_vision(pdf_bytes)
-        pages_processed = len(page_indices)
-        extraction_data = await extract_announcement_vision(
-            pdf_bytes, stock_symbol, company_name, page_indices
-        )
-    else:
-        text_content = _extract_full_text(pdf_bytes)
-        pages_processed = total_pages
-        extraction_data = await extract_announcement_text(
-            text_content, stock_symbol, company_name
-        )
+    # 2. Detect extraction mode (one open: page text is reused by the chosen pipeline)
+    with PdfDocument(pdf_bytes) as pdf_doc:
+        mode, total_pages = _detect_extraction_mode(pdf_doc)
+        logger.info(f"Detected mode={mode} for {stock_symbol} ({total_pages} pages)")
+
+        # 3. Extract via appropriate pipeline
+        extraction_data = None
+        pages_processed = 0
+
+        if mode == "vision":
+            page_indices = _select_pages_for_vision(pdf_doc)
+            pages_processed = len(page_indices)
+            extraction_data = await extract_announcement_vision(
+                pdf_doc, stock_symbol, company_name, page_indices, source=pdf_url
+            )
+        else:
+            text_content = _extract_full_text(pdf_doc)
+            pages_processed = total_pages
+            extraction_data = await extract_announcement_text(
+                text_content, stock_symbol, company_name, source=pdf_url
+            )
 
     if not extraction_data:
         raise ValueError(f"AI extraction returned empty for {stock_symbol} ({announcement_type})")
@@ -22,7 +22,8 @@ from app.services.bse_fetcher import (
     process_bse_results_data,
     process_bse_board_meeting_data,
 )
-from worker.tasks.extraction import run_quarterly_extraction
+from app.services.filing_dedup import coalesce_extraction_items
+from worker.tasks.extraction_pipeline import queue_quarterly_extraction
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +45,20 @@ async def _ensure_redis():
     await init_redis()
 
 
+async def _dispatch_quarterly_extractions(items, exchange: str) -> int:
+    """Queue one quarterly extraction per filing, after coalescing NSE/BSE copies of the same PDF."""
+    to_dispatch = await coalesce_extraction_items(items, exchange)
+    for item in to_dispatch:
+        queue_quarterly_extraction(
+            stock_symbol=item["symbol"],
+            pdf_url=item["pdf_url"],
+            exchange=exchange,
+            company_name=item.get("company_name", ""),
+            announcement_date=item.get("announcement_date"),
+        )
+    return len(to_dispatch)
+
+
 @shared_task(
     name="worker.tasks.announcements.fetch_nse_equities",
     bind=True,
@@ -74,14 +89,7 @@ async def _do_fetch_nse_equities():
 
     # Dispatch extraction for NSE equities quarterly results (subject-filtered)
     extraction_items = await process_nse_eq_for_extraction(announcements)
-    for item in extraction_items:
-        run_quarterly_extraction.delay(
-            stock_symbol=item["symbol"],
-            pdf_url=item["pdf_url"],
-            exchange="NSE",
-            company_name=item.get("company_name", ""),
-            announcement_date=item.get("announcement_date"),
-        )
+    await _dispatch_quarterly_extractions(extraction_items, "NSE")
 
     return len(new_items)
 
@@ -115,14 +123,7 @@ async def _do_fetch_nse_sme():
 
     # Dispatch extraction for NSE SME quarterly results (subject-filtered)
     extraction_items = await process_nse_sme_for_extraction(announcements)
-    for item in extraction_items:
-        run_quarterly_extraction.delay(
-            stock_symbol=item["symbol"],
-            pdf_url=item["pdf_url"],
-            exchange="NSE",
-            company_name=item.get("company_name", ""),
-            announcement_date=item.get("announcement_date"),
-        )
+    await _dispatch_quarterly_extractions(extraction_items, "NSE")
 
     return len(new_items)
 
@@ -185,14 +186,7 @@ async def _do_fetch_bse_results():
     announcements = await fetch_bse_announcements(category="result")
     new_items = await process_bse_results_data(announcements)
 
-    for item in new_items:
-        run_quarterly_extraction.delay(
-            stock_symbol=item["symbol"],
-            pdf_url=item["pdf_url"],
-            exchange="BSE",
-            company_name=item.get("company_name", ""),
-            announcement_date=item.get("announcement_date"),
-        )
+    await _dispatch_quarterly_extractions(new_items, "BSE")
 
     return len(new_items)
 
@@ -225,13 +219,6 @@ async def _do_fetch_bse_board_meeting():
     announcements = await fetch_bse_announcements(category="board_meeting")
     new_items = await process_bse_board_meeting_data(announcements)
 
-    for item in new_items:
-        run_quarterly_extraction.delay(
-            stock_symbol=item["symbol"],
-            pdf_url=item["pdf_url"],
-            exchange="BSE",
-            company_name=item.get("company_name", ""),
-            announcement_date=item.get("announcement_date"),
-        )
+    await _dispatch_quarterly_extractions(new_items, "BSE")
 
     return len(new_items)
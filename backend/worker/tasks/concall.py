@@ -125,7 +125,7 @@ async def _do_concall_extraction(
         raise _NotConcallError(f"PDF does not appear to be a concall transcript")
 
     # 3. AI extraction
-    result = await extract_concall_insights_ai(transcript, stock_symbol, company_name)
+    result = await extract_concall_insights_ai(transcript, stock_symbol, company_name, source=pdf_url)
     if not result:
         raise ValueError(f"AI extraction returned empty for concall {stock_symbol}")
 
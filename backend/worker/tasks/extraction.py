@@ -17,11 +17,22 @@ from app.cache_keys import (
     notify_quarterly_results,
     invalidate_pe_analysis,
 )
+from app.config import get_settings
 from app.database import get_db_session
+from app.services.pipeline_artifacts import purge_artifacts
+from app.services.filing_dedup import (
+    complete_followers,
+    fail_followers,
+    follower_has_active_leader,
+    refresh_claim,
+)
 from app.services.ocr_extractor import (
     download_and_convert_pdf,
     download_and_convert_pdf_full,
+    download_and_extract_tables_text,
     extract_financial_data_ai,
+    extract_financial_data_text,
+    validate_text_extraction,
     save_quarterly_result,
     fetch_and_save_cmp,
     run_ai_stock_analysis,
@@ -88,6 +99,7 @@ def run_quarterly_extraction(
             stock_symbol, pdf_url, f"non-results-pdf: {exc}",
             exchange=exchange, company_name=company_name, announcement_date=announcement_date,
         ))
+        _run_async(_fail_coalesced(stock_symbol, pdf_url, f"non-results-pdf: {exc}", final=True))
         return
     except Exception as exc:
         logger.error(f"Extraction failed for {stock_symbol}: {exc}")
@@ -95,6 +107,9 @@ def run_quarterly_extraction(
             stock_symbol, pdf_url, str(exc),
             exchange=exchange, company_name=company_name, announcement_date=announcement_date,
         ))
+        _run_async(_fail_coalesced(
+            stock_symbol, pdf_url, str(exc), final=self.request.retries >= self.max_retries,
+        ))
         raise self.retry(exc=exc)
 
 
@@ -116,9 +131,24 @@ async def _do_extraction(
     migrated from nse_url_test.py).
     """
     await _ensure_redis()
+    await refresh_claim(pdf_url)
+    await _mark_processing(stock_symbol, pdf_url)
+
+    result = None
+    if get_settings().QUARTERLY_TEXT_MODE:
+        tables_tsv = await download_and_extract_tables_text(pdf_url)
+        if tables_tsv:
+            result = await _extract_text(tables_tsv, stock_symbol, company_name, pdf_url)
+
+    if result is None:
+        result = await _extract_with_vision(stock_symbol, pdf_url, company_name)
 
-    # Flip placeholder row to 'processing' so PE Pending shows EXTRACTING
-    # (blue pulse) live. No-op if no row exists yet (will be created by save).
+    await _persist_result(stock_symbol, pdf_url, exchange, company_name, announcement_date, result)
+
+
+async def _mark_processing(stock_symbol: str, pdf_url: str):
+    """Flip placeholder row to 'processing' so PE Pending shows EXTRACTING
+    (blue pulse) live. No-op if no row exists yet (will be created by save)."""
     try:
         async with get_db_session() as db:
             await db.execute(text("""
@@ -134,30 +164,16 @@ async def _do_extraction(
 
     await notify_extraction_update(stock_symbol, "processing")
 
-    images = await download_and_convert_pdf(pdf_url)
-    if not images:
-        raise ValueError(f"No images extracted from PDF: {pdf_url}")
-
-    is_short_pdf = len(images) <= 2
-
-    result = await extract_financial_data_ai(images, stock_symbol, company_name)
-
-    def _is_empty(r):
-        if not r:
-            return True
-        return not (r.get("standalone_periods") or r.get("consolidated_periods"))
-
-    if _is_empty(result) and not is_short_pdf:
-        logger.warning(f"AI returned empty for {stock_symbol} on filtered pages — retrying with full PDF")
-        images_full = await download_and_convert_pdf_full(pdf_url, max_pages=12)
-        if images_full:
-            result = await extract_financial_data_ai(images_full, stock_symbol, company_name)
-
-    if _is_empty(result):
-        if is_short_pdf:
-            raise _NonResultsPDFError(f"PDF has {len(images)} page(s), no financial periods found")
-        raise ValueError(f"AI extraction returned empty for {stock_symbol} (after fallback)")
 
+async def _persist_result(
+    stock_symbol: str,
+    pdf_url: str,
+    exchange: str,
+    company_name: str,
+    announcement_date,
+    result: dict,
+):
+    """Upsert the extraction, refresh CMP/PE, write coalesced NSE/BSE copies and notify the UI."""
     await save_quarterly_result(
         stock_symbol=stock_symbol,
         company_name=company_name,
@@ -169,6 +185,21 @@ async def _do_extraction(
 
     await fetch_and_save_cmp(stock_symbol, exchange)
 
+    async def _save_follower(f):
+        await save_quarterly_result(
+            stock_symbol=f["symbol"],
+            company_name=f.get("company_name") or company_name,
+            exchange=f["exchange"],
+            pdf_url=f["pdf_url"],
+            announcement_date=f.get("announcement_date"),
+            extraction_data=result,
+        )
+        if f["symbol"] != stock_symbol:
+            await fetch_and_save_cmp(f["symbol"], f["exchange"])
+        await notify_extraction_update(f["symbol"], "completed")
+
+    await complete_followers(stock_symbol, pdf_url, _save_follower)
+
     await notify_extraction_update(stock_symbol, "completed")
     await notify_quarterly_results({
         "stock_symbol": stock_symbol,
@@ -177,6 +208,80 @@ async def _do_extraction(
     })
 
 
+async def _refresh_coalesced(pdf_url: str):
+    """Keep a leader's filing_dedup claim alive across stage retries and queue waits."""
+    await _ensure_redis()
+    await refresh_claim(pdf_url)
+
+
+async def _fail_coalesced(stock_symbol: str, pdf_url: str, error: str, final: bool):
+    """Mirror a leader failure onto NSE/BSE copies coalesced behind it (filing_dedup)."""
+    await _ensure_redis()
+
+    async def _fail(f):
+        await _mark_extraction_failed(
+            f["symbol"], f["pdf_url"], error,
+            exchange=f["exchange"], company_name=f.get("company_name", ""),
+            announcement_date=f.get("announcement_date"),
+        )
+
+    await fail_followers(stock_symbol, pdf_url, _fail, final=final)
+
+
+def _is_empty(r) -> bool:
+    if not r:
+        return True
+    return not (r.get("standalone_periods") or r.get("consolidated_periods"))
+
+
+# Shared with extraction_pipeline so the single-task and staged paths make the same fallback decisions
+
+_FULL_FALLBACK_PAGES = 12
+
+
+async def _extract_text(tables_tsv: str, stock_symbol: str, company_name: str, pdf_url: str):
+    """Text-mode extraction, or None when the result fails validation and vision should run instead."""
+    result = await extract_financial_data_text(tables_tsv, stock_symbol, company_name, source=pdf_url)
+    problem = validate_text_extraction(result)
+    if problem:
+        logger.warning(f"Text-mode extraction rejected for {stock_symbol} ({problem}) — falling back to vision")
+        return None
+    return result
+
+
+def _needs_full_fallback(result, stock_symbol: str, page_count: int, full_tried: bool) -> bool:
+    """
+    After a vision call: False if the result has periods, True if the first
+    _FULL_FALLBACK_PAGES pages should be tried next. Raises when nothing is
+    left to try (a 1-2 page PDF with no periods is not a results document).
+    """
+    if not _is_empty(result):
+        return False
+    is_short_pdf = page_count <= 2
+    if not full_tried and not is_short_pdf:
+        logger.warning(f"AI returned empty for {stock_symbol} on filtered pages — retrying with full PDF")
+        return True
+    if is_short_pdf:
+        raise _NonResultsPDFError(f"PDF has {page_count} page(s), no financial periods found")
+    raise ValueError(f"AI extraction returned empty for {stock_symbol} (after fallback)")
+
+
+async def _extract_with_vision(stock_symbol: str, pdf_url: str, company_name: str):
+    """Vision path: keyword-selected page images, then first 12 pages if the AI finds nothing."""
+    images = await download_and_convert_pdf(pdf_url)
+    if not images:
+        raise ValueError(f"No images extracted from PDF: {pdf_url}")
+
+    result = await extract_financial_data_ai(images, stock_symbol, company_name, source=pdf_url)
+
+    if _needs_full_fallback(result, stock_symbol, len(images), full_tried=False):
+        images_full = await download_and_convert_pdf_full(pdf_url, max_pages=_FULL_FALLBACK_PAGES)
+        if images_full:
+            result = await extract_financial_data_ai(images_full, stock_symbol, company_name, source=pdf_url)
+        _needs_full_fallback(result, stock_symbol, len(images), full_tried=True)
+    return result
+
+
 def _quarter_fy_from_announcement(d) -> tuple:
     """Derive (quarter, financial_year) from announcement date.
     Indian results are announced AFTER quarter ends:
@@ -282,6 +387,7 @@ async def _do_retry_stuck():
 
     cutoff = datetime.now(timezone.utc) - timedelta(minutes=10)
     count = 0
+    await asyncio.to_thread(purge_artifacts)
 
     async with get_db_session() as db:
         rows = await db.execute(text("""
@@ -294,8 +400,12 @@ async def _do_retry_stuck():
             LIMIT 50
         """), {"cutoff": cutoff})
 
+        from worker.tasks.extraction_pipeline import queue_quarterly_extraction
+
         for row in rows.fetchall():
-            run_quarterly_extraction.delay(
+            if await follower_has_active_leader(row.source_pdf_url):
+                continue  # coalesced NSE/BSE copy — its leader's extraction will write this row
+            queue_quarterly_extraction(
                 stock_symbol=row.stock_symbol,
                 pdf_url=row.source_pdf_url,
                 exchange=row.exchange or "NSE",
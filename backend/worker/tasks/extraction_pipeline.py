@@ -0,0 +1,271 @@
+"""
+Staged quarterly-results extraction: fetch → render → infer → persist.
+
+run_quarterly_extraction does every step in one cpu_queue task, so a slow
+OpenAI response holds a CPU slot and a failure anywhere repeats everything.
+Here each step is its own task on the queue that fits it:
+
+    fetch_stage    io_queue   download the PDF into pdf_cache, flip row to 'processing'
+    render_stage   cpu_queue  text-layer TSV, or page images (page_image_encoder)
+    infer_stage    ai_queue   OpenAI call (openai_governor slot, ai_result_cache)
+    persist_stage  io_queue   save_quarterly_result + CMP/PE + coalesced copies + notify
+
+Stages pass a small JSON job dict. PDF bytes are referenced by sha256 (the
+pdf_cache blob), and page images / TSV / model output by artifact key
+(pipeline_artifacts.py). Render artifacts depend only on the PDF bytes and
+are shared by jobs on the same PDF; the model output also depends on the
+prompt (symbol, company name), so its key carries the job's own id. Each stage retries on its own, so a failed persist
+does not re-render or re-call the model.
+
+The infer stage re-routes through render when the result needs different
+input: a text-mode result that fails validation goes back for vision images,
+and an empty vision result for the full first 12 pages. It does this with
+self.replace(), which keeps the rest of the chain (persist) attached.
+
+queue_quarterly_extraction() is the single dispatch entry point. With
+EXTRACTION_PIPELINE=false it queues the single-task run_quarterly_extraction
+instead.
+"""
+
+import asyncio
+import hashlib
+import logging
+import uuid
+from typing import Any, Dict, Optional
+
+from celery import chain, shared_task
+from celery.exceptions import Ignore
+
+from app.config import get_settings
+from app.services.ocr_extractor import (
+    convert_pdf_bytes,
+    convert_pdf_bytes_full,
+    download_pdf_bytes,
+    extract_financial_data_ai,
+    extract_tables_text_from_bytes,
+)
+from app.services.pdf_cache import _read_blob
+from app.services.pipeline_artifacts import get_images, get_json, put_images, put_json
+from worker.tasks.extraction import (
+    _FULL_FALLBACK_PAGES,
+    _NonResultsPDFError,
+    _ensure_redis,
+    _extract_text,
+    _fail_coalesced,
+    _mark_extraction_failed,
+    _mark_processing,
+    _needs_full_fallback,
+    _persist_result,
+    _refresh_coalesced,
+    _run_async,
+    run_quarterly_extraction,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def queue_quarterly_extraction(
+    stock_symbol: str,
+    pdf_url: str,
+    exchange: str = "NSE",
+    company_name: str = "",
+    announcement_date: Optional[str] = None,
+):
+    """Dispatch one quarterly-results extraction (staged chain or single task). Returns the AsyncResult."""
+    if not get_settings().EXTRACTION_PIPELINE:
+        return run_quarterly_extraction.delay(
+            stock_symbol=stock_symbol,
+            pdf_url=pdf_url,
+            exchange=exchange,
+            company_name=company_name,
+            announcement_date=announcement_date,
+        )
+    job = {
+        "stock_symbol": stock_symbol,
+        "pdf_url": pdf_url,
+        "exchange": exchange,
+        "company_name": company_name or "",
+        "announcement_date": announcement_date,
+        "variant": "auto",
+        "job_id": uuid.uuid4().hex[:16],
+    }
+    return chain(fetch_stage.s(job), render_stage.s(), infer_stage.s(), persist_stage.s()).apply_async()
+
+
+def _run_stage(task, job: Dict[str, Any], coro):
+    """Run a stage coroutine with the shared failure policy (mark failed, retry this stage only)."""
+    try:
+        _run_async(_refresh_coalesced(job["pdf_url"]))
+        return _run_async(coro)
+    except _NonResultsPDFError as exc:
+        logger.warning(f"Skipping non-results PDF for {job['stock_symbol']}: {exc}")
+        _run_async(_mark_extraction_failed(
+            job["stock_symbol"], job["pdf_url"], f"non-results-pdf: {exc}",
+            exchange=job["exchange"], company_name=job["company_name"],
+            announcement_date=job["announcement_date"],
+        ))
+        _run_async(_fail_coalesced(job["stock_symbol"], job["pdf_url"], f"non-results-pdf: {exc}", final=True))
+        raise Ignore()
+    except Exception as exc:
+        logger.error(f"Extraction {task.name.rsplit('.', 1)[-1]} failed for {job['stock_symbol']}: {exc}")
+        _run_async(_mark_extraction_failed(
+            job["stock_symbol"], job["pdf_url"], str(exc),
+            exchange=job["exchange"], company_name=job["company_name"],
+            announcement_date=job["announcement_date"],
+        ))
+        _run_async(_fail_coalesced(
+            job["stock_symbol"], job["pdf_url"], str(exc), final=task.request.retries >= task.max_retries,
+        ))
+        raise task.retry(exc=exc)
+
+
+async def _load_pdf(job: Dict[str, Any]) -> bytes:
+    """PDF bytes from the pdf_cache blob named by the fetch stage (re-download if evicted)."""
+    pdf_bytes = None
+    if job.get("pdf_sha256"):
+        pdf_bytes = await asyncio.to_thread(_read_blob, job["pdf_sha256"])
+    if pdf_bytes is None:
+        pdf_bytes = await download_pdf_bytes(job["pdf_url"])
+    if pdf_bytes is None:
+        raise ValueError(f"Could not download PDF: {job['pdf_url']}")
+    return pdf_bytes
+
+
+def _result_key(job: Dict[str, Any]) -> str:
+    """Per-job key for the model output (jobs queued before job_id existed fall back to the symbol)."""
+    job_id = job.get("job_id") or hashlib.sha256(job["stock_symbol"].encode()).hexdigest()[:16]
+    return f"{job['artifact']}-{job_id}-result"
+
+
+# ─── fetch (io_queue) ───────────────────────────────────────────────────────
+
+async def _fetch(job: Dict[str, Any]) -> Dict[str, Any]:
+    await _ensure_redis()
+    await _mark_processing(job["stock_symbol"], job["pdf_url"])
+    pdf_bytes = await download_pdf_bytes(job["pdf_url"])
+    if pdf_bytes is None:
+        raise ValueError(f"Could not download PDF: {job['pdf_url']}")
+    return dict(job, pdf_sha256=hashlib.sha256(pdf_bytes).hexdigest())
+
+
+@shared_task(
+    name="worker.tasks.extraction_pipeline.fetch_stage",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=30,
+    acks_late=True,
+    time_limit=120,
+    soft_time_limit=90,
+)
+def fetch_stage(self, job: Dict[str, Any]):
+    return _run_stage(self, job, _fetch(job))
+
+
+# ─── render (cpu_queue) ─────────────────────────────────────────────────────
+
+async def _render(job: Dict[str, Any]) -> Dict[str, Any]:
+    await _ensure_redis()
+    pdf_bytes = await _load_pdf(job)
+    variant = job.get("variant", "auto")
+    key_base = f"{job['pdf_sha256'][:40]}-{variant}"
+
+    if variant == "auto" and get_settings().QUARTERLY_TEXT_MODE:
+        tsv = await extract_tables_text_from_bytes(pdf_bytes)
+        if tsv:
+            await put_json(f"{key_base}-tsv", {"tsv": tsv})
+            return dict(job, mode="text", artifact=f"{key_base}-tsv")
+
+    if variant == "full":
+        images = await convert_pdf_bytes_full(pdf_bytes, job["pdf_url"], _FULL_FALLBACK_PAGES)
+    else:
+        images = await convert_pdf_bytes(pdf_bytes, job["pdf_url"])
+    if not images:
+        raise ValueError(f"No images extracted from PDF: {job['pdf_url']}")
+    await put_images(f"{key_base}-img", images)
+    return dict(job, mode="vision", artifact=f"{key_base}-img", image_count=len(images))
+
+
+@shared_task(
+    name="worker.tasks.extraction_pipeline.render_stage",
+    bind=True,
+    max_retries=2,
+    default_retry_delay=30,
+    acks_late=True,
+    time_limit=180,
+    soft_time_limit=150,
+)
+def render_stage(self, job: Dict[str, Any]):
+    return _run_stage(self, job, _render(job))
+
+
+# ─── infer (ai_queue) ───────────────────────────────────────────────────────
+
+async def _infer(job: Dict[str, Any]) -> Dict[str, Any]:
+    """Returns the job with result_artifact set, or with reroute=<variant> when render must run again."""
+    await _ensure_redis()
+    symbol, company, pdf_url = job["stock_symbol"], job["company_name"], job["pdf_url"]
+
+    if job["mode"] == "text":
+        payload = await get_json(job["artifact"])
+        if payload is None:
+            return dict(job, reroute=job.get("variant", "auto"))  # artifact purged/lost: rebuild it
+        result = await _extract_text(payload["tsv"], symbol, company, pdf_url)
+        if result is None:
+            return dict(job, reroute="vision")
+    else:
+        images = await get_images(job["artifact"])
+        if images is None:
+            return dict(job, reroute=job.get("variant", "auto"))
+        result = await extract_financial_data_ai(images, symbol, company, source=pdf_url)
+        page_count = job.get("filtered_image_count", len(images))
+        if _needs_full_fallback(result, symbol, page_count, full_tried=job.get("variant") == "full"):
+            return dict(job, reroute="full", filtered_image_count=len(images))
+
+    result_key = _result_key(job)
+    await put_json(result_key, result)
+    return dict(job, result_artifact=result_key)
+
+
+@shared_task(
+    name="worker.tasks.extraction_pipeline.infer_stage",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=60,
+    acks_late=True,
+    time_limit=300,
+    soft_time_limit=270,
+)
+def infer_stage(self, job: Dict[str, Any]):
+    out = _run_stage(self, job, _infer(job))
+    if out.get("reroute"):
+        rerender = dict(out, variant=out.pop("reroute"))
+        # replace() keeps the rest of the chain (persist_stage) after the new sub-chain
+        raise self.replace(chain(render_stage.s(rerender), infer_stage.s()))
+    return out
+
+
+# ─── persist (io_queue) ─────────────────────────────────────────────────────
+
+async def _persist(job: Dict[str, Any]):
+    await _ensure_redis()
+    result = await get_json(job["result_artifact"])
+    if result is None:
+        raise ValueError(f"Extraction result artifact missing for {job['stock_symbol']}")
+    await _persist_result(
+        job["stock_symbol"], job["pdf_url"], job["exchange"], job["company_name"],
+        job["announcement_date"], result,
+    )
+    return {"stock_symbol": job["stock_symbol"], "status": "completed", "mode": job.get("mode")}
+
+
+@shared_task(
+    name="worker.tasks.extraction_pipeline.persist_stage",
+    bind=True,
+    max_retries=3,
+    default_retry_delay=30,
+    acks_late=True,
+    time_limit=120,
+    soft_time_limit=90,
+)
+def persist_stage(self, job: Dict[str, Any]):
+    return _run_stage(self, job, _persist(job))
@@ -71,12 +71,14 @@ export async function fetchMessages(
   page = 1,
   perPage = 50,
   option = "all",
-  filters: { exchange?: string; sector?: string; search?: string } = {}
+  filters: { exchange?: string; sector?: string; search?: string; cursor?: string } = {}
 ) {
   const params: Record<string, unknown> = { page, per_page: perPage, option };
   if (filters.exchange) params.exchange = filters.exchange;
   if (filters.sector) params.sector = filters.sector;
   if (filters.search) params.search = filters.search;
+  // Keyset mode: "" for the first page, then the response's next_cursor
+  if (filters.cursor !== undefined) params.cursor = filters.cursor;
   const { data } = await api.get("/messages", { params });
   return data;
 }
@@ -109,6 +111,7 @@ export async function fetchPEAnalysis(params: {
   segment?: string;
   sort_by?: string;
   sort_dir?: string;
+  cursor?: string;
 }) {
   const { data } = await api.get("/pe_analysis", { params });
   return data;
@@ -234,8 +237,8 @@ export async function authenticateTotp(totp: string) {
   return data;
 }
 
-export async function fetchQuotes() {
-  const { data } = await api.post("/place_order/quotes/fetch");
+export async function fetchQuotes(incremental = false) {
+  const { data } = await api.post("/place_order/quotes/fetch", null, { params: { incremental } });
   return data;
 }
 
@@ -348,6 +351,7 @@ export async function fetchAllInsights(params?: {
   quarter?: string;
   financial_year?: string;
   status?: string;
+  cursor?: string;
 }) {
   const { data } = await api.get("/insights/all", { params });
   return data;
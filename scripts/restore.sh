@@ -43,7 +43,7 @@ if [ "$confirm" != "yes" ]; then
 fi
 
 echo "[$(date)] Stopping application..."
-docker compose stop api celery-io celery-cpu 2>/dev/null || true
+docker compose stop api celery-io celery-cpu celery-ai 2>/dev/null || true
 
 echo "[$(date)] Dropping and recreating database..."
 PGPASSWORD="${POSTGRES_PASSWORD}" psql \
@@ -69,7 +69,7 @@ cd /opt/automation-trade/backend
 alembic stamp head
 
 echo "[$(date)] Restarting application..."
-docker compose start api celery-io celery-cpu
+docker compose start api celery-io celery-cpu celery-ai
 
 echo "[$(date)] Restore complete!"
 